@@ -0,0 +1,38 @@
+from jsonschema import Draft7Validator
+
+
+class ActionError(Exception):
+    """Помилка обробки дії; її текст надсилається клієнту як {'error': ...}."""
+
+
+class ActionRegistry:
+    """Таблиця обробників WebSocket-дій з попередньо зібраними схемами.
+
+    Схема кожної дії перевіряється і компілюється у валідатор один раз під час
+    імпорту, а не на кожне повідомлення.
+    """
+
+    def __init__(self):
+        self.handlers = {}
+
+    def register(self, name, schema, error):
+        """Реєструє обробник дії name; error — текст помилки для невалідного payload."""
+        Draft7Validator.check_schema(schema)
+        validator = Draft7Validator(schema)
+
+        def decorator(func):
+            self.handlers[name] = (func, validator, error)
+            return func
+        return decorator
+
+    def resolve(self, payload):
+        """Повертає обробник для payload або кидає ActionError."""
+        if not isinstance(payload, dict):
+            raise ActionError('Invalid message format')
+        try:
+            func, validator, error = self.handlers[payload.get('action')]
+        except (KeyError, TypeError):
+            raise ActionError('Unknown action')
+        if not validator.is_valid(payload):
+            raise ActionError(error)
+        return func
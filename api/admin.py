@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import CustomUser, Task
+from .models import CustomUser, Task, TaskReport, UserTaskStats
 
 
 @admin.register(CustomUser)
@@ -12,4 +12,14 @@ class CustomUserAdmin(admin.ModelAdmin):
 class TaskAdmin(admin.ModelAdmin):
     list_display = ('title', 'user', 'completed', 'created_at')
     search_fields = ('title',)
-    list_filter = ('completed', 'user')
\ No newline at end of file
+    list_filter = ('completed', 'user')
+
+@admin.register(TaskReport)
+class TaskReportAdmin(admin.ModelAdmin):
+    list_display = ('id', 'scope', 'params', 'created_at')
+    list_filter = ('scope',)
+
+@admin.register(UserTaskStats)
+class UserTaskStatsAdmin(admin.ModelAdmin):
+    list_display = ('user', 'total', 'completed', 'shared_with_me', 'last_modified')
+    search_fields = ('user__email',)
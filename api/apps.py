@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        # media реєструє перевірку api.W001, schema — розширення drf-spectacular для CachedJWTAuthentication
+        from . import media, schema, signals  # noqa: F401
@@ -0,0 +1,178 @@
+import hashlib
+import io
+import logging
+import posixpath
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models import Q
+from django.utils import timezone
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .models import CustomUser
+from .user_cache import get_user_cache
+
+logger = logging.getLogger(__name__)
+
+ALLOWED_FORMATS = {'JPEG', 'PNG', 'WEBP', 'GIF'}
+
+# Формат Pillow, розширення і параметри кодування варіантів
+ENCODERS = {
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 6}),
+    'jpeg': ('JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+    'png': ('PNG', 'png', {'optimize': True}),
+}
+
+
+def get_avatar_config():
+    """Налаштування settings.AVATAR_PIPELINE зі значеннями за замовчуванням."""
+    return {
+        'MAX_UPLOAD_BYTES': 5 * 1024 * 1024,
+        'MAX_PIXELS': 40_000_000,
+        'ORIGINAL_MAX_SIZE': 1024,
+        'SIZES': (40, 80, 160, 320),
+        'FORMATS': ('webp', 'jpeg'),
+        **getattr(settings, 'AVATAR_PIPELINE', {}),
+    }
+
+
+def check_avatar_upload(file):
+    """Перевіряє розмір, формат і кількість пікселів завантаженого аватара до збереження."""
+    config = get_avatar_config()
+    if file.size > config['MAX_UPLOAD_BYTES']:
+        raise ValidationError(f"Avatar must not exceed {config['MAX_UPLOAD_BYTES'] // 1024} KB", code='file_too_large')
+    try:
+        file.seek(0)
+        with Image.open(file) as image:
+            # Лише заголовок: розміри відомі без розпакування всього зображення
+            if image.format not in ALLOWED_FORMATS:
+                raise ValidationError(f"Unsupported avatar format: {image.format}", code='invalid_format')
+            if image.width * image.height > config['MAX_PIXELS']:
+                raise ValidationError('Avatar dimensions are too large', code='too_many_pixels')
+            image.verify()
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        raise ValidationError('Upload a valid image', code='invalid_image')
+    finally:
+        file.seek(0)
+    return file
+
+
+def variant_dir(user_id):
+    return f'avatars/{user_id}'
+
+
+def encode(image, fmt):
+    pillow_format, extension, options = ENCODERS[fmt]
+    if pillow_format == 'JPEG' and image.mode != 'RGB':
+        # JPEG без прозорості: накладаємо на білий фон
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A') if image.mode == 'RGBA' else None)
+        image = background
+    buffer = io.BytesIO()
+    # info/exif не передаються, тож EXIF, ICC і текстові чанки не потрапляють у файл
+    image.save(buffer, pillow_format, **options)
+    return buffer.getvalue(), extension
+
+
+def render_avatar(file):
+    """Готує очищений оригінал і квадратні варіанти всіх розмірів і форматів.
+
+    Повертає (original, variants), де original — (bytes, розширення), а
+    variants — {розмір: {формат: (bytes, розширення)}}.
+    """
+    config = get_avatar_config()
+    with Image.open(file) as source:
+        source_format = source.format
+        # Орієнтацію з EXIF застосовуємо до пікселів, бо сам EXIF буде відкинуто
+        image = ImageOps.exif_transpose(source)
+        image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+
+    original = image.copy()
+    original.thumbnail((config['ORIGINAL_MAX_SIZE'], config['ORIGINAL_MAX_SIZE']), Image.LANCZOS)
+    original_format = {'JPEG': 'jpeg', 'WEBP': 'webp'}.get(source_format, 'png')
+
+    variants = {}
+    for size in config['SIZES']:
+        square = ImageOps.fit(image, (size, size), Image.LANCZOS)
+        variants[str(size)] = {fmt: encode(square, fmt) for fmt in config['FORMATS']}
+    return encode(original, original_format), variants
+
+
+def store(user_id, data, extension, suffix=''):
+    # Ім'я з хешу вмісту: файл ніколи не змінюється, тож його можна кешувати назавжди
+    digest = hashlib.blake2b(data, digest_size=8).hexdigest()
+    name = f'{variant_dir(user_id)}/{digest}{suffix}.{extension}'
+    if not default_storage.exists(name):
+        default_storage.save(name, ContentFile(data))
+    return name
+
+
+def remove_unreferenced(user_id, keep):
+    directory = variant_dir(user_id)
+    try:
+        _, files = default_storage.listdir(directory)
+    except FileNotFoundError:
+        return
+    for filename in files:
+        name = posixpath.join(directory, filename)
+        if name not in keep:
+            default_storage.delete(name)
+
+
+def build_avatar_variants(user_id, avatar_name):
+    """Обробляє завантажений аватар користувача поза запитом.
+
+    Замінює сире завантаження очищеним оригіналом і зберігає варіанти в
+    avatar_variants. Якщо поки задача працювала, користувач завантажив інший
+    аватар, результат відкидається — новий аватар обробить наступна задача.
+    """
+    if not avatar_name:
+        # Аватар видалено: прибираємо залишки попередніх варіантів
+        if CustomUser.objects.filter(pk=user_id).exclude(Q(avatar='') | Q(avatar__isnull=True)).exists():
+            return 'skipped'
+        remove_unreferenced(user_id, keep=set())
+        return 'cleared'
+
+    with default_storage.open(avatar_name) as file:
+        (original_data, original_ext), rendered = render_avatar(file)
+
+    original_name = store(user_id, original_data, original_ext)
+    variants = {
+        size: {fmt: store(user_id, data, extension, f'-{size}') for fmt, (data, extension) in formats.items()}
+        for size, formats in rendered.items()
+    }
+    keep = {original_name, *(name for formats in variants.values() for name in formats.values())}
+
+    # update() оминає post_save, тому updated_at (ETag профілю) і кеш користувачів оновлюємо самі.
+    # Задача виконується в celery, тож invalidate() має дійти до кешів воркерів web (канал
+    # USER_CACHE['INVALIDATION']) ще до видалення сирого файлу, на який вони посилаються
+    updated = CustomUser.objects.filter(pk=user_id, avatar=avatar_name).update(
+        avatar=original_name, avatar_variants=variants, updated_at=timezone.now(),
+    )
+    if updated:
+        get_user_cache().invalidate(user_id)
+    if not updated:
+        logger.info(f"Avatar of user {user_id} changed during processing, discarding variants")
+        # Зберігаємо лише те, на що посилається поточний стан (його могла записати новіша задача)
+        current = CustomUser.objects.filter(pk=user_id).values('avatar', 'avatar_variants').first() or {}
+        keep = {current.get('avatar'), *(
+            name for formats in (current.get('avatar_variants') or {}).values() for name in formats.values()
+        )}
+    remove_unreferenced(user_id, keep)
+    # Сире завантаження більше ні на що не посилається
+    if avatar_name not in keep and default_storage.exists(avatar_name):
+        default_storage.delete(avatar_name)
+    return 'processed' if updated else 'superseded'
+
+
+def avatar_variant_urls(user, request=None):
+    """{розмір: {формат: URL}} для серіалізаторів; абсолютні URL, якщо є request (як у FileField DRF)."""
+    urls = {}
+    for size, formats in (user.avatar_variants or {}).items():
+        urls[size] = {}
+        for fmt, name in formats.items():
+            url = default_storage.url(name)
+            urls[size][fmt] = request.build_absolute_uri(url) if request is not None else url
+    return urls
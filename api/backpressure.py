@@ -0,0 +1,131 @@
+import asyncio
+import itertools
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+
+# Лічильники процесу для /api/metrics/
+flow_stats = Counter()
+
+
+class TokenBucket:
+    """Класичне відро токенів: rate токенів за секунду, не більше burst накопичених."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+
+    def consume(self, tokens=1):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens < tokens:
+            return False
+        self.tokens -= tokens
+        return True
+
+    def retry_after(self, tokens=1):
+        return max(0.0, (tokens - self.tokens) / self.rate)
+
+
+class UserBuckets:
+    """Відра користувачів, спільні для всіх їхніх з'єднань у процесі (LRU за розміром)."""
+
+    def __init__(self, rate, burst, max_size=10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()
+
+    def get(self, user_id):
+        with self._lock:
+            bucket = self._buckets.get(user_id)
+            if bucket is None:
+                bucket = self._buckets[user_id] = TokenBucket(self.rate, self.burst)
+                while len(self._buckets) > self.max_size:
+                    self._buckets.popitem(last=False)
+            self._buckets.move_to_end(user_id)
+            return bucket
+
+
+class OutboundQueue:
+    """Обмежена черга вихідних повідомлень з'єднання з окремою задачею-писачем.
+
+    Повідомлення з однаковим ключем (наприклад, оновлення тієї самої задачі)
+    зливаються: у черзі лишається остання версія на місці першої. Якщо клієнт
+    не встигає читати і черга переповнюється, її вміст відкидається і замість
+    нього надсилається overflow_message (resync_required) — клієнт досинхронізується
+    з буфера повторів або REST, а пам'ять сервера не росте.
+    """
+
+    def __init__(self, send, max_size=100):
+        self.send = send
+        self.max_size = max_size
+        self._pending = OrderedDict()
+        self._counter = itertools.count()
+        self._ready = asyncio.Event()
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._write())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+
+    def put(self, message, key=None, overflow_message=None):
+        if key is not None and key in self._pending:
+            self._pending[key] = message
+            flow_stats['coalesced'] += 1
+            return
+        if len(self._pending) >= self.max_size:
+            flow_stats['dropped'] += len(self._pending)
+            flow_stats['overflows'] += 1
+            self._pending.clear()
+            if overflow_message is not None:
+                self._pending[('overflow', next(self._counter))] = overflow_message
+        self._pending[key if key is not None else next(self._counter)] = message
+        self._ready.set()
+
+    def discard(self, key):
+        if self._pending.pop(key, None) is not None:
+            flow_stats['coalesced'] += 1
+
+    def __len__(self):
+        return len(self._pending)
+
+    async def _write(self):
+        while True:
+            await self._ready.wait()
+            while self._pending:
+                _, message = self._pending.popitem(last=False)
+                # Для повільного клієнта send чекає на сервер, і черга за цей час наповнюється
+                await self.send(message)
+            self._ready.clear()
+
+
+def get_rate_limit_config():
+    """Налаштування settings.WEBSOCKET_RATE_LIMIT зі значеннями за замовчуванням."""
+    config = getattr(settings, 'WEBSOCKET_RATE_LIMIT', {})
+    return {
+        'CONNECTION': {'RATE': 10, 'BURST': 20, **config.get('CONNECTION', {})},
+        'USER': {'RATE': 20, 'BURST': 40, **config.get('USER', {})},
+        'MODE': config.get('MODE', 'throttle'),
+        'OUTBOUND_QUEUE_SIZE': config.get('OUTBOUND_QUEUE_SIZE', 100),
+    }
+
+
+_user_buckets = None
+
+
+def get_user_buckets():
+    global _user_buckets
+    if _user_buckets is None:
+        config = get_rate_limit_config()['USER']
+        _user_buckets = UserBuckets(config['RATE'], config['BURST'])
+    return _user_buckets
@@ -0,0 +1,76 @@
+from collections import defaultdict
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+
+from .models import Task
+from .replay import get_replay_buffer
+
+
+def user_group_name(user_id):
+    """Група каналів конкретного користувача (усі його вкладки/пристрої)."""
+    return f'tasks_user_{user_id}'
+
+
+def task_recipients(owners):
+    """Повертає {task_id: {user_id, ...}} — власник і всі, з ким задачу поширено.
+
+    owners — {task_id: user_id власника}; виконується один запит до shared_with.
+    """
+    recipients = {task_id: {owner_id} for task_id, owner_id in owners.items()}
+    shared = Task.shared_with.through.objects.filter(task_id__in=list(owners)).values_list('task_id', 'customuser_id')
+    for task_id, user_id in shared:
+        recipients[task_id].add(user_id)
+    return recipients
+
+
+def task_with_recipients(task_id):
+    """Одним запитом (LEFT JOIN на shared_with) повертає дані задачі разом з отримувачами.
+
+    Повертає dict з полями задачі, user_id і множиною recipients або None.
+    """
+    rows = list(
+        Task.objects.filter(id=task_id).values('id', 'title', 'description', 'completed', 'user_id', 'shared_with')
+    )
+    if not rows:
+        return None
+    task = {key: value for key, value in rows[0].items() if key != 'shared_with'}
+    task['recipients'] = {task['user_id']} | {row['shared_with'] for row in rows if row['shared_with'] is not None}
+    return task
+
+
+async def send_to_users(user_ids, event, channel_layer=None):
+    """Надсилає подію лише в групи отримувачів, а не всім підключеним сокетам.
+
+    Кожен отримувач одержує подію зі своїм seq з буфера повторів.
+    """
+    channel_layer = channel_layer or get_channel_layer()
+    buffer = get_replay_buffer()
+    for user_id in user_ids:
+        seq = await buffer.aappend(user_id, event)
+        await channel_layer.group_send(user_group_name(user_id), {**event, 'seq': seq})
+
+
+def send_to_users_sync(user_ids, event):
+    async_to_sync(send_to_users)(user_ids, event)
+
+
+def broadcast_task_changes(changes):
+    """Розсилає пакет змін: кожен отримувач одержує одне повідомлення зі своїми змінами.
+
+    changes — список пар (отримувачі, зміна).
+    """
+    per_user = defaultdict(list)
+    for user_ids, change in changes:
+        for user_id in user_ids:
+            per_user[user_id].append(change)
+    channel_layer = get_channel_layer()
+    buffer = get_replay_buffer()
+    for user_id, user_changes in per_user.items():
+        event = {
+            'type': 'task_message',
+            'action': 'batch',
+            'changes': user_changes,
+        }
+        seq = buffer.append(user_id, event)
+        async_to_sync(channel_layer.group_send)(user_group_name(user_id), {**event, 'seq': seq})
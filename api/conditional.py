@@ -0,0 +1,94 @@
+import functools
+import hashlib
+from datetime import timezone as dt_timezone
+
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from .task_events import aget_task_version, get_task_version
+
+
+def task_version(request):
+    """(version, last_modified) задач користувача; читається один раз на запит."""
+    if not hasattr(request, '_task_version'):
+        request._task_version = get_task_version(request.user.id)
+    return request._task_version
+
+
+async def atask_version(request):
+    """Асинхронно читає версію задач, після чого task_version() вже не звертається до БД."""
+    if not hasattr(request, '_task_version'):
+        request._task_version = await aget_task_version(request.user.id)
+    return request._task_version
+
+
+def acondition(etag_func=None, last_modified_func=None, prefetch=None):
+    """Аналог django.views.decorators.http.condition для async-методів AsyncAPIView.
+
+    etag_func і last_modified_func лишаються синхронними, тож усе, що їм
+    потрібно з БД, заздалегідь читає корутина prefetch(request).
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        async def inner(view, request, *args, **kwargs):
+            if prefetch is not None:
+                await prefetch(request)
+            last_modified = last_modified_func(request, *args, **kwargs) if last_modified_func else None
+            if last_modified is not None:
+                if not timezone.is_aware(last_modified):
+                    last_modified = timezone.make_aware(last_modified, dt_timezone.utc)
+                last_modified = int(last_modified.timestamp())
+            etag = etag_func(request, *args, **kwargs) if etag_func else None
+            etag = quote_etag(etag) if etag is not None else None
+
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = await method(view, request, *args, **kwargs)
+            if request.method in ('GET', 'HEAD'):
+                if last_modified and not response.has_header('Last-Modified'):
+                    response.headers['Last-Modified'] = http_date(last_modified)
+                if etag:
+                    response.headers.setdefault('ETag', etag)
+            return response
+        return inner
+    return decorator
+
+
+def query_digest(request):
+    """Хеш параметрів запиту; порядок параметрів на нього не впливає."""
+    query = '&'.join(f'{key}={value}' for key, value in sorted(request.GET.items()))
+    return hashlib.blake2b(query.encode(), digest_size=8).hexdigest()
+
+
+def task_list_etag(request, *args, **kwargs):
+    version, _ = task_version(request)
+    return f'tasks-{request.user.id}-{version}-{query_digest(request)}'
+
+
+def task_detail_etag(request, pk, *args, **kwargs):
+    version, _ = task_version(request)
+    return f'task-{pk}-{request.user.id}-{version}'
+
+
+def shared_tasks_etag(request, *args, **kwargs):
+    version, _ = task_version(request)
+    return f'shared-{request.user.id}-{version}'
+
+
+def task_search_etag(request, *args, **kwargs):
+    version, _ = task_version(request)
+    return f'search-{request.user.id}-{version}-{query_digest(request)}'
+
+
+def task_last_modified(request, *args, **kwargs):
+    return task_version(request)[1]
+
+
+def profile_etag(request, *args, **kwargs):
+    # Користувач уже в кеші автентифікації, тож ETag профілю не потребує запиту до БД
+    return f'profile-{request.user.id}-{request.user.updated_at.timestamp()}'
+
+
+def profile_last_modified(request, *args, **kwargs):
+    return request.user.updated_at
@@ -0,0 +1,128 @@
+import asyncio
+import json
+import logging
+import time
+from collections import Counter
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Код закриття для з'єднань, які не відповідали на ping довше за IDLE_TIMEOUT
+IDLE_CLOSE_CODE = 4408
+
+
+class ConnectionRegistry:
+    """Реєстр WebSocket-з'єднань процесу з heartbeat і прибиранням мертвих сокетів.
+
+    Одна фонова задача на процес раз на ping_interval надсилає живим з'єднанням
+    ping (через consumer.heartbeat()), а ті, від кого нічого не надходило довше
+    за idle_timeout, прибирає: виводить з груп channel layer, виконує звичайний
+    disconnect() (присутність, is_online) і закриває сокет.
+    """
+
+    def __init__(self, ping_interval=20, idle_timeout=60):
+        self.ping_interval = ping_interval
+        self.idle_timeout = idle_timeout
+        self.connections = {}
+        self.last_seen = {}
+        self.reaped = 0
+        self._task = None
+
+    def register(self, consumer):
+        self.connections[consumer.channel_name] = consumer
+        self.last_seen[consumer.channel_name] = time.monotonic()
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            self._task = loop.create_task(self._run())
+
+    def unregister(self, consumer):
+        self.last_seen.pop(consumer.channel_name, None)
+        return self.connections.pop(consumer.channel_name, None) is not None
+
+    def touch(self, consumer):
+        if consumer.channel_name in self.last_seen:
+            self.last_seen[consumer.channel_name] = time.monotonic()
+
+    async def _run(self):
+        while self.connections:
+            await asyncio.sleep(self.ping_interval)
+            await self.check()
+
+    async def check(self):
+        """Один прохід heartbeat: ping живим, reap тим, хто мовчить довше idle_timeout."""
+        deadline = time.monotonic() - self.idle_timeout
+        for channel_name, consumer in list(self.connections.items()):
+            if self.last_seen.get(channel_name, 0) < deadline:
+                await self.reap(consumer)
+                continue
+            try:
+                await consumer.heartbeat()
+            except Exception as e:
+                logger.error(f"Error sending heartbeat to {channel_name}: {str(e)}")
+
+    async def reap(self, consumer):
+        if not self.unregister(consumer):
+            return
+        self.reaped += 1
+        logger.info(f"Reaping idle WebSocket connection {consumer.channel_name}")
+        try:
+            await consumer.disconnect(IDLE_CLOSE_CODE)
+            await consumer.close(code=IDLE_CLOSE_CODE)
+        except Exception as e:
+            logger.error(f"Error reaping {consumer.channel_name}: {str(e)}")
+
+    def stats(self):
+        groups = Counter(group for consumer in self.connections.values() for group in consumer.joined_groups)
+        return {
+            'sockets': len(self.connections),
+            'consumers': dict(Counter(type(consumer).__name__ for consumer in self.connections.values())),
+            'groups': dict(groups),
+            'reaped': self.reaped,
+        }
+
+
+class HeartbeatMixin:
+    """Домішка для AsyncWebsocketConsumer: облік груп, heartbeat і реєстрація в ConnectionRegistry.
+
+    Будь-яке вхідне повідомлення (зокрема {"action": "pong"}) оновлює час
+    останньої активності з'єднання.
+    """
+
+    async def join_group(self, group):
+        await self.channel_layer.group_add(group, self.channel_name)
+        self.joined_groups = {*getattr(self, 'joined_groups', ()), group}
+
+    async def leave_groups(self):
+        for group in getattr(self, 'joined_groups', ()):
+            await self.channel_layer.group_discard(group, self.channel_name)
+        self.joined_groups = set()
+
+    def start_heartbeat(self):
+        self.joined_groups = getattr(self, 'joined_groups', set())
+        get_connection_registry().register(self)
+
+    def stop_heartbeat(self):
+        get_connection_registry().unregister(self)
+
+    async def websocket_receive(self, message):
+        get_connection_registry().touch(self)
+        await super().websocket_receive(message)
+
+    async def heartbeat(self):
+        await self.send(text_data=json.dumps({'action': 'ping'}))
+
+
+_registry = None
+
+
+def get_connection_registry():
+    """Повертає реєстр з'єднань процесу, налаштований у settings.WEBSOCKET_HEARTBEAT."""
+    global _registry
+    if _registry is None:
+        config = getattr(settings, 'WEBSOCKET_HEARTBEAT', {})
+        _registry = ConnectionRegistry(
+            ping_interval=config.get('PING_INTERVAL', 20),
+            idle_timeout=config.get('IDLE_TIMEOUT', 60),
+        )
+    return _registry
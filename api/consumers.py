@@ -1,23 +1,70 @@
 import json
 import logging
+import msgpack
+from urllib.parse import parse_qs
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from django.db import transaction
+from django.utils import timezone
 from .models import Task, CustomUser
+from .broadcast import user_group_name, task_with_recipients, send_to_users
+from .presence import get_presence_store, get_presence_broadcaster
+from .actions import ActionRegistry, ActionError
+from .task_events import TaskEvents
+from .replay import get_replay_buffer
+from .connections import HeartbeatMixin
+from .backpressure import OutboundQueue, TokenBucket, flow_stats, get_rate_limit_config, get_user_buckets
 
 logger = logging.getLogger(__name__)
 
-class TaskConsumer(AsyncWebsocketConsumer):
+MSGPACK_SUBPROTOCOL = 'msgpack'
+# Код закриття при перевищенні ліміту дій у режимі MODE='close'
+RATE_LIMIT_CLOSE_CODE = 4429
+# Id задачі — додатне ціле в межах bigint або рядок з його цифрами; обробники приводять його до int
+TASK_ID_SCHEMA = {'anyOf': [
+    {'type': 'integer', 'minimum': 1, 'maximum': 2 ** 63 - 1},
+    {'type': 'string', 'pattern': '^[1-9][0-9]{0,17}$'},
+]}
+TASK_UPDATE_FIELDS = ('title', 'description', 'completed')
+
+actions = ActionRegistry()
+
+
+def task_payload(task, **extra):
+    """Представлення задачі у WebSocket-повідомленнях (модель або dict з task_with_recipients)."""
+    if isinstance(task, dict):
+        data = {key: task[key] for key in ('id', 'title', 'description', 'completed')}
+    else:
+        data = {'id': task.id, 'title': task.title, 'description': task.description, 'completed': task.completed}
+    data.update(extra)
+    return data
+
+
+class TaskConsumer(HeartbeatMixin, AsyncWebsocketConsumer):
+    use_msgpack = False
+
     async def connect(self):
         self.user = self.scope['user']
         logger.info(f"Connecting user: {self.user}, authenticated: {self.user is not None and self.user.is_authenticated}")
         if self.user is not None and self.user.is_authenticated:
-            self.group_name = 'tasks'
+            # Кожен користувач має власну групу, тож події задач не розсилаються всім сокетам
+            self.group_name = user_group_name(self.user.id)
             logger.info(f"Adding to group: {self.group_name}, channel: {self.channel_name}")
             try:
-                await self.set_user_online()
-                await self.channel_layer.group_add(self.group_name, self.channel_name)
-                await self.accept()
-                await self.update_online_users()
+                became_online = await self.set_user_online()
+                await self.join_group(self.group_name)
+                # Клієнт може запросити бінарний субпротокол msgpack замість JSON
+                self.use_msgpack = MSGPACK_SUBPROTOCOL in self.scope.get('subprotocols', [])
+                await self.accept(subprotocol=MSGPACK_SUBPROTOCOL if self.use_msgpack else None)
+                self.start_heartbeat()
+                self.rate_limit = get_rate_limit_config()
+                self.bucket = TokenBucket(self.rate_limit['CONNECTION']['RATE'], self.rate_limit['CONNECTION']['BURST'])
+                # Події груп ідуть клієнту через обмежену чергу з окремим писачем
+                self.outbound = OutboundQueue(self.send_message, self.rate_limit['OUTBOUND_QUEUE_SIZE'])
+                self.outbound.start()
+                if became_online:
+                    get_presence_broadcaster().joined(self.user.email)
+                await self.resume()
             except Exception as e:
                 logger.error(f"Error in connect: {str(e)}")
                 await self.close(code=1011)
@@ -29,326 +76,291 @@ class TaskConsumer(AsyncWebsocketConsumer):
         if self.user is not None and self.user.is_authenticated:
             logger.info(f"Disconnecting user: {self.user}, close code: {close_code}")
             try:
-                await self.channel_layer.group_discard(self.group_name, self.channel_name)
-                await self.set_user_offline()
-                await self.update_online_users()
+                self.stop_heartbeat()
+                if getattr(self, 'outbound', None):
+                    self.outbound.stop()
+                await self.leave_groups()
+                if await self.set_user_offline():
+                    get_presence_broadcaster().left(self.user.email)
             except Exception as e:
                 logger.error(f"Error in disconnect: {str(e)}")
         else:
             logger.warning("Disconnecting unauthenticated user")
 
-    async def receive(self, text_data):
-        logger.info(f"Received message: {text_data}")
+    async def resume(self):
+        """Досилає події, пропущені з last_seq (параметр URL), і повідомляє поточний seq.
+
+        Група вже підключена, тож живі події можуть прийти під час повтору:
+        клієнт відкидає повідомлення з seq, не більшим за вже оброблений.
+        Повтор іде напряму, а не через OutboundQueue: пропуск більший за її
+        розмір інакше переповнив би чергу посеред повтору. Обробники consumer
+        виконуються по черзі, тож живі події дочекаються кінця повтору.
+        """
+        buffer = get_replay_buffer()
+        params = parse_qs(self.scope.get('query_string', b'').decode())
         try:
-            text_data_json = json.loads(text_data)
-            action = text_data_json.get('action')
-            logger.info(f"Action: {action}")
-
-            if action == 'create_task':
-                title = text_data_json.get('title')
-                description = text_data_json.get('description', '')
-                completed = text_data_json.get('completed', False)
-                logger.info(f"Creating task: title={title}, description={description}, completed={completed}")
-
-                if not title:
-                    logger.warning("Title is empty")
-                    await self.send(text_data=json.dumps({
-                        'error': 'Title is required'
-                    }))
-                    return
-
-                task = await self.create_task(title, description, completed)
-                logger.info(f"Task created: {task.id}")
-
-                await self.channel_layer.group_send(
-                    self.group_name,
-                    {
-                        'type': 'task_message',
-                        'action': 'create_task',
-                        'task': {
-                            'id': task.id,
-                            'title': task.title,
-                            'description': task.description,
-                            'completed': task.completed,
-                            'user': self.user.email,
-                        }
-                    }
-                )
-                logger.info("Task message sent to group")
-
-            elif action == 'share_task':
-                task_id = text_data_json.get('task_id')
-                email = text_data_json.get('email')
-                logger.info(f"Sharing task: task_id={task_id}, email={email}")
-
-                if not task_id or not email:
-                    logger.warning("Task ID or email is missing")
-                    await self.send(text_data=json.dumps({
-                        'error': 'Task ID and email are required'
-                    }))
-                    return
-
-                task_data = await self.get_task(task_id)
-                if not task_data:
-                    logger.warning(f"Task {task_id} not found")
-                    await self.send(text_data=json.dumps({
-                        'error': 'Task not found'
-                    }))
-                    return
-
-                if task_data['user_id'] != self.user.id:
-                    logger.warning(f"User {self.user.email} is not the owner of task {task_id}")
-                    await self.send(text_data=json.dumps({
-                        'error': 'You can only share your own tasks'
-                    }))
-                    return
-
-                target_user = await self.get_user_by_email(email)
-                if not target_user:
-                    logger.warning(f"User with email {email} not found")
-                    await self.send(text_data=json.dumps({
-                        'error': 'User not found'
-                    }))
-                    return
-
-                if target_user.id == self.user.id:
-                    logger.warning(f"User {self.user.email} tried to share task with themselves")
-                    await self.send(text_data=json.dumps({
-                        'error': 'You cannot share a task with yourself'
-                    }))
-                    return
-
-                await self.share_task_with_user(task_id, target_user.id)
-                logger.info(f"Task {task_id} shared with {email}")
-
-                await self.channel_layer.group_send(
-                    self.group_name,
-                    {
-                        'type': 'task_message',
-                        'action': 'share_task',
-                        'task': {
-                            'id': task_data['id'],
-                            'title': task_data['title'],
-                            'description': task_data['description'],
-                            'completed': task_data['completed'],
-                            'user': self.user.email,
-                            'shared_with': email,
-                        }
-                    }
-                )
-                logger.info("Share task message sent to group")
-
-            elif action == 'update_task':
-                task_data = text_data_json.get('task')
-                task_id = task_data.get('id')
-                logger.info(f"Updating task: task_id={task_id}")
-
-                if not task_id:
-                    logger.warning("Task ID is missing")
-                    await self.send(text_data=json.dumps({
-                        'error': 'Task ID is required'
-                    }))
-                    return
-
-                task_info = await self.get_task(task_id)
-                if not task_info:
-                    logger.warning(f"Task {task_id} not found")
-                    await self.send(text_data=json.dumps({
-                        'error': 'Task not found'
-                    }))
-                    return
-
-                if task_info['user_id'] != self.user.id:
-                    logger.warning(f"User {self.user.email} is not the owner of task {task_id}")
-                    await self.send(text_data=json.dumps({
-                        'error': 'You can only update your own tasks'
-                    }))
-                    return
-
-                updated_task = await self.update_task(
-                    task_id,
-                    task_data.get('title', task_info['title']),
-                    task_data.get('description', task_info['description']),
-                    task_data.get('completed', task_info['completed'])
-                )
-                logger.info(f"Task {task_id} updated")
-
-                await self.channel_layer.group_send(
-                    self.group_name,
-                    {
-                        'type': 'task_message',
-                        'action': 'update_task',
-                        'task': {
-                            'id': updated_task.id,
-                            'title': updated_task.title,
-                            'description': updated_task.description,
-                            'completed': updated_task.completed,
-                        }
-                    }
-                )
-                logger.info("Update task message sent to group")
-
-            elif action == 'delete_task':
-                task_id = text_data_json.get('task_id')
-                logger.info(f"Processing delete task: task_id={task_id}")
-
-                if not task_id:
-                    logger.warning("Task ID is missing")
-                    await self.send(text_data=json.dumps({
-                        'error': 'Task ID is required'
-                    }))
-                    return
-
-                # Перевіряємо права власника, але не видаляємо повторно, якщо API вже видалив
-                task_info = await self.get_task(task_id)
-                if task_info and task_info['user_id'] != self.user.id:
-                    logger.warning(f"User {self.user.email} is not the owner of task {task_id}")
-                    await self.send(text_data=json.dumps({
-                        'error': 'You can only delete your own tasks'
-                    }))
-                    return
-
-                # Якщо задача вже видалена через API, просто сповіщаємо групу
-                await self.channel_layer.group_send(
-                    self.group_name,
-                    {
-                        'type': 'task_message',
-                        'action': 'delete_task',
-                        'task_id': task_id,
-                    }
-                )
-                logger.info("Delete task message sent to group")
-
-        except json.JSONDecodeError as e:
-            logger.error(f"JSON decode error: {str(e)}")
-            await self.send(text_data=json.dumps({
-                'error': 'Invalid JSON format'
-            }))
-        except Exception as e:
-            logger.error(f"Error in receive: {str(e)}")
-            await self.send(text_data=json.dumps({
-                'error': f'Error processing request: {str(e)}'
-            }))
-
-    async def task_message(self, event):
-        logger.info(f"Sending task message to client: {event}")
-        await self.send(text_data=json.dumps({
+            last_seq = int(params['last_seq'][0])
+        except (KeyError, ValueError):
+            last_seq = None
+        if last_seq is not None:
+            events = await buffer.asince(self.user.id, last_seq)
+            if events is None:
+                # Після resync_required клієнт синхронізується через REST, тож більше нічого не шлемо
+                await self.send_message({'action': 'resync_required', 'seq': await buffer.acurrent_seq(self.user.id)})
+                return
+            for event in events:
+                await self.send_message(self.make_task_message(event))
+            logger.info(f"Replayed {len(events)} events to user {self.user.id} after seq {last_seq}")
+        await self.send_message({'action': 'sync', 'seq': await buffer.acurrent_seq(self.user.id)})
+
+    async def receive(self, text_data=None, bytes_data=None):
+        try:
+            if bytes_data is not None:
+                payload = msgpack.unpackb(bytes_data)
+            else:
+                payload = json.loads(text_data)
+        except (ValueError, msgpack.UnpackException) as e:
+            logger.error(f"Message decode error: {str(e)}")
+            await self.send_error('Invalid JSON format')
+            return
+        logger.debug(f"Received message: {payload}")
+        if not (isinstance(payload, dict) and payload.get('action') == 'pong') and not self.allow_action():
+            await self.reject_over_limit()
+            return
+        try:
+            handler = actions.resolve(payload)
+            await handler(self, payload)
+        except ActionError as e:
+            logger.warning(f"Action rejected for user {self.user.email}: {e}")
+            await self.send_error(str(e))
+        except Exception:
+            # Подробиці лише в лог: текст винятку може розкривати SQL чи внутрішню структуру
+            logger.exception(f"Error in receive for user {self.user.email}")
+            await self.send_error('Error processing request')
+
+    def allow_action(self):
+        # Ліміт з'єднання і спільний ліміт усіх з'єднань користувача в цьому процесі
+        return self.bucket.consume() and get_user_buckets().get(self.user.id).consume()
+
+    async def reject_over_limit(self):
+        flow_stats['throttled'] += 1
+        logger.warning(f"Rate limit exceeded for user {self.user.email}")
+        if self.rate_limit['MODE'] == 'close':
+            await self.close(code=RATE_LIMIT_CLOSE_CODE)
+            return
+        retry_after = max(self.bucket.retry_after(), get_user_buckets().get(self.user.id).retry_after())
+        await self.send_message({'error': 'Rate limit exceeded', 'retry_after': round(retry_after, 2)})
+
+    async def send_message(self, message):
+        # Формат відповіді визначається субпротоколом, погодженим під час connect
+        if self.use_msgpack:
+            await self.send(bytes_data=msgpack.packb(message))
+        else:
+            await self.send(text_data=json.dumps(message))
+
+    async def send_error(self, error):
+        await self.send_message({'error': error})
+
+    @actions.register('create_task', {
+        'type': 'object',
+        'required': ['title'],
+        'properties': {
+            'title': {'type': 'string', 'minLength': 1},
+            'description': {'type': 'string'},
+            'completed': {'type': 'boolean'},
+        },
+    }, error='Title is required')
+    async def handle_create_task(self, data):
+        task = await self.create_task(data['title'], data.get('description', ''), data.get('completed', False))
+        logger.info(f"Task created: {task.id}")
+        # Нова задача ще ні з ким не поширена — повідомляємо лише власника
+        await self.broadcast([self.user.id], 'create_task', task=task_payload(task, user=self.user.email))
+
+    @actions.register('share_task', {
+        'type': 'object',
+        'required': ['task_id', 'email'],
+        'properties': {
+            'task_id': TASK_ID_SCHEMA,
+            'email': {'type': 'string', 'minLength': 1},
+        },
+    }, error='Task ID and email are required')
+    async def handle_share_task(self, data):
+        task = await self.share_owned_task(int(data['task_id']), data['email'])
+        logger.info(f"Task {task['id']} shared with {data['email']}")
+        await self.broadcast(task['recipients'], 'share_task',
+                             task=task_payload(task, user=self.user.email, shared_with=data['email']))
+
+    @actions.register('update_task', {
+        'type': 'object',
+        'required': ['task'],
+        'properties': {
+            'task': {
+                'type': 'object',
+                'required': ['id'],
+                'properties': {
+                    'id': TASK_ID_SCHEMA,
+                    'title': {'type': 'string', 'minLength': 1},
+                    'description': {'type': 'string'},
+                    'completed': {'type': 'boolean'},
+                },
+            },
+        },
+    }, error='Task ID is required')
+    async def handle_update_task(self, data):
+        changes = {field: data['task'][field] for field in TASK_UPDATE_FIELDS if field in data['task']}
+        task = await self.update_owned_task(int(data['task']['id']), changes)
+        logger.info(f"Task {task['id']} updated")
+        await self.broadcast(task['recipients'], 'update_task', task=task_payload(task))
+
+    @actions.register('delete_task', {
+        'type': 'object',
+        'required': ['task_id'],
+        'properties': {
+            'task_id': TASK_ID_SCHEMA,
+        },
+    }, error='Task ID is required')
+    async def handle_delete_task(self, data):
+        task_id = int(data['task_id'])
+        # Перевіряємо права власника, але не видаляємо повторно, якщо API вже видалив
+        task = await database_sync_to_async(task_with_recipients)(task_id)
+        if task and task['user_id'] != self.user.id:
+            raise ActionError('You can only delete your own tasks')
+        # Якщо задача вже видалена через API, просто сповіщаємо власника
+        recipients = task['recipients'] if task else [self.user.id]
+        await self.broadcast(recipients, 'delete_task', task_id=task_id)
+
+    @actions.register('pong', {'type': 'object'}, error='Invalid pong')
+    async def handle_pong(self, data):
+        # Відповідь на ping: час активності вже оновлено в websocket_receive
+        pass
+
+    async def broadcast(self, user_ids, action, **payload):
+        await send_to_users(user_ids, {'type': 'task_message', 'action': action, **payload}, self.channel_layer)
+        logger.info(f"{action} message sent to {len(user_ids)} recipient(s)")
+
+    @staticmethod
+    def make_task_message(event):
+        message = {
             'action': event['action'],
             'task': event['task'] if 'task' in event else None,
             'task_id': event['task_id'] if 'task_id' in event else None,
-        }))
+        }
+        if 'changes' in event:
+            message['changes'] = event['changes']
+        if 'seq' in event:
+            message['seq'] = event['seq']
+        return message
+
+    async def task_message(self, event):
+        logger.debug(f"Sending task message to client: {event}")
+        message = self.make_task_message(event)
+        # Кілька оновлень однієї задачі в черзі відстаючого клієнта зливаються в останнє,
+        # а видалення робить їх зайвими
+        key = None
+        if message['action'] == 'update_task' and message['task']:
+            key = ('task', message['task']['id'])
+        elif message['action'] == 'delete_task':
+            self.outbound.discard(('task', message['task_id']))
+        self.outbound.put(message, key=key, overflow_message={'action': 'resync_required', 'seq': event.get('seq')})
 
     @database_sync_to_async
     def create_task(self, title, description, completed):
         try:
-            task = Task.objects.create(
-                user=self.user,
-                title=title,
-                description=description,
-                completed=completed
-            )
+            with transaction.atomic():
+                task = Task.objects.create(
+                    user=self.user,
+                    title=title,
+                    description=description,
+                    completed=completed
+                )
+                events = TaskEvents()
+                events.created(self.user.id, task.id, task.completed)
+                events.commit()
             logger.info(f"Task created in DB: {task.id}")
             return task
         except Exception as e:
             logger.error(f"Error creating task in DB: {str(e)}")
             raise
 
-    @database_sync_to_async
-    def set_user_online(self):
+    async def set_user_online(self):
+        # is_online у БД оновлюється пакетно задачею sync_presence_to_db
         try:
-            self.user.is_online = True
-            self.user.save()
-            logger.info(f"User {self.user.email} set to online")
+            became_online = await get_presence_store().aconnect(self.user.id, self.channel_name, self.user.email)
+            logger.info(f"User {self.user.email} connected, became online: {became_online}")
+            return became_online
         except Exception as e:
             logger.error(f"Error setting user online: {str(e)}")
             raise
 
-    @database_sync_to_async
-    def set_user_offline(self):
+    async def set_user_offline(self):
         try:
-            self.user.is_online = False
-            self.user.save()
-            logger.info(f"User {self.user.email} set to offline")
+            became_offline = await get_presence_store().adisconnect(self.user.id, self.channel_name)
+            logger.info(f"User {self.user.email} disconnected, became offline: {became_offline}")
+            return became_offline
         except Exception as e:
             logger.error(f"Error setting user offline: {str(e)}")
             raise
 
-    @database_sync_to_async
-    def get_online_users(self):
-        try:
-            online_users = list(CustomUser.objects.filter(is_online=True).values_list('email', flat=True))
-            logger.info(f"Online users retrieved in TaskConsumer: {online_users}")
-            return online_users
-        except Exception as e:
-            logger.error(f"Error getting online users in TaskConsumer: {str(e)}")
-            return []
-
-    async def update_online_users(self):
-        try:
-            online_users = await self.get_online_users()
-            logger.info(f"Updating online users: {online_users}")
-            await self.channel_layer.group_send(
-                'admin_online',
-                {
-                    'type': 'online_users_message',
-                    'action': 'online_users',
-                    'users': online_users,
-                }
-            )
-            logger.info("Online users message sent to admin_online group")
-        except Exception as e:
-            logger.error(f"Error in update_online_users: {str(e)}")
-            raise
-
-    @database_sync_to_async
-    def get_task(self, task_id):
-        try:
-            task = Task.objects.select_related('user').get(id=task_id)
-            return {
-                'id': task.id,
-                'title': task.title,
-                'description': task.description,
-                'completed': task.completed,
-                'user_id': task.user.id,
-            }
-        except Task.DoesNotExist:
-            return None
+    async def heartbeat(self):
+        # Реєстр викликає heartbeat лише для живих сокетів — лише вони продовжують TTL присутності
+        await self.send_message({'action': 'ping'})
+        await get_presence_store().aheartbeat(self.user.id, self.channel_name)
 
     @database_sync_to_async
-    def get_user_by_email(self, email):
-        try:
-            return CustomUser.objects.get(email=email)
-        except CustomUser.DoesNotExist:
-            return None
-
-    @database_sync_to_async
-    def share_task_with_user(self, task_id, target_user_id):
-        try:
-            task = Task.objects.get(id=task_id)
-            target_user = CustomUser.objects.get(id=target_user_id)
-            task.shared_with.add(target_user)
-            task.save()
-            logger.info(f"Task {task.id} shared with {target_user.email}")
-        except Exception as e:
-            logger.error(f"Error sharing task: {str(e)}")
-            raise
+    def update_owned_task(self, task_id, changes):
+        # Перевірка власника і зміна — один UPDATE ... WHERE id AND user_id лише змінених полів
+        if changes:
+            # update() оминає auto_now, тому updated_at виставляємо явно
+            changes = {**changes, 'updated_at': timezone.now()}
+        with transaction.atomic():
+            owned = Task.objects.filter(id=task_id, user_id=self.user.id)
+            flipped = False
+            if 'completed' in changes:
+                # Умова на старе значення completed показує, чи треба правити лічильник виконаних
+                flipped = bool(owned.exclude(completed=changes['completed']).update(**changes))
+                other_changes = {field: value for field, value in changes.items() if field != 'completed'}
+                if not flipped and other_changes:
+                    owned.update(**other_changes)
+            elif changes:
+                owned.update(**changes)
+            task = task_with_recipients(task_id)
+            if task is None:
+                raise ActionError('Task not found')
+            if task['user_id'] != self.user.id:
+                raise ActionError('You can only update your own tasks')
+            events = TaskEvents()
+            if flipped:
+                events.updated(self.user.id, task_id, task['recipients'], not task['completed'], task['completed'])
+            else:
+                events.updated(self.user.id, task_id, task['recipients'])
+            events.commit()
+        return task
 
     @database_sync_to_async
-    def update_task(self, task_id, title, description, completed):
-        try:
-            task = Task.objects.get(id=task_id)
-            task.title = title
-            task.description = description
-            task.completed = completed
-            task.save()
-            logger.info(f"Task {task.id} updated in DB")
+    def share_owned_task(self, task_id, email):
+        task = task_with_recipients(task_id)
+        if task is None:
+            raise ActionError('Task not found')
+        if task['user_id'] != self.user.id:
+            raise ActionError('You can only share your own tasks')
+        target_user_id = CustomUser.objects.filter(email=email).values_list('id', flat=True).first()
+        if target_user_id is None:
+            raise ActionError('User not found')
+        if target_user_id == self.user.id:
+            raise ActionError('You cannot share a task with yourself')
+        if target_user_id in task['recipients']:
+            # Задача вже поширена з цим користувачем — нічого не змінюємо
             return task
-        except Task.DoesNotExist:
-            logger.error(f"Task {task_id} not found for update")
-            return None
-        except Exception as e:
-            logger.error(f"Error updating task in DB: {str(e)}")
-            raise
+        with transaction.atomic():
+            Task.shared_with.through.objects.bulk_create(
+                [Task.shared_with.through(task_id=task['id'], customuser_id=target_user_id)],
+                ignore_conflicts=True,
+            )
+            events = TaskEvents()
+            events.shared(self.user.id, task_id, task['recipients'], target_user_id)
+            events.commit()
+        task['recipients'].add(target_user_id)
+        return task
 
     @database_sync_to_async
     def delete_task(self, task_id):
@@ -363,20 +375,16 @@ class TaskConsumer(AsyncWebsocketConsumer):
             logger.error(f"Error deleting task in DB: {str(e)}")
             raise
 
-class OnlineUsersConsumer(AsyncWebsocketConsumer):
+class OnlineUsersConsumer(HeartbeatMixin, AsyncWebsocketConsumer):
     async def connect(self):
         self.user = self.scope['user']
         logger.info(f"Connecting admin user: {self.user}, is_staff: {self.user.is_staff if self.user else False}")
         if self.user and self.user.is_authenticated and self.user.is_staff:
-            await self.channel_layer.group_add('admin_online', self.channel_name)
+            await self.join_group('admin_online')
             await self.accept()
+            self.start_heartbeat()
             logger.info(f"Admin {self.user.email} connected to admin_online group")
-            online_users = await self.get_online_users()
-            logger.info(f"Sending initial online users list: {online_users}")
-            await self.send(text_data=json.dumps({
-                'action': 'online_users',
-                'users': online_users,
-            }))
+            await self.send_snapshot()
         else:
             logger.warning("User not admin or not authenticated, closing connection")
             await self.close(code=1008)
@@ -384,38 +392,64 @@ class OnlineUsersConsumer(AsyncWebsocketConsumer):
     async def disconnect(self, close_code):
         if self.user and self.user.is_authenticated and self.user.is_staff:
             logger.info(f"Disconnecting admin user: {self.user}, close code: {close_code}")
-            await self.channel_layer.group_discard('admin_online', self.channel_name)
+            self.stop_heartbeat()
+            await self.leave_groups()
 
-    async def online_users_message(self, event):
-        logger.info(f"Sending online users to admin: {event['users']}")
+    async def receive(self, text_data):
+        # Клієнт, що помітив пропуск у seq дельт, просить повний знімок
+        try:
+            action = json.loads(text_data).get('action')
+        except (json.JSONDecodeError, AttributeError):
+            action = None
+        if action == 'resync':
+            await self.send_snapshot()
+        elif action != 'pong':
+            await self.send(text_data=json.dumps({'error': 'Unknown action'}))
+
+    async def send_snapshot(self):
+        # seq читаємо до списку: усі дельти з більшим seq клієнт застосує поверх знімка
+        seq = await get_presence_store().acurrent_seq()
+        online_users = await self.get_online_users()
+        logger.info(f"Sending online users snapshot {seq}: {online_users}")
+        await self.send(text_data=json.dumps({
+            'action': 'online_users',
+            'users': online_users,
+            'seq': seq,
+        }))
+
+    async def online_users_delta(self, event):
+        logger.info(f"Sending online users delta {event['seq']} to admin")
         await self.send(text_data=json.dumps({
             'action': event['action'],
-            'users': event['users'],
+            'seq': event['seq'],
+            'joined': event['joined'],
+            'left': event['left'],
         }))
 
-    @database_sync_to_async
-    def get_online_users(self):
+    async def get_online_users(self):
         try:
-            online_users = list(CustomUser.objects.filter(is_online=True).values_list('email', flat=True))
+            online_users = sorted((await get_presence_store().aonline_users()).values())
             logger.info(f"Online users retrieved in OnlineUsersConsumer: {online_users}")
             return online_users
         except Exception as e:
             logger.error(f"Error getting online users in OnlineUsersConsumer: {str(e)}")
             return []
 
-class TaskStatusConsumer(AsyncWebsocketConsumer):
+class TaskStatusConsumer(HeartbeatMixin, AsyncWebsocketConsumer):
     async def connect(self):
         user = self.scope['user']
         if user and user.is_authenticated and user.is_staff:
-            await self.channel_layer.group_add('task_status', self.channel_name)
+            await self.join_group('task_status')
             await self.accept()
+            self.start_heartbeat()
             logger.info(f"Admin {user.email} connected to task_status group")
         else:
             logger.warning("User not admin or not authenticated, closing connection")
             await self.close(code=1008)
 
     async def disconnect(self, close_code):
-        await self.channel_layer.group_discard('task_status', self.channel_name)
+        self.stop_heartbeat()
+        await self.leave_groups()
 
     async def notify_task_status(self, event):
         await self.send(text_data=json.dumps({
@@ -424,14 +458,16 @@ class TaskStatusConsumer(AsyncWebsocketConsumer):
             'result': event['result'],
             'completed_at': event['completed_at'],
         }))
-class AdminNotificationConsumer(AsyncWebsocketConsumer):
+class AdminNotificationConsumer(HeartbeatMixin, AsyncWebsocketConsumer):
     async def connect(self):
-        await self.channel_layer.group_add("admin_notifications", self.channel_name)
+        await self.join_group("admin_notifications")
         await self.accept()
+        self.start_heartbeat()
         print("WebSocket connected")
 
     async def disconnect(self, close_code):
-        await self.channel_layer.group_discard("admin_notifications", self.channel_name)
+        self.stop_heartbeat()
+        await self.leave_groups()
         print("WebSocket disconnected")
 
     async def task_update(self, event):
@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+def get_hasher_params():
+    """Налаштування settings.PASSWORD_HASHER_PARAMS зі значеннями за замовчуванням."""
+    config = getattr(settings, 'PASSWORD_HASHER_PARAMS', {})
+    return {
+        'ARGON2': {'TIME_COST': 2, 'MEMORY_COST': 19456, 'PARALLELISM': 1, **config.get('ARGON2', {})},
+        'BCRYPT_ROUNDS': config.get('BCRYPT_ROUNDS', 12),
+    }
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    """Argon2id з параметрами з налаштувань.
+
+    Django за замовчуванням бере 100 МіБ пам'яті і 8 потоків на кожен хеш, що
+    при одночасних входах у кількох воркерах займає всі ядра. Зміна параметрів
+    не ламає старі хеші: must_update() помічає їх, і пароль перехешовується при
+    наступному вдалому вході.
+    """
+
+    @property
+    def time_cost(self):
+        return get_hasher_params()['ARGON2']['TIME_COST']
+
+    @property
+    def memory_cost(self):
+        return get_hasher_params()['ARGON2']['MEMORY_COST']
+
+    @property
+    def parallelism(self):
+        return get_hasher_params()['ARGON2']['PARALLELISM']
+
+
+class BCryptSHA256PasswordHasher(hashers.BCryptSHA256PasswordHasher):
+    """bcrypt(SHA-256) з кількістю раундів з налаштувань."""
+
+    @property
+    def rounds(self):
+        return get_hasher_params()['BCRYPT_ROUNDS']
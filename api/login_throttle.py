@@ -0,0 +1,174 @@
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+
+class BaseLoginAttemptStore:
+    """Лічильники невдалих спроб входу з фіксованим вікном на ключ.
+
+    Лічильник живе window секунд від першої невдачі у вікні; get_many() повертає
+    разом із ним, скільки ще секунд до його скидання.
+    """
+
+    def __init__(self, **options):
+        pass
+
+    def get_many(self, keys):
+        """Повертає {key: (count, ttl)} для наявних ключів одним зверненням."""
+        raise NotImplementedError
+
+    def incr(self, key, window):
+        raise NotImplementedError
+
+    def reset(self, key):
+        raise NotImplementedError
+
+
+class InMemoryLoginAttemptStore(BaseLoginAttemptStore):
+    """Лічильники в пам'яті процесу — для тестів і розробки з одним процесом."""
+
+    def __init__(self, max_size=100000, **options):
+        super().__init__(**options)
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._counters = {}
+
+    def get_many(self, keys):
+        now = time.monotonic()
+        with self._lock:
+            result = {}
+            for key in keys:
+                entry = self._counters.get(key)
+                if entry is not None and entry[1] > now:
+                    result[key] = (entry[0], entry[1] - now)
+            return result
+
+    def incr(self, key, window):
+        now = time.monotonic()
+        with self._lock:
+            count, expires_at = self._counters.get(key, (0, 0))
+            if expires_at <= now:
+                count, expires_at = 0, now + window
+                if len(self._counters) >= self.max_size:
+                    self._counters = {k: v for k, v in self._counters.items() if v[1] > now}
+            self._counters[key] = (count + 1, expires_at)
+            return count + 1
+
+    def reset(self, key):
+        with self._lock:
+            self._counters.pop(key, None)
+
+
+class RedisLoginAttemptStore(BaseLoginAttemptStore):
+    """Лічильники в Redis, спільні для всіх воркерів: INCR, а EXPIRE лише на першій невдачі вікна."""
+
+    INCR_SCRIPT = """
+    local count = redis.call('INCR', KEYS[1])
+    if count == 1 then redis.call('EXPIRE', KEYS[1], ARGV[1]) end
+    return count
+    """
+
+    def __init__(self, url='redis://localhost:6379/0', prefix='login', **options):
+        super().__init__(**options)
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self._incr = self.client.register_script(self.INCR_SCRIPT)
+
+    def _key(self, key):
+        return f'{self.prefix}:{key}'
+
+    def get_many(self, keys):
+        pipe = self.client.pipeline(transaction=False)
+        for key in keys:
+            pipe.get(self._key(key))
+            pipe.ttl(self._key(key))
+        values = pipe.execute()
+        return {
+            key: (int(count), max(ttl, 0))
+            for key, count, ttl in zip(keys, values[::2], values[1::2])
+            if count is not None
+        }
+
+    def incr(self, key, window):
+        return int(self._incr(keys=[self._key(key)], args=[window]))
+
+    def reset(self, key):
+        self.client.delete(self._key(key))
+
+
+class LoginThrottle:
+    """Обмеження невдалих входів з однієї IP-адреси і в один обліковий запис.
+
+    check() викликається до authenticate(): відхилена спроба не доходить до
+    обчислення хешу пароля, тож перебір паролів не навантажує CPU. Рахуються
+    лише невдачі; успішний вхід скидає лічильник облікового запису.
+    """
+
+    def __init__(self, store, ip_limit=20, ip_window=300, account_limit=5, account_window=900):
+        self.store = store
+        self.ip_limit = ip_limit
+        self.ip_window = ip_window
+        self.account_limit = account_limit
+        self.account_window = account_window
+
+    @staticmethod
+    def ip_key(ip):
+        return f'ip:{ip}'
+
+    @staticmethod
+    def account_key(email):
+        # Email у сховищі лише як хеш
+        return 'account:' + hashlib.blake2b(email.strip().lower().encode(), digest_size=16).hexdigest()
+
+    def check(self, ip, email):
+        """Повертає, скільки секунд чекати, або None, якщо спробу можна виконати."""
+        ip_key, account_key = self.ip_key(ip), self.account_key(email)
+        counters = self.store.get_many([ip_key, account_key])
+        waits = [
+            counters[key][1] for key, limit in ((ip_key, self.ip_limit), (account_key, self.account_limit))
+            if key in counters and counters[key][0] >= limit
+        ]
+        return max(1, math.ceil(max(waits))) if waits else None
+
+    def failure(self, ip, email):
+        self.store.incr(self.ip_key(ip), self.ip_window)
+        self.store.incr(self.account_key(email), self.account_window)
+
+    def success(self, email):
+        self.store.reset(self.account_key(email))
+
+
+def get_client_ip(request):
+    # Без NUM_PROXIES DRF бере X-Forwarded-For як є, і клієнт, підставляючи щоразу інший,
+    # отримував би новий лічильник IP; тому заголовок враховується лише з явним NUM_PROXIES
+    if api_settings.NUM_PROXIES is None:
+        return request.META.get('REMOTE_ADDR')
+    return BaseThrottle().get_ident(request)
+
+
+_throttle = None
+
+
+def get_login_throttle():
+    """Повертає обмежувач входів, налаштований у settings.LOGIN_THROTTLE."""
+    global _throttle
+    if _throttle is None:
+        config = getattr(settings, 'LOGIN_THROTTLE', {})
+        backend = import_string(config.get('BACKEND', 'api.login_throttle.InMemoryLoginAttemptStore'))
+        ip, account = config.get('IP', {}), config.get('ACCOUNT', {})
+        _throttle = LoginThrottle(
+            backend(**config.get('OPTIONS', {})),
+            ip_limit=ip.get('LIMIT', 20),
+            ip_window=ip.get('WINDOW', 300),
+            account_limit=account.get('LIMIT', 5),
+            account_window=account.get('WINDOW', 900),
+        )
+    return _throttle
@@ -0,0 +1,1179 @@
+import asyncio
+import http.client
+import json
+import os
+import socket
+import socketserver
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from random import Random
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import jsonschema
+from asgiref.sync import async_to_sync, iscoroutinefunction, sync_to_async
+from channels.layers import InMemoryChannelLayer
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.mail import send_mail
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.db.models import Q
+from django.test import AsyncRequestFactory, RequestFactory
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.views.static import serve
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.test import APIClient, force_authenticate
+from rest_framework.views import APIView
+from rest_framework_simplejwt.tokens import AccessToken
+from websockets.exceptions import InvalidStatus
+from websockets.sync.client import connect as websocket_connect
+
+from api import consumers
+from api.avatars import build_avatar_variants
+from api.media import serve_media
+from api.hashers import get_hasher_params
+from api.broadcast import send_to_users, user_group_name
+from api.models import CustomUser, Task
+from api.pagination import encode_cursor
+from api.serializers import TaskSerializer
+from api.search import search_terms
+from api.task_events import rebuild_task_stats
+from api.tasks import send_email_chunk, task_counts
+from api.views import TaskListView
+from api.testing import IN_MEMORY_BACKENDS, reset_backends
+from api.user_cache import get_user_cache
+
+SCENARIOS = {}
+
+
+def scenario(name):
+    """Реєструє сценарій бенчмарку; його docstring — опис у виводі команди."""
+    def decorator(func):
+        SCENARIOS[name] = func
+        return func
+    return decorator
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Bench:
+    """Контекст сценарію: масштаб даних, кількість повторів і зібрані результати."""
+
+    password = 'bench-password'
+
+    def __init__(self, name, scale=1.0, repeat=5):
+        self.name = name
+        self.scale = scale
+        self.repeat = repeat
+        self.notes = []
+        self.results = []
+        self.skipped = None
+
+    def size(self, default):
+        """Розмір даних сценарію з урахуванням --scale."""
+        return max(1, round(default * self.scale))
+
+    def note(self, text):
+        self.notes.append(text)
+
+    def skip(self, reason):
+        """Позначає сценарій як невиконуваний у цьому середовищі."""
+        self.skipped = reason
+        self.note(f'skipped: {reason}')
+
+    def create_user(self, label, **fields):
+        # Ім'я з назвою сценарію, щоб сценарії могли працювати в одній БД
+        return CustomUser.objects.create_user(
+            username=f'{self.name}-{label}', email=f'{self.name}-{label}@example.com',
+            password=self.password, gender='M', **fields,
+        )
+
+    def client(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def override(self, **overrides):
+        """override_settings, що також скидає синглтони бекендів, зібрані з попередніх налаштувань."""
+        return BackendOverride(**overrides)
+
+    def measure(self, label, func, memory=False):
+        """Викликає func repeat разів і записує медіану часу та кількість SQL-запитів одного виклику.
+
+        func може бути корутинною функцією; якщо вона повертає dict, його значення
+        (розмір відповіді тощо) додаються до рядка результату. З memory=True func
+        викликається ще раз під tracemalloc (поза вимірюванням часу) і записується
+        пік виділеної пам'яті одного виклику (peak_kb).
+        """
+        if asyncio.iscoroutinefunction(func):
+            func = async_to_sync(func)
+        timings = []
+        for _ in range(self.repeat):
+            queries = QueryCounter()
+            # execute_wrapper, а не CaptureQueriesContext: журнал connection.queries обмежений 9000 записів
+            with connection.execute_wrapper(queries):
+                start = time.perf_counter()
+                extra = func()
+                timings.append((time.perf_counter() - start) * 1000)
+        result = {'label': label, 'ms': statistics.median(timings), 'queries': queries.count}
+        if isinstance(extra, dict):
+            result.update(extra)
+        if memory:
+            tracemalloc.start()
+            try:
+                func()
+                result['peak_kb'] = round(tracemalloc.get_traced_memory()[1] / 1024)
+            finally:
+                tracemalloc.stop()
+        self.results.append(result)
+        return result
+
+
+def percentiles(latencies):
+    """p50 і p99 з вибірки тривалостей окремих запитів у мілісекундах."""
+    latencies = sorted(latencies)
+    return {
+        'p50_ms': round(latencies[len(latencies) // 2], 1),
+        'p99_ms': round(latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)], 1),
+    }
+
+
+class BackendOverride(override_settings):
+    def enable(self):
+        super().enable()
+        reset_backends()
+
+    def disable(self):
+        super().disable()
+        reset_backends()
+
+
+def run_scenario(name, scale=1.0, repeat=5):
+    """Виконує сценарій name у поточній БД і повертає його Bench з результатами."""
+    bench = Bench(name, scale=scale, repeat=repeat)
+    SCENARIOS[name](bench)
+    return bench
+
+
+@scenario('task-list')
+def task_list(bench):
+    """GET /api/tasks/ на 1k, 10k і 100k задач: уся вибірка, курсор, OFFSET, проєкція полів і потокова сторінка."""
+    factory = AsyncRequestFactory()
+    view = TaskListView.as_view()
+    bench.note('response cache disabled; peak_kb is the peak Python allocation of one request (tracemalloc)')
+
+    def get(client, url):
+        def request():
+            response = client.get(url)
+            assert response.status_code == 200, response.status_code
+            return {'bytes': len(response.content)}
+        return request
+
+    def stream(user, url):
+        async def request():
+            # Тіло читається частинами, як його віддає ASGI-сервер, а не збирається в пам'яті
+            http_request = factory.get(url)
+            force_authenticate(http_request, user)
+            response = await view(http_request)
+            assert response.status_code == 200 and response.streaming, response
+            return {'bytes': sum([len(chunk) async for chunk in response.streaming_content])}
+        return request
+
+    with bench.override(RESPONSE_CACHE={**settings.RESPONSE_CACHE, 'MAX_ENTRY_BYTES': 0}):
+        for default in (1000, 10000, 100000):
+            count = bench.size(default)
+            user = bench.create_user(f'owner-{default}')
+            Task.objects.bulk_create(
+                (Task(user=user, title=f'Task {index}', description='x' * 200) for index in range(count)),
+                batch_size=1000,
+            )
+            rebuild_task_stats([user.pk])
+            client = bench.client(user)
+
+            page = min(100, count)
+            tasks = Task.objects.filter(user=user).order_by('created_at', 'id')
+            # Курсор на задачу перед останньою сторінкою — найглибша сторінка списку
+            before_last_page = tasks[count - page - 1] if count > page else None
+            deep_cursor = encode_cursor(before_last_page.created_at, before_last_page.id) if before_last_page else ''
+
+            def offset_page():
+                # Для порівняння: та сама остання сторінка через OFFSET, без HTTP-обгортки
+                rows = list(tasks[count - page:count])
+                return {'bytes': len(JSONRenderer().render(TaskSerializer(rows, many=True).data))}
+
+            big_page = min(getattr(settings, 'TASK_LIST_MAX_PAGE_SIZE', 1000), count)
+            prefix = f'{count} tasks:'
+            bench.measure(f'{prefix} all tasks, no pagination', get(client, '/api/tasks/'), memory=True)
+            bench.measure(f'{prefix} first page, limit={page}', get(client, f'/api/tasks/?limit={page}'), memory=True)
+            bench.measure(f'{prefix} last page by cursor, limit={page}',
+                          get(client, f'/api/tasks/?limit={page}&cursor={deep_cursor}'), memory=True)
+            bench.measure(f'{prefix} last page by cursor, limit={page}, fields=id,title',
+                          get(client, f'/api/tasks/?limit={page}&fields=id,title&cursor={deep_cursor}'), memory=True)
+            bench.measure(f'{prefix} last page by OFFSET {count - page}, ORM + serializer only', offset_page,
+                          memory=True)
+            with bench.override(TASK_LIST_STREAM_THRESHOLD=big_page + 1):
+                bench.measure(f'{prefix} first page, limit={big_page}, buffered',
+                              get(client, f'/api/tasks/?limit={big_page}'), memory=True)
+            with bench.override(TASK_LIST_STREAM_THRESHOLD=big_page):
+                bench.measure(f'{prefix} first page, limit={big_page}, streamed',
+                              stream(user, f'/api/tasks/?limit={big_page}'), memory=True)
+
+
+@scenario('task-fanout')
+def task_fanout(bench):
+    """Розсилка однієї події задачі: глобальна група tasks проти груп власника і отримувачів."""
+    connected = bench.size(2000)
+    recipients = list(range(1, min(3, connected) + 1))
+    # Окремий шар і буфер у пам'яті: фіктивні користувачі не мають потрапити в робочий Redis
+    layer = InMemoryChannelLayer(capacity=bench.repeat * 2)
+    event = {'type': 'task_message', 'action': 'update_task',
+             'task': {'id': 1, 'title': 'Task', 'description': '', 'completed': True}}
+    bench.note(f'{connected} connected users, task shared with {len(recipients) - 1}, in-memory channel layer')
+    bench.note('InMemoryChannelLayer sweeps all channels for expired messages on every group_send')
+
+    async def connect_all():
+        for user_id in range(1, connected + 1):
+            channel = await layer.new_channel()
+            await layer.group_add('tasks', channel)
+            await layer.group_add(user_group_name(user_id), channel)
+    async_to_sync(connect_all)()
+
+    def queued():
+        return sum(queue.qsize() for queue in layer.channels.values())
+
+    async def global_group():
+        before = queued()
+        await layer.group_send('tasks', event)
+        return {'messages': queued() - before}
+
+    async def user_groups():
+        before = queued()
+        await send_to_users(recipients, event, layer)
+        return {'messages': queued() - before}
+
+    with bench.override(TASK_REPLAY={'BACKEND': 'api.replay.InMemoryReplayBuffer', 'SIZE': 500}):
+        bench.measure("group_send to global 'tasks' group", global_group)
+        bench.measure('send_to_users(owner + shared)', user_groups)
+
+
+class WriteStats:
+    """execute_wrapper, що рахує очікування блокувань на записі і помилки операцій.
+
+    Очікуванням вважається запит запису, довший за threshold_ms: під SQLite так
+    чекають на блокування запису BEGIN IMMEDIATE і записи поза транзакцією, під
+    PostgreSQL — UPDATE рядка, який тримає інша транзакція.
+    """
+
+    WRITES = ('BEGIN', 'INSERT', 'UPDATE', 'DELETE')
+
+    def __init__(self, threshold_ms=20):
+        self.threshold_ms = threshold_ms
+        self.lock = threading.Lock()
+        self.operations = 0
+        self.errors = 0
+        self.lock_waits = 0
+        self.wait_ms = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        if not sql.lstrip().upper().startswith(self.WRITES):
+            return execute(sql, params, many, context)
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            if elapsed >= self.threshold_ms:
+                with self.lock:
+                    self.lock_waits += 1
+                    self.wait_ms += elapsed
+
+    def record(self, ok):
+        with self.lock:
+            self.operations += 1
+            self.errors += not ok
+
+    def result(self, elapsed):
+        return {
+            'ops_per_s': round(self.operations / elapsed),
+            'lock_waits': self.lock_waits,
+            'wait_ms': round(self.wait_ms),
+            'errors': self.errors,
+        }
+
+
+@scenario('db-connections')
+def db_connections(bench):
+    """Шляхи запису REST і WebSocket під конкуренцією; цикл з'єднань: нове, постійне, пул psycopg."""
+    threads = 8
+    operations = bench.size(50)
+    # Усі задачі поширені з одним користувачем: кожне оновлення збільшує і його версію задач
+    watcher = bench.create_user('watcher')
+    rest_users = [bench.create_user(f'rest{index}') for index in range(threads)]
+    ws_users = [bench.create_user(f'ws{index}') for index in range(threads)]
+    shared = {}
+    for user in rest_users + ws_users:
+        created = Task.objects.bulk_create(Task(user=user, title=f'Shared {index}') for index in range(5))
+        Task.shared_with.through.objects.bulk_create(
+            Task.shared_with.through(task_id=task.id, customuser_id=watcher.id) for task in created
+        )
+        shared[user.pk] = [task.id for task in created]
+    rebuild_task_stats([watcher.pk, *shared])
+    if connection.vendor == 'sqlite':
+        mode = f"journal_mode={connection.cursor().execute('PRAGMA journal_mode').fetchone()[0]}"
+    else:
+        mode = 'psycopg pool' if 'pool' in connection.settings_dict['OPTIONS'] else \
+            f"CONN_MAX_AGE={connection.settings_dict['CONN_MAX_AGE']}"
+    bench.note(f'{connection.vendor} ({mode}); each client makes {operations} writes, alternating create and '
+               f'completed toggle of a task shared with one common user')
+    bench.note('lock_waits: write statements of 20 ms or more; queries: main thread only (WebSocket consumers)')
+
+    def write(index, user):
+        task_id = shared[user.pk][index % 5]
+        if index % 2:
+            return 'update', task_id, index // 2 % 2 == 0
+        return 'create', f'{user.username} {index}', None
+
+    def rest_writer(user, stats):
+        client = bench.client(user)
+        try:
+            with connection.execute_wrapper(stats):
+                for index in range(operations):
+                    kind, target, completed = write(index, user)
+                    try:
+                        if kind == 'create':
+                            response = client.post('/api/tasks/', {'title': target}, format='json')
+                        else:
+                            response = client.put(f'/api/tasks/{target}/', {'completed': completed}, format='json')
+                        ok = response.status_code < 300
+                    except Exception:
+                        # Тестовий клієнт прокидає винятки в'ю, зокрема "database is locked"
+                        ok = False
+                    stats.record(ok)
+        finally:
+            connection.close()
+
+    async def ws_writer(user, stats):
+        communicator = WebsocketCommunicator(consumers.TaskConsumer.as_asgi(), '/ws/tasks/')
+        communicator.scope['user'] = user
+        await communicator.connect()
+        await communicator.receive_json_from()
+        for index in range(operations):
+            kind, target, completed = write(index, user)
+            if kind == 'create':
+                await communicator.send_json_to({'action': 'create_task', 'title': target})
+            else:
+                await communicator.send_json_to({'action': 'update_task', 'task': {'id': target, 'completed': completed}})
+            # Власник отримує рівно одне повідомлення на дію: подію задачі або помилку
+            message = await communicator.receive_json_from(timeout=60)
+            stats.record('error' not in message)
+        await communicator.disconnect()
+
+    def websocket_clients(stats):
+        async def run():
+            await asyncio.gather(*(ws_writer(user, stats) for user in ws_users))
+        # database_sync_to_async консюмерів виконується в цьому (головному) потоці
+        with connection.execute_wrapper(stats):
+            async_to_sync(run)()
+
+    def load(rest_threads=0, websocket=False):
+        def run():
+            stats = WriteStats()
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max(rest_threads, 1)) as executor:
+                futures = [executor.submit(rest_writer, user, stats) for user in rest_users[:rest_threads]]
+                if websocket:
+                    websocket_clients(stats)
+                for future in futures:
+                    future.result()
+            return stats.result(time.perf_counter() - start)
+        return run
+
+    with bench.override(WEBSOCKET_RATE_LIMIT={'CONNECTION': {'RATE': 10 ** 6, 'BURST': 10 ** 6},
+                                              'USER': {'RATE': 10 ** 6, 'BURST': 10 ** 6}}):
+        bench.measure('REST writes, 1 thread', load(rest_threads=1))
+        bench.measure(f'REST writes, {threads} threads', load(rest_threads=threads))
+        bench.measure(f'WebSocket writes, {threads} sockets', load(websocket=True))
+        bench.measure(f'REST {threads} threads + WebSocket {threads} sockets', load(rest_threads=threads, websocket=True))
+
+    requests = bench.size(200)
+    if connection.vendor != 'postgresql':
+        # Django не закриває з'єднання з SQLite у пам'яті, а файлові відкриваються за мікросекунди
+        bench.note('connection cycle variants need PostgreSQL (DATABASE_URL)')
+        return
+    options = {key: value for key, value in connection.settings_dict['OPTIONS'].items() if key != 'pool'}
+    pool = {'min_size': 2, 'max_size': 4, 'timeout': 10}
+    variants = [
+        ('new connection per request', {'CONN_MAX_AGE': 0, 'OPTIONS': options}),
+        ('persistent, CONN_MAX_AGE=60', {'CONN_MAX_AGE': 60, 'OPTIONS': options}),
+        (f"psycopg pool, max_size={pool['max_size']}", {'CONN_MAX_AGE': 0, 'OPTIONS': {**options, 'pool': pool}}),
+    ]
+    bench.note(f'connection cycle: {requests} requests with one SELECT, sequentially and from {threads} threads')
+
+    def open_connections():
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT count(*) FROM pg_stat_activity WHERE datname = current_database()')
+            return cursor.fetchone()[0]
+
+    # З'єднання самої команди (і пулу, якщо DB_POOL) не рахуємо
+    own_connections = open_connections()
+
+    for index, (label, overrides) in enumerate(variants):
+        alias = f'benchmark_{index}'
+        databases = []
+
+        def database():
+            # Окрема обгортка на потік, як у django.db.connections; alias спільний, тож і пул спільний
+            db = connections[DEFAULT_DB_ALIAS].__class__({**connection.settings_dict, **overrides}, alias)
+            # Закриваємо всі обгортки з головного потоку після вимірювання
+            db.inc_thread_sharing()
+            databases.append(db)
+            return db
+
+        def request_cycle(db):
+            # Те саме, що роблять сигнали request_started/request_finished
+            db.close_if_unusable_or_obsolete()
+            with db.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            db.close_if_unusable_or_obsolete()
+
+        def sequential():
+            if not databases:
+                database()
+            for _ in range(requests):
+                request_cycle(databases[0])
+
+        # Потоки живуть між повторами, як пул потоків сервера
+        executor = ThreadPoolExecutor(threads)
+        local = threading.local()
+
+        def work(_):
+            if not hasattr(local, 'db'):
+                local.db = database()
+            request_cycle(local.db)
+
+        def concurrent():
+            list(executor.map(work, range(requests)))
+            return {'open_connections': open_connections() - own_connections}
+
+        try:
+            bench.measure(f'{label}, sequential', sequential)
+            bench.measure(f'{label}, {threads} threads', concurrent)
+        finally:
+            executor.shutdown()
+            for db in databases:
+                db.close()
+            if databases:
+                databases[0].close_pool()
+
+
+@scenario('ws-actions')
+def ws_actions(bench):
+    """Дії TaskConsumer: розбір реєстром з попередньо зібраними схемами і пропускна здатність кожної дії через сокет."""
+    user = bench.create_user('owner')
+    task = Task.objects.create(user=user, title='Task')
+    count = bench.size(10000)
+    payloads = [{'action': 'update_task', 'task': {'id': task.id, 'title': f'Task {index}', 'completed': bool(index % 2)}}
+                for index in range(count)]
+    schema = consumers.actions.handlers['update_task'][1].schema
+    # Збирання схеми на кожному повідомленні в сотні разів повільніше — досить десятої частини
+    validated = max(1, count // 10)
+    trips = min(count, 200)
+    targets = Task.objects.bulk_create(Task(user=user, title=f'Target {index}') for index in range(trips))
+    rebuild_task_stats([user.pk])
+    bench.note(f'{count} update_task payloads, {validated} for jsonschema.validate(), '
+               f'{trips} socket round trips per action on one connection, {connection.vendor}')
+    bench.note('ops_per_s counts round trips only, without connect/disconnect; '
+               'delete_task checks ownership and notifies, the row itself is deleted over REST')
+
+    def registry():
+        for payload in payloads:
+            consumers.actions.resolve(payload)
+        return {'messages': count}
+
+    def validate_each():
+        # Для порівняння: jsonschema.validate() перевіряє і збирає схему на кожному виклику
+        for payload in payloads[:validated]:
+            jsonschema.validate(payload, schema)
+        return {'messages': validated}
+
+    def round_trips(reply, make_payload):
+        async def run():
+            communicator = WebsocketCommunicator(consumers.TaskConsumer.as_asgi(), '/ws/tasks/')
+            communicator.scope['user'] = user
+            await communicator.connect()
+            await communicator.receive_json_from()
+            start = time.perf_counter()
+            for index in range(trips):
+                await communicator.send_json_to(make_payload(index))
+                message = await communicator.receive_json_from()
+                assert message.get('action') == reply, message
+            elapsed = time.perf_counter() - start
+            await communicator.disconnect()
+            return {'messages': trips, 'ops_per_s': round(trips / elapsed)}
+        return run
+
+    bench.measure('ActionRegistry.resolve()', registry)
+    bench.measure('jsonschema.validate() per message', validate_each)
+    with bench.override(WEBSOCKET_RATE_LIMIT={'CONNECTION': {'RATE': 10 ** 6, 'BURST': 10 ** 6},
+                                              'USER': {'RATE': 10 ** 6, 'BURST': 10 ** 6}}):
+        bench.measure('create_task round trips', round_trips(
+            'create_task', lambda index: {'action': 'create_task', 'title': f'Created {index}'}))
+        bench.measure('update_task (title) round trips', round_trips(
+            'update_task', lambda index: {'action': 'update_task', 'task': {'id': task.id, 'title': f'Task {index}'}}))
+        # Перемикання completed додатково змінює лічильник виконаних задач
+        bench.measure('update_task (toggle completed) round trips', round_trips(
+            'update_task', lambda index: {'action': 'update_task', 'task': {'id': task.id, 'completed': bool(index % 2)}}))
+        bench.measure('delete_task round trips', round_trips(
+            'delete_task', lambda index: {'action': 'delete_task', 'task_id': targets[index].id}))
+
+
+@scenario('task-report')
+def task_report(bench):
+    """Звіт задач по всіх користувачах: два COUNT на кожного проти одного GROUP BY з умовними агрегатами."""
+    users = [CustomUser(username=f'{bench.name}-{index}', email=f'{bench.name}-{index}@example.com', gender='M')
+             for index in range(bench.size(10000))]
+    users = CustomUser.objects.bulk_create(users, batch_size=2000)
+    per_user = 100
+    # bulk_create спершу збирає всі об'єкти в список: на 1M задач вставляємо пачками користувачів
+    for start in range(0, len(users), 100):
+        Task.objects.bulk_create(
+            (Task(user=user, title=f'Task {index}', completed=index % 3 == 0)
+             for user in users[start:start + 100] for index in range(per_user)),
+            batch_size=2000,
+        )
+    bench.note(f'{len(users)} users with {per_user} tasks each, {connection.vendor}')
+
+    def count_per_user():
+        # Як було: користувач і два COUNT на кожного
+        rows = []
+        for user_id in CustomUser.objects.values_list('id', flat=True):
+            user = CustomUser.objects.get(id=user_id)
+            total = Task.objects.filter(user=user).count()
+            completed = Task.objects.filter(user=user, completed=True).count()
+            rows.append({'user_id': user.id, 'total': total, 'completed': completed, 'incomplete': total - completed})
+        return rows
+
+    def per_user_counts():
+        return {'rows': len(count_per_user())}
+
+    def grouped_counts():
+        return {'rows': len(task_counts(CustomUser.objects.all()))}
+
+    grouped = [{key: row[key] for key in ('user_id', 'total', 'completed', 'incomplete')}
+               for row in task_counts(CustomUser.objects.all())]
+    # Порядок користувачів у старому коді не визначений
+    if grouped != sorted(count_per_user(), key=lambda row: row['user_id']):
+        raise CommandError('task_counts() does not match per-user COUNT queries')
+    bench.measure('per-user COUNT queries', per_user_counts)
+    bench.measure('task_counts(), one GROUP BY', grouped_counts)
+
+
+@scenario('response-cache')
+def response_cache(bench):
+    """Read-ендпоінти без кешу відповідей і з влученням у кеш."""
+    user, friend = bench.create_user('owner'), bench.create_user('friend')
+    own, shared = bench.size(1000), bench.size(300)
+    Task.objects.bulk_create((Task(user=user, title=f'Task {index}', description='x' * 200) for index in range(own)),
+                             batch_size=1000)
+    friend_tasks = Task.objects.bulk_create(
+        (Task(user=friend, title=f'Shared {index}', description='x' * 200) for index in range(shared)), batch_size=1000,
+    )
+    Task.shared_with.through.objects.bulk_create(
+        Task.shared_with.through(task_id=task.id, customuser_id=user.id) for task in friend_tasks
+    )
+    rebuild_task_stats([user.pk, friend.pk])
+    requests = bench.size(100)
+    bench.note(f'{own} own tasks, {shared} tasks shared with the user; a run is {requests} sequential GETs '
+               f'(ms for the whole run), p50/p99 per request')
+    client = bench.client(user)
+
+    def get(url):
+        def run():
+            latencies = []
+            for _ in range(requests):
+                start = time.perf_counter()
+                response = client.get(url)
+                latencies.append((time.perf_counter() - start) * 1000)
+                assert response.status_code == 200, response.status_code
+            return {'bytes': len(response.content), **percentiles(latencies)}
+        return run
+
+    urls = ['/api/tasks/', '/api/shared-tasks/', '/api/about/']
+    with bench.override(RESPONSE_CACHE={**settings.RESPONSE_CACHE, 'MAX_ENTRY_BYTES': 0}):
+        for url in urls:
+            bench.measure(f'GET {url}, not cached', get(url))
+    with bench.override(RESPONSE_CACHE={**settings.RESPONSE_CACHE, 'MAX_ENTRY_BYTES': 8 * 1024 * 1024}):
+        for url in urls:
+            get(url)()
+            bench.measure(f'GET {url}, cache hit', get(url))
+
+
+@scenario('task-search')
+def task_search(bench):
+    """Пошук задач за словами: LIKE по title/description проти повнотекстового індексу."""
+    words = [f'word{index}' for index in range(300)] + ['deadline'] * 3
+    random = Random(0)
+    user = bench.create_user('owner')
+    others = [bench.create_user(f'other-{index}') for index in range(10)]
+    per_user = bench.size(10000)
+
+    def tasks_of(owner, count):
+        for index in range(count):
+            # "quarterly" є в 1% задач, "deadline" — приблизно в 30% (3 з 303 слів, 34 слова на задачу)
+            title = ' '.join(random.choices(words, k=4)) + (' quarterly' if index % 100 == 0 else '')
+            description = ' '.join(random.choices(words, k=30))
+            yield Task(user=owner, title=title, description=description)
+
+    for owner in [user, *others]:
+        Task.objects.bulk_create(tasks_of(owner, per_user), batch_size=1000)
+    rebuild_task_stats([user.pk])
+    bench.note(f'{per_user} tasks for the user and for each of {len(others)} others, {connection.vendor}')
+    client = bench.client(user)
+
+    def like(query):
+        def run():
+            # Для порівняння: пошук без індексу, як у запасній гілці search_tasks()
+            tasks = Task.objects.filter(Q(user_id=user.id) | Q(shared_with=user.id))
+            for term in search_terms(query):
+                tasks = tasks.filter(Q(title__icontains=term) | Q(description__icontains=term))
+            return {'results': len(tasks.distinct().order_by('-created_at', '-id')[:50])}
+        return run
+
+    def api(query):
+        def run():
+            response = client.get('/api/tasks/search/', {'q': query, 'limit': 50})
+            assert response.status_code == 200, response.status_code
+            return {'results': len(response.json()['results'])}
+        return run
+
+    for query in ('quarterly', 'deadline', 'deadline quart'):
+        bench.measure(f'LIKE, q={query!r}', like(query))
+        bench.measure(f'GET /api/tasks/search/, q={query!r}', api(query))
+
+
+class SyncTaskListView(APIView):
+    """Синхронний список задач, як до async-в'ю: під ASGI Django виконує його в потоці."""
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        return Response(TaskSerializer(Task.objects.filter(user=request.user), many=True).data)
+
+
+@scenario('async-views')
+def async_views(bench):
+    """Конкурентні GET /api/tasks/ під ASGI: синхронне в'ю в потоці проти async TaskListView."""
+    concurrency = bench.size(50)
+    users = [bench.create_user(f'user-{index}') for index in range(concurrency)]
+    Task.objects.bulk_create(
+        (Task(user=user, title=f'Task {index}', description='x' * 200) for user in users for index in range(100)),
+        batch_size=2000,
+    )
+    rebuild_task_stats([user.pk for user in users])
+    bench.note(f'{concurrency} concurrent requests of different users, 100 tasks each, {connection.vendor}')
+    factory = AsyncRequestFactory()
+    sync_view, async_view = SyncTaskListView.as_view(), TaskListView.as_view()
+
+    async def call(view, user):
+        request = factory.get('/api/tasks/')
+        force_authenticate(request, user)
+        # Як BaseHandler._get_response_async: синхронне в'ю і render() — у потоці thread_sensitive
+        if iscoroutinefunction(view):
+            response = await view(request)
+        else:
+            response = await sync_to_async(view, thread_sensitive=True)(request)
+        if hasattr(response, 'render'):
+            response = await sync_to_async(response.render, thread_sensitive=True)()
+        assert response.status_code == 200, response.status_code
+        return len(response.content)
+
+    def concurrent(view):
+        async def run():
+            sizes = await asyncio.gather(*(call(view, user) for user in users))
+            return {'bytes': sum(sizes)}
+        return run
+
+    with bench.override(RESPONSE_CACHE={**settings.RESPONSE_CACHE, 'MAX_ENTRY_BYTES': 0}):
+        bench.measure('sync view in thread', concurrent(sync_view))
+        bench.measure('async TaskListView, response cache disabled', concurrent(async_view))
+    with bench.override(RESPONSE_CACHE={**settings.RESPONSE_CACHE, 'MAX_ENTRY_BYTES': 8 * 1024 * 1024}):
+        async_to_sync(concurrent(async_view))()
+        bench.measure('async TaskListView, response cache hits', concurrent(async_view))
+
+
+class SMTPSinkHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        with self.server.lock:
+            self.server.connections += 1
+        self.reply('220 benchmark sink')
+        while line := self.rfile.readline():
+            command = line[:4].upper()
+            if command == b'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                while self.rfile.readline() not in (b'.\r\n', b''):
+                    pass
+                with self.server.lock:
+                    self.server.messages += 1
+                self.reply('250 OK')
+            elif command == b'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('250 OK')
+
+    def reply(self, text):
+        self.wfile.write(text.encode() + b'\r\n')
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    """SMTP-сервер на 127.0.0.1, що приймає і відкидає листи, рахуючи з'єднання і повідомлення."""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), SMTPSinkHandler)
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.messages = 0
+
+    def counters(self):
+        with self.lock:
+            return self.connections, self.messages
+
+
+@scenario('email-online')
+def email_online(bench):
+    """Розсилка онлайн-користувачам: один лист усім, лист на кожного і пачки через одне з'єднання."""
+    recipients = [f'{bench.name}-{index}@example.com' for index in range(bench.size(500))]
+    chunk_size = getattr(settings, 'EMAIL_CHUNK_SIZE', 50)
+    sink = SMTPSink()
+    threading.Thread(target=sink.serve_forever, daemon=True).start()
+    bench.note(f'{len(recipients)} recipients, EMAIL_CHUNK_SIZE={chunk_size}, local SMTP sink without TLS and AUTH')
+
+    def counted(send):
+        def run():
+            connections, messages = sink.counters()
+            send()
+            after = sink.counters()
+            return {'smtp_connections': after[0] - connections, 'messages': after[1] - messages}
+        return run
+
+    def one_message():
+        # Як було: один лист, у якому всі адресати бачать одне одного
+        send_mail('Subject', 'Message', 'your_email@gmail.com', recipients)
+
+    def message_per_recipient():
+        # Окремий лист без спільного з'єднання: нове SMTP-з'єднання на кожного
+        for email in recipients:
+            send_mail('Subject', 'Message', 'your_email@gmail.com', [email])
+
+    def chunks():
+        for start in range(0, len(recipients), chunk_size):
+            send_email_chunk(subject='Subject', message='Message', recipients=recipients[start:start + chunk_size])
+
+    try:
+        with bench.override(EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend', EMAIL_HOST='127.0.0.1',
+                            EMAIL_PORT=sink.server_address[1], EMAIL_USE_TLS=False, EMAIL_HOST_USER='',
+                            EMAIL_HOST_PASSWORD=''):
+            bench.measure('one message to all recipients', counted(one_message))
+            bench.measure('send_mail() per recipient', counted(message_per_recipient))
+            bench.measure('send_email_chunk() per chunk', counted(chunks))
+    finally:
+        sink.shutdown()
+        sink.server_close()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class Server:
+    """gunicorn у дочірньому процесі з налаштуваннями поточного запуску: тестова БД і ті самі бекенди."""
+
+    def __init__(self, workdir, app, *args, workers=1):
+        self.port = free_port()
+        env = {
+            **os.environ,
+            'DJANGO_SETTINGS_MODULE': 'benchmark_settings',
+            'PYTHONPATH': os.pathsep.join(filter(None, [workdir, str(settings.BASE_DIR), os.environ.get('PYTHONPATH')])),
+            'WEB_CONCURRENCY': str(workers),
+        }
+        # cwd — тимчасовий каталог, щоб gunicorn не підхопив gunicorn.conf.py проєкту без -c
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{self.port}', *args, app],
+            cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+
+    def wait_ready(self, timeout=60):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise CommandError(f'Server exited with code {self.process.returncode}')
+            try:
+                connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=5)
+                connection.request('GET', '/api/about/')
+                if connection.getresponse().status == 200:
+                    return
+            except OSError:
+                pass
+            time.sleep(0.2)
+        raise CommandError(f'Server on port {self.port} did not start in {timeout} s')
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=60)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+
+class MixedLoad:
+    """Змішане навантаження на сервер: читачі і письменники REST та клієнти WebSocket у потоках.
+
+    Кожен клієнт — окремий потік з одним keep-alive з'єднанням або сокетом і робить
+    requests запитів чи дій підряд, чекаючи на відповідь. Користувачі клієнтів різні,
+    тож клієнт WebSocket отримує рівно одне повідомлення на дію.
+    """
+
+    def __init__(self, port, reader, readers, writers, sockets, requests):
+        self.port = port
+        self.reader = reader
+        self.readers = readers
+        self.writers = writers
+        self.sockets = sockets
+        self.requests = requests
+        self.lock = threading.Lock()
+        self.latencies = {'read': [], 'write': [], 'ws': []}
+        self.errors = 0
+
+    def record(self, kind, start, ok):
+        with self.lock:
+            self.latencies[kind].append((time.perf_counter() - start) * 1000)
+            self.errors += not ok
+
+    def http_client(self, token, request):
+        connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=60)
+        headers = {'Authorization': f'Bearer {token}', 'Content-Type': 'application/json'}
+        try:
+            for index in range(self.requests):
+                kind, method, path, body = request(index)
+                start = time.perf_counter()
+                connection.request(method, path, body=body and json.dumps(body), headers=headers)
+                response = connection.getresponse()
+                response.read()
+                self.record(kind, start, response.status < 300)
+        finally:
+            connection.close()
+
+    def reads(self, index):
+        return 'read', 'GET', '/api/tasks/?limit=20', None
+
+    def writes(self, task_id):
+        def request(index):
+            if index % 2:
+                return 'write', 'PUT', f'/api/tasks/{task_id}/', {'completed': index // 2 % 2 == 0}
+            return 'write', 'POST', '/api/tasks/', {'title': f'Task {index}'}
+        return request
+
+    def websocket_client(self, token, task_id):
+        with websocket_connect(f'ws://127.0.0.1:{self.port}/ws/tasks/?token={token}', open_timeout=30) as websocket:
+            websocket.recv(timeout=30)
+            for index in range(self.requests):
+                if index % 2:
+                    payload = {'action': 'update_task', 'task': {'id': task_id, 'completed': index // 2 % 2 == 0}}
+                else:
+                    payload = {'action': 'create_task', 'title': f'Task {index}'}
+                start = time.perf_counter()
+                websocket.send(json.dumps(payload))
+                self.record('ws', start, 'error' not in json.loads(websocket.recv(timeout=60)))
+
+    def run(self, websockets=True):
+        jobs = [(self.http_client, self.reader, self.reads)] * self.readers
+        jobs += [(self.http_client, token, self.writes(task_id)) for token, task_id in self.writers]
+        if websockets:
+            jobs += [(self.websocket_client, token, task_id) for token, task_id in self.sockets]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(len(jobs)) as executor:
+            for future in [executor.submit(*job) for job in jobs]:
+                future.result()
+        elapsed = time.perf_counter() - start
+        result = {'ops_per_s': round(sum(map(len, self.latencies.values())) / elapsed)}
+        for kind, latencies in self.latencies.items():
+            if latencies:
+                result.update({f'{kind}_{key}': value for key, value in percentiles(latencies).items()})
+        result['errors'] = self.errors
+        return result
+
+
+def websocket_status(port, token):
+    try:
+        with websocket_connect(f'ws://127.0.0.1:{port}/ws/tasks/?token={token}', open_timeout=10) as websocket:
+            websocket.recv(timeout=10)
+        return 'connected'
+    except InvalidStatus as exc:
+        return f'rejected with HTTP {exc.response.status_code}'
+
+
+@scenario('http-serving')
+def http_serving(bench):
+    """Той самий застосунок за gunicorn: старий запуск WSGI проти gunicorn.conf.py з uvicorn-воркерами."""
+    if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+        # Серверам в окремих процесах потрібна спільна з командою БД (manage.py benchmark створює файл)
+        bench.skip('needs a file SQLite or PostgreSQL test database')
+        return
+    clients, requests = bench.size(10), 20
+    reader = bench.create_user('reader')
+    Task.objects.bulk_create(Task(user=reader, title=f'Task {index}', description='x' * 200) for index in range(100))
+    writers, sockets = [], []
+    for clients_of_kind, label in ((writers, 'writer'), (sockets, 'socket')):
+        for index in range(clients):
+            user = bench.create_user(f'{label}{index}')
+            clients_of_kind.append((str(AccessToken.for_user(user)), Task.objects.create(user=user, title='Task').id))
+    rebuild_task_stats(list(CustomUser.objects.values_list('id', flat=True)))
+    token = str(AccessToken.for_user(reader))
+    bench.note(f'{connection.vendor}; {clients} REST readers (GET /api/tasks/?limit=20), {clients} REST writers '
+               f'(POST /api/tasks/, PUT toggle) and {clients} WebSocket clients (create_task, update_task), '
+               f'{requests} sequential requests or actions each; {os.cpu_count()} CPU shared with the clients')
+
+    variants = [
+        ('old CMD: gunicorn todo_project.wsgi, 1 sync worker', 'todo_project.wsgi:application', [], 1),
+        ('gunicorn.conf.py + asgi, 1 uvicorn worker', 'todo_project.asgi:application',
+         ['-c', str(settings.BASE_DIR / 'gunicorn.conf.py')], 1),
+        (f'gunicorn.conf.py + asgi, {os.cpu_count() * 2 + 1} uvicorn workers (default)',
+         'todo_project.asgi:application', ['-c', str(settings.BASE_DIR / 'gunicorn.conf.py')], os.cpu_count() * 2 + 1),
+    ]
+    with tempfile.TemporaryDirectory() as workdir:
+        # Налаштування дочірніх процесів: робочі налаштування з тестовою БД і бекендами цього запуску
+        lines = ['from todo_project.settings import *', 'DEBUG = False',
+                 f"DATABASES['default']['NAME'] = {connection.settings_dict['NAME']!r}"]
+        lines += [f'{name} = {getattr(settings, name)!r}' for name in IN_MEMORY_BACKENDS]
+        # Ліміт дій WebSocket вимірювався б замість сервера
+        lines.append("WEBSOCKET_RATE_LIMIT = {'CONNECTION': {'RATE': 10 ** 6, 'BURST': 10 ** 6}, "
+                     "'USER': {'RATE': 10 ** 6, 'BURST': 10 ** 6}}")
+        Path(workdir, 'benchmark_settings.py').write_text('\n'.join(lines) + '\n')
+        for label, app, args, workers in variants:
+            server = Server(workdir, app, *args, workers=workers)
+            try:
+                server.wait_ready()
+                status = websocket_status(server.port, token)
+                bench.note(f'{label}: websocket {status}' + ('' if status == 'connected' else ', REST only'))
+                bench.measure(label, lambda: MixedLoad(server.port, token, clients, writers, sockets, requests).run(
+                    websockets=status == 'connected'))
+            finally:
+                server.stop()
+
+
+@scenario('media-serving')
+def media_serving(bench):
+    """Віддача media/avatars/*.png: django.views.static.serve (DEBUG) проти api.media.serve_media."""
+    paths = sorted(f'avatars/{path.name}' for path in (Path(settings.MEDIA_ROOT) / 'avatars').glob('*.png'))
+    count = bench.size(500)
+    bench.note(f'{count} GETs over {len(paths)} files from media/avatars/, views called directly with RequestFactory')
+    factory = RequestFactory()
+    etags = {}
+
+    def load(view, **headers):
+        def run():
+            served = 0
+            for index in range(count):
+                path = paths[index % len(paths)]
+                request_headers = {key: value.format(etag=etags.get(path)) for key, value in headers.items()}
+                response = view(factory.get(f'{settings.MEDIA_URL}{path}', headers=request_headers), path)
+                assert response.status_code in (200, 206, 304), response.status_code
+                served += len(b''.join(response.streaming_content) if response.streaming else response.content)
+                response.close()
+                if response.has_header('ETag'):
+                    etags[path] = response['ETag']
+            return {'bytes_per_request': served // count}
+        return run
+
+    def debug_serve(request, path):
+        return serve(request, path, document_root=settings.MEDIA_ROOT)
+
+    bench.measure(f'static.serve, {count} x 200', load(debug_serve))
+    with bench.override(MEDIA_SERVING={**settings.MEDIA_SERVING, 'BACKEND': 'django'}):
+        bench.measure(f'serve_media, {count} x 200', load(serve_media))
+        bench.measure(f'serve_media, {count} x 304 If-None-Match', load(serve_media, if_none_match='{etag}'))
+        bench.measure(f'serve_media, {count} x 206 Range 1 KiB', load(serve_media, range='bytes=0-1023'))
+    with bench.override(MEDIA_SERVING={**settings.MEDIA_SERVING, 'BACKEND': 'x-accel-redirect'}):
+        bench.measure(f'serve_media x-accel-redirect, {count} x 200', load(serve_media))
+
+
+@scenario('login')
+def login(bench):
+    """POST /api/login/: вартість хешування пароля і відхилення тротлінгом до authenticate()."""
+    count = bench.size(10)
+    params = get_hasher_params()
+    bench.note(f"{count} attempts per run; CPU is process time of this process; Argon2id {params['ARGON2']}, "
+               f"bcrypt {params['BCRYPT_ROUNDS']} rounds")
+    client = APIClient()
+
+    def attempts(email, password, expected):
+        def run():
+            cpu, start = time.process_time(), time.perf_counter()
+            for _ in range(count):
+                response = client.post('/api/login/', {'email': email, 'password': password}, format='json')
+                assert response.status_code == expected, response.status_code
+            elapsed = time.perf_counter() - start
+            return {
+                'per_s': round(count / elapsed, 1),
+                'cpu_ms': round((time.process_time() - cpu) * 1000 / count, 1),
+            }
+        return run
+
+    hashers = {
+        'PBKDF2 (Django default)': 'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+        'bcrypt-SHA256': 'api.hashers.BCryptSHA256PasswordHasher',
+        'Argon2id': 'api.hashers.Argon2PasswordHasher',
+    }
+    unlimited = {**settings.LOGIN_THROTTLE, 'IP': {'LIMIT': 10 ** 9}, 'ACCOUNT': {'LIMIT': 10 ** 9}}
+    with bench.override(LOGIN_THROTTLE=unlimited):
+        for index, (label, hasher) in enumerate(hashers.items()):
+            with bench.override(PASSWORD_HASHERS=[hasher]):
+                user = bench.create_user(f'hasher{index}')
+                bench.measure(f'{label}, successful login', attempts(user.email, bench.password, 200))
+        user = bench.create_user('wrong')
+        bench.measure('Argon2id, wrong password, no throttle', attempts(user.email, 'wrong', 401))
+
+        # Старий хеш PBKDF2 перехешовується в Argon2id при першому вдалому вході
+        legacy = bench.create_user('legacy')
+        CustomUser.objects.filter(pk=legacy.pk).update(password=make_password(bench.password, hasher='pbkdf2_sha256'))
+        attempts(legacy.email, bench.password, 200)()
+        algorithm = CustomUser.objects.get(pk=legacy.pk).password.split('$', 1)[0]
+        bench.note(f'legacy pbkdf2_sha256 hash after successful logins: {algorithm}')
+
+    user = bench.create_user('throttled')
+    limit = settings.LOGIN_THROTTLE.get('ACCOUNT', {}).get('LIMIT', 5)
+    for _ in range(limit):
+        client.post('/api/login/', {'email': user.email, 'password': 'wrong'}, format='json')
+    bench.measure(f'wrong password after {limit} failures, 429', attempts(user.email, 'wrong', 429))
+
+
+@scenario('avatar-pipeline')
+def avatar_pipeline(bench):
+    """Байти на показ аватара з профілю: сире завантаження проти варіантів process_avatar."""
+    # Унікальні за вмістом PNG з media/avatars (частина файлів — копії з суфіксом Django)
+    sources = {}
+    for path in sorted((Path(settings.MEDIA_ROOT) / 'avatars').glob('*.png')):
+        sources.setdefault(path.read_bytes(), path.name)
+    uploads = list(sources)[:bench.size(5)]
+    bench.note(f'{len(uploads)} PNG avatars from media/avatars/, {min(map(len, uploads))}-{max(map(len, uploads))} '
+               f'bytes; per profile: GET /api/profile/ + the image it points to')
+
+    with tempfile.TemporaryDirectory() as media_root, bench.override(MEDIA_ROOT=media_root):
+        users = [bench.create_user(f'user{index}') for index in range(len(uploads))]
+        clients = []
+        for user in users:
+            # JWT, а не force_authenticate: профіль має прийти з кешу користувачів, як у продакшені
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+            clients.append(client)
+
+        def upload():
+            for user, data in zip(users, uploads):
+                name = default_storage.save(f'avatars/raw-{user.pk}.png', ContentFile(data))
+                CustomUser.objects.filter(pk=user.pk).update(avatar=name, avatar_variants={})
+                get_user_cache().invalidate(user.pk)
+
+        def process():
+            upload()
+            for user in users:
+                build_avatar_variants(user.pk, CustomUser.objects.get(pk=user.pk).avatar.name)
+            names = [
+                name for variants in CustomUser.objects.values_list('avatar_variants', flat=True)
+                for formats in variants.values() for name in formats.values()
+            ]
+            return {'variant_bytes': sum(default_storage.size(name) for name in names) // len(users)}
+
+        def fetch(size=None, fmt=None):
+            def run():
+                served = {'profile_bytes': 0, 'image_bytes': 0}
+                for client in clients:
+                    response = client.get('/api/profile/')
+                    assert response.status_code == 200, response.status_code
+                    served['profile_bytes'] += len(response.content)
+                    url = response.data['avatar_variants'][size][fmt] if size else response.data['avatar']
+                    image = client.get(url)
+                    assert image.status_code == 200, image.status_code
+                    served['image_bytes'] += len(b''.join(image.streaming_content))
+                return {key: value // len(clients) for key, value in served.items()}
+            return run
+
+        upload()
+        bench.measure('raw upload in profile', fetch())
+        bench.measure('process_avatar (celery), all variants', process)
+        for size, fmt in (('40', 'webp'), ('80', 'webp'), ('40', 'jpeg'), ('320', 'webp')):
+            bench.measure(f'variant {size} px {fmt}', fetch(size, fmt))
+
+
+class Command(BaseCommand):
+    help = ('Вимірює гарячі шляхи застосунку на тимчасовій тестовій БД і виводить медіану часу '
+            'та кількість SQL-запитів для кожного варіанта.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('scenarios', nargs='*', metavar='scenario',
+                            help=f"Сценарії для запуску (за замовчуванням усі): {', '.join(SCENARIOS)}.")
+        parser.add_argument('--scale', type=float, default=1.0, help='Множник розміру даних сценаріїв.')
+        parser.add_argument('--repeat', type=int, default=5, help='Кількість вимірювань кожного варіанта.')
+        parser.add_argument('--in-memory', action='store_true',
+                            help='Бекенди в пам\'яті процесу замість Redis (як у тестах).')
+
+    def handle(self, *args, **options):
+        names = options['scenarios'] or list(SCENARIOS)
+        unknown = [name for name in names if name not in SCENARIOS]
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(unknown)}")
+        with override_settings(**(IN_MEMORY_BACKENDS if options['in_memory'] else {})), \
+                tempfile.TemporaryDirectory() as workdir:
+            test_settings = connection.settings_dict['TEST']
+            test_name = test_settings.get('NAME')
+            if connection.vendor == 'sqlite':
+                # Файл у режимі WAL, як у розгортанні, а не спільна база в пам'яті тестового раннера
+                test_settings['NAME'] = os.path.join(workdir, 'benchmark.sqlite3')
+            reset_backends()
+            setup_test_environment()
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                for name in names:
+                    bench = run_scenario(name, scale=options['scale'], repeat=options['repeat'])
+                    self.report(bench)
+                    call_command('flush', interactive=False, verbosity=0)
+                    reset_backends()
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+                test_settings['NAME'] = test_name
+                teardown_test_environment()
+                reset_backends()
+
+    def report(self, bench):
+        self.stdout.write(self.style.MIGRATE_HEADING(f'{bench.name}: {SCENARIOS[bench.name].__doc__}'))
+        for text in bench.notes:
+            self.stdout.write(f'  {text}')
+        if not bench.results:
+            return
+        width = max(len(result['label']) for result in bench.results)
+        for result in bench.results:
+            extra = ' '.join(f'{key}={value}' for key, value in result.items() if key not in ('label', 'ms', 'queries'))
+            self.stdout.write(f"  {result['label']:<{width}}  {result['ms']:9.2f} ms  {result['queries']:4d} queries  {extra}")
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from api.models import CustomUser
+from api.tasks import process_avatar
+
+
+class Command(BaseCommand):
+    help = 'Ставить у чергу обробку аватарів, для яких ще немає варіантів (або всіх з --all).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Перегенерувати варіанти і для вже оброблених аватарів.')
+
+    def handle(self, *args, **options):
+        users = CustomUser.objects.exclude(avatar='').exclude(avatar__isnull=True)
+        if not options['all']:
+            users = users.filter(avatar_variants={})
+        queued = 0
+        for user_id, avatar_name in users.values_list('id', 'avatar').iterator():
+            process_avatar.delay(user_id, avatar_name)
+            queued += 1
+        self.stdout.write(self.style.SUCCESS(f'Avatar processing queued for {queued} users'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Перебудовує індекс повнотекстового пошуку задач (FTS5 на SQLite, GIN на PostgreSQL).'
+
+    def handle(self, *args, **options):
+        rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS('Task search index rebuilt'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api.task_events import rebuild_all_task_stats
+
+
+class Command(BaseCommand):
+    help = 'Перераховує лічильники UserTaskStats для всіх користувачів з таблиці задач.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Кількість користувачів в одному проході.')
+
+    def handle(self, *args, **options):
+        processed = rebuild_all_task_stats(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Task stats rebuilt for {processed} users'))
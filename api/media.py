@@ -0,0 +1,203 @@
+import mimetypes
+import os
+import posixpath
+import re
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.urls import re_path
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+# Імена, які генерує api.avatars.store(): <16 hex хешу вмісту>[-<розмір>].<розширення>
+HASHED_NAME = re.compile(r'^(?P<stem>[0-9a-f]{16}(?:-\d+)?)\.\w+$')
+
+RANGE = re.compile(r'^bytes=(?P<start>\d*)-(?P<end>\d*)$')
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+def get_media_config():
+    """Налаштування settings.MEDIA_SERVING зі значеннями за замовчуванням."""
+    return {
+        'BACKEND': 'django',
+        'PREFIXES': ('avatars/',),
+        'INTERNAL_PREFIX': '/protected-media/',
+        'MAX_AGE': 3600,
+        'BLOCK_SIZE': 64 * 1024,
+        **getattr(settings, 'MEDIA_SERVING', {}),
+    }
+
+
+class RangeFile:
+    """Файл, обмежений діапазоном [start, start + length); без fileno, тож сервер читає лише його."""
+
+    def __init__(self, file, start, length):
+        self.file = file
+        self.file.seek(start)
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        size = self.remaining if size < 0 else min(size, self.remaining)
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+async def aread_blocks(file, block_size):
+    """Асинхронний ітератор блоків файлу; читання — у потоці, щоб не блокувати event loop."""
+    read = sync_to_async(file.read, thread_sensitive=False)
+    try:
+        while block := await read(block_size):
+            yield block
+    finally:
+        file.close()
+
+
+def parse_range(header, size):
+    """Повертає (start, end) включно для одного діапазону, None — віддати файл цілком, False — 416."""
+    match = RANGE.match(header.strip())
+    if match is None:
+        # Кілька діапазонів (multipart/byteranges) не підтримуємо — сервер може їх ігнорувати
+        return None
+    start, end = match['start'], match['end']
+    if not start:
+        if not end or int(end) == 0:
+            return False
+        return max(size - int(end), 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def range_applies(request, etag, mtime):
+    # If-Range: діапазон лише якщо файл не змінився відтоді, як клієнт отримав його частину
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range is None:
+        return True
+    if if_range.startswith('"'):
+        return if_range == etag
+    if_range_date = parse_http_date_safe(if_range)
+    return if_range_date is not None and int(mtime) <= if_range_date
+
+
+@require_safe
+def serve_media(request, path):
+    """Віддає файли з MEDIA_ROOT у межах MEDIA_SERVING['PREFIXES'].
+
+    Імена з хешем вмісту отримують сильний ETag з хешу і Cache-Control
+    immutable, решта — ETag з mtime і розміру та короткий max-age. Повторні
+    запити з If-None-Match отримують 304 без читання файлу. Підтримується один
+    діапазон Range (з If-Range). У режимах x-accel-redirect і x-sendfile сам файл
+    віддає проксі перед застосунком, а Django лише перевіряє доступ і заголовки.
+    Режим django займає воркер застосунку на весь час передачі, тож він для
+    розробки і розгортань без проксі (див. перевірку api.W001).
+    """
+    config = get_media_config()
+    # Префікс перевіряється після нормалізації, інакше avatars/../ відкрив би весь MEDIA_ROOT
+    path = posixpath.normpath(path).lstrip('/')
+    if not path.startswith(tuple(config['PREFIXES'])):
+        raise Http404
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        stat = os.stat(full_path)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+
+    hashed = HASHED_NAME.match(os.path.basename(path))
+    if hashed:
+        etag = f'"{hashed["stem"]}"'
+        cache_control = IMMUTABLE
+    else:
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        cache_control = f"public, max-age={config['MAX_AGE']}"
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(stat.st_mtime),
+        'Cache-Control': cache_control,
+        'Accept-Ranges': 'bytes',
+    }
+
+    response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if response is not None:
+        for header, value in headers.items():
+            response[header] = value
+        return response
+
+    content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+    backend = config['BACKEND']
+    if backend == 'x-accel-redirect':
+        # nginx: location <INTERNAL_PREFIX> { internal; alias <MEDIA_ROOT>/; } — Range він обробляє сам
+        response = HttpResponse(content_type=content_type, headers=headers)
+        response['X-Accel-Redirect'] = config['INTERNAL_PREFIX'] + path
+        return response
+    if backend == 'x-sendfile':
+        response = HttpResponse(content_type=content_type, headers=headers)
+        response['X-Sendfile'] = full_path
+        return response
+
+    size = stat.st_size
+    byte_range = None
+    if 'HTTP_RANGE' in request.META and range_applies(request, etag, stat.st_mtime):
+        byte_range = parse_range(request.META['HTTP_RANGE'], size)
+        if byte_range is False:
+            response = HttpResponse(status=416, headers=headers)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    if request.method == 'HEAD':
+        response = HttpResponse(content_type=content_type, headers=headers)
+        response['Content-Length'] = size
+        return response
+
+    file, status, length = open(full_path, 'rb'), 200, size
+    if byte_range is not None:
+        start, end = byte_range
+        file, status, length = RangeFile(file, start, end - start + 1), 206, end - start + 1
+    if isinstance(request, ASGIRequest):
+        # Синхронний ітератор FileResponse ASGIHandler вичитує цілком через sync_to_async(list),
+        # тобто весь файл опинився б у пам'яті; асинхронний віддається блоками BLOCK_SIZE
+        response = StreamingHttpResponse(aread_blocks(file, config['BLOCK_SIZE']), content_type=content_type,
+                                         status=status, headers=headers)
+    else:
+        # Під WSGI FileResponse читає файл блоками BLOCK_SIZE (цілий файл — через wsgi.file_wrapper)
+        response = FileResponse(file, content_type=content_type, status=status, headers=headers)
+        response.block_size = config['BLOCK_SIZE']
+    response['Content-Length'] = length
+    if byte_range is not None:
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return response
+
+
+@register(Tags.files, deploy=True)
+def check_media_backend(app_configs, **kwargs):
+    if get_media_config()['BACKEND'] != 'django':
+        return []
+    return [Warning(
+        "MEDIA_SERVING['BACKEND'] is 'django': media files are sent by application workers.",
+        hint="Put nginx (x-accel-redirect) or Apache (x-sendfile) in front of the application and "
+             "set MEDIA_SERVING_BACKEND accordingly; the 'django' backend is meant for development.",
+        id='api.W001',
+    )]
+
+
+def media_urlpatterns():
+    """Маршрути MEDIA_URL для префіксів з MEDIA_SERVING (працюють і з DEBUG=False)."""
+    prefixes = '|'.join(re.escape(prefix) for prefix in get_media_config()['PREFIXES'])
+    media_url = re.escape(settings.MEDIA_URL.lstrip('/'))
+    return [re_path(rf'^{media_url}(?P<path>(?:{prefixes}).+)$', serve_media, name='media')]
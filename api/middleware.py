@@ -1,24 +1,31 @@
+import logging
+
 import jwt
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from channels.db import database_sync_to_async
 from channels.middleware import BaseMiddleware
 from channels.auth import AuthMiddlewareStack
 from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
 from rest_framework_simplejwt.tokens import AccessToken
+from whitenoise.middleware import WhiteNoiseMiddleware
+from .user_cache import get_user_cache
 
 User = get_user_model()
 
-@database_sync_to_async
-def get_user_from_token(token):
+logger = logging.getLogger(__name__)
+
+async def get_user_from_token(token):
     try:
         access_token = AccessToken(token)
         user_id = access_token['user_id']
-        user = User.objects.get(id=user_id)
-        return user
-    except (InvalidToken, TokenError, User.DoesNotExist) as e:
-        print(f"Token validation error: {str(e)}")
+    except (InvalidToken, TokenError, KeyError) as e:
+        logger.info(f"Token validation error: {e}")
         return None
+    user = await get_user_cache().aget(user_id)
+    if user is None:
+        logger.info(f"Token validation error: user {user_id} does not exist")
+    return user
 
 class JWTAuthMiddleware(BaseMiddleware):
     async def __call__(self, scope, receive, send):
@@ -33,13 +40,13 @@ class JWTAuthMiddleware(BaseMiddleware):
             user = await get_user_from_token(token)
             if user:
                 scope['user'] = user
-                print(f"User authenticated: {user.email}")
+                logger.debug(f"User authenticated: {user.pk}")
             else:
                 scope['user'] = None
-                print("User not authenticated: Invalid token")
+                logger.debug("User not authenticated: Invalid token")
         else:
             scope['user'] = None
-            print("User not authenticated: No token provided")
+            logger.debug("User not authenticated: No token provided")
 
         return await self.inner(scope, receive, send)
 
@@ -59,4 +66,36 @@ class SelectiveAuthMiddleware(BaseMiddleware):
             return await self.session_middleware(scope, receive, send)
         else:
             # За замовчуванням використовуємо сесійну автентифікацію
-            return await self.session_middleware(scope, receive, send)
\ No newline at end of file
+            return await self.session_middleware(scope, receive, send)
+
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """WhiteNoiseMiddleware, що не переводить ASGI-запити в потік.
+
+    WhiteNoise 6 має лише синхронний middleware, тож під ASGI Django проводить
+    через нього кожен запит у єдиний потік thread_sensitive і назад, і всі запити
+    воркера чергуються в цьому потоці. Тут статичні файли віддаються як і раніше
+    (у пулі потоків), а решта запитів іде ланцюжком далі без переходу в потік.
+    """
+
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            # З autorefresh (DEBUG) файл шукається на диску на кожен запит
+            static_file = await sync_to_async(self.find_file, thread_sensitive=False)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve, thread_sensitive=False)(static_file, request)
+        return await self.get_response(request)
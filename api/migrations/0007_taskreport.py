@@ -0,0 +1,23 @@
+# Generated by Django 5.1.6 on 2026-10-18 01:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_task_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskReport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(choices=[('user', 'Single user'), ('all', 'All users'), ('range', 'User id range')], max_length=10)),
+                ('params', models.JSONField(blank=True, default=dict)),
+                ('rows', models.JSONField(default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 5.1.6 on 2026-10-18 02:40
+
+from django.db import migrations
+
+# SQL зафіксовано в міграції, а не імпортовано з api.search: міграція має застосовуватися
+# однаково, хоч би як надалі змінювався модуль пошуку. На SQLite тригери зникають разом
+# зі старою таблицею, коли пізніша міграція перебудовує api_task; їх відновлює
+# обробник post_migrate (api.signals.restore_search_triggers).
+
+# SQLite: зовнішня FTS5-таблиця над api_task, синхронізується тригерами на будь-який
+# запис (включно з update() і bulk-операціями, що оминають сигнали Django)
+SQLITE_INSTALL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS api_task_fts USING fts5(
+        title, description,
+        content='api_task', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS api_task_fts_insert AFTER INSERT ON api_task BEGIN
+        INSERT INTO api_task_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS api_task_fts_delete AFTER DELETE ON api_task BEGIN
+        INSERT INTO api_task_fts(api_task_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS api_task_fts_update AFTER UPDATE OF title, description ON api_task BEGIN
+        INSERT INTO api_task_fts(api_task_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO api_task_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END
+    """,
+]
+
+SQLITE_DROP = [
+    'DROP TRIGGER IF EXISTS api_task_fts_update',
+    'DROP TRIGGER IF EXISTS api_task_fts_delete',
+    'DROP TRIGGER IF EXISTS api_task_fts_insert',
+    'DROP TABLE IF EXISTS api_task_fts',
+]
+
+# PostgreSQL: згенерована колонка tsvector завжди актуальна, над нею GIN-індекс.
+# Конфігурація 'simple', бо задачі пишуть і українською, і англійською
+POSTGRES_INSTALL = [
+    """
+    ALTER TABLE api_task ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(description, '')), 'B')
+    ) STORED
+    """,
+    'CREATE INDEX IF NOT EXISTS task_search_vector_idx ON api_task USING gin (search_vector)',
+]
+
+POSTGRES_DROP = [
+    'DROP INDEX IF EXISTS task_search_vector_idx',
+    'ALTER TABLE api_task DROP COLUMN IF EXISTS search_vector',
+]
+
+
+def install(apps, schema_editor):
+    statements = {'sqlite': SQLITE_INSTALL, 'postgresql': POSTGRES_INSTALL}
+    for statement in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def drop(apps, schema_editor):
+    statements = {'sqlite': SQLITE_DROP, 'postgresql': POSTGRES_DROP}
+    for statement in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_updated_at_and_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, drop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.1.6 on 2026-10-18 03:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def start_change_history(apps, schema_editor):
+    # Задачі, змінені до появи журналу, в ньому відсутні: клієнти з них починають з повної синхронізації
+    UserTaskStats = apps.get_model('api', 'UserTaskStats')
+    UserTaskStats.objects.update(version=F('version') + 1, changes_floor=F('version') + 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_task_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usertaskstats',
+            name='changes_floor',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='TaskChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField()),
+                ('task_id', models.PositiveBigIntegerField()),
+                ('op', models.CharField(choices=[('upsert', 'Created or updated'), ('delete', 'Deleted')], max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='task_changes', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'task_id', 'version'], name='task_change_user_task_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'version', 'task_id'), name='task_change_user_version_uniq')],
+            },
+        ),
+        migrations.RunPython(start_change_history, migrations.RunPython.noop),
+    ]
@@ -13,7 +13,10 @@ class CustomUser(AbstractUser):
     gender = models.CharField(max_length=1, choices=GENDER_CHOICES)
     birth_date = models.DateField(null=True, blank=True)
     avatar = models.ImageField(upload_to='avatars/', null=True, blank=True)
+    # {розмір: {формат: ім'я файлу}} — готує задача process_avatar після завантаження
+    avatar_variants = models.JSONField(default=dict, blank=True)
     is_online = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username']
@@ -24,7 +27,80 @@ class Task(models.Model):
         description = models.TextField(blank=True)
         completed = models.BooleanField(default=False)
         created_at = models.DateTimeField(auto_now_add=True)
+        updated_at = models.DateTimeField(auto_now=True)
         shared_with = models.ManyToManyField(CustomUser, related_name='shared_tasks', blank=True)
 
+        class Meta:
+            indexes = [
+                # TaskListView: фільтр за користувачем (і completed) з сортуванням за (created_at, id).
+                # Невиконані задачі обслуговує той самий task_user_completed_idx (completed=False
+                # у префіксі), тож окремий частковий індекс лише подвоював би запис
+                models.Index(fields=['user', 'created_at', 'id'], name='task_user_created_idx'),
+                models.Index(fields=['user', 'completed', 'created_at', 'id'], name='task_user_completed_idx'),
+            ]
+
         def __str__(self):
-            return self.title
\ No newline at end of file
+            return self.title
+
+
+class UserTaskStats(models.Model):
+    user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, primary_key=True, related_name='task_stats')
+    total = models.PositiveIntegerField(default=0)
+    completed = models.PositiveIntegerField(default=0)
+    shared_with_me = models.PositiveIntegerField(default=0)
+    last_modified = models.DateTimeField(null=True, blank=True)
+    # Зростає при будь-якій зміні задач користувача або поширених з ним — основа ETag
+    version = models.PositiveBigIntegerField(default=0)
+    # Найбільша версія, видалена компакцією журналу TaskChange: з меншої синхронізуватись не можна
+    changes_floor = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = 'user task stats'
+
+    def __str__(self):
+        return f"Task stats for user {self.user_id}"
+
+
+class TaskChange(models.Model):
+    OP_UPSERT = 'upsert'
+    OP_DELETE = 'delete'
+    OP_CHOICES = (
+        (OP_UPSERT, 'Created or updated'),
+        (OP_DELETE, 'Deleted'),
+    )
+
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='task_changes')
+    version = models.PositiveBigIntegerField()
+    # Без FK: запис-надгробок (delete) переживає саму задачу
+    task_id = models.PositiveBigIntegerField()
+    op = models.CharField(max_length=10, choices=OP_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            # /api/tasks/changes/: діапазон версій користувача за індексом
+            models.UniqueConstraint(fields=['user', 'version', 'task_id'], name='task_change_user_version_uniq'),
+        ]
+        indexes = [
+            # Компакція: пошук новішого запису про ту саму задачу
+            models.Index(fields=['user', 'task_id', 'version'], name='task_change_user_task_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.op} task {self.task_id} for user {self.user_id} at v{self.version}"
+
+
+class TaskReport(models.Model):
+    SCOPE_CHOICES = (
+        ('user', 'Single user'),
+        ('all', 'All users'),
+        ('range', 'User id range'),
+    )
+
+    scope = models.CharField(max_length=10, choices=SCOPE_CHOICES)
+    params = models.JSONField(default=dict, blank=True)
+    rows = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Task report #{self.pk} ({self.scope})"
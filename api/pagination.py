@@ -0,0 +1,101 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(created_at, pk):
+    """Кодує позицію (created_at, id) в непрозорий рядок курсора."""
+    raw = json.dumps([created_at.isoformat(), pk], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Розкодовує курсор назад у пару (created_at, id)."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        raise InvalidCursor(cursor)
+
+
+class TaskCursorPaginator:
+    """Keyset-пагінація задач за (created_at, id).
+
+    На відміну від OFFSET, кожна сторінка — це один запит по індексу,
+    що не сповільнюється з ростом кількості задач користувача.
+    """
+    ordering = ('created_at', 'id')
+
+    def __init__(self, queryset, page_size):
+        self.queryset = queryset.order_by(*self.ordering)
+        self.page_size = page_size
+
+    def page_queryset(self, cursor=None):
+        queryset = self.queryset
+        if cursor:
+            created_at, pk = decode_cursor(cursor)
+            # created_at >= ... дублює умову, але дає межу діапазону: без неї SQLite шукає
+            # по індексу лише за user_id і перебирає всі попередні рядки, OR він не розкладає
+            queryset = queryset.filter(created_at__gte=created_at).filter(
+                Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk)
+            )
+        # Беремо на один рядок більше, щоб дізнатися, чи є наступна сторінка
+        return queryset[:self.page_size + 1]
+
+    def paginate(self, rows):
+        """Повертає (рядки сторінки, наступний курсор або None)."""
+        rows = list(rows)
+        if len(rows) <= self.page_size:
+            return rows, None
+        rows = rows[:self.page_size]
+        return rows, self.cursor_for(rows[-1])
+
+    def cursor_for(self, row):
+        if isinstance(row, dict):
+            return encode_cursor(row['created_at'], row['id'])
+        return encode_cursor(row.created_at, row.id)
+
+    def stream(self, rows, serializer):
+        """Генерує JSON сторінки частинами, не тримаючи її цілком у пам'яті."""
+        encoder = JSONEncoder()
+        last_row = None
+        yield '{"results":['
+        for index, row in enumerate(rows):
+            if index == self.page_size:
+                break
+            if index:
+                yield ','
+            yield encoder.encode(serializer.to_representation(row))
+            last_row = row
+        else:
+            last_row = None
+        next_cursor = self.cursor_for(last_row) if last_row is not None else None
+        yield '],"next_cursor":' + encoder.encode(next_cursor) + '}'
+
+    async def astream(self, rows, serializer):
+        """Асинхронний варіант stream() для async-ітератора рядків (QuerySet.aiterator())."""
+        encoder = JSONEncoder()
+        last_row = None
+        index = 0
+        yield '{"results":['
+        async for row in rows:
+            if index == self.page_size:
+                break
+            if index:
+                yield ','
+            yield encoder.encode(serializer.to_representation(row))
+            last_row = row
+            index += 1
+        else:
+            last_row = None
+        next_cursor = self.cursor_for(last_row) if last_row is not None else None
+        yield '],"next_cursor":' + encoder.encode(next_cursor) + '}'
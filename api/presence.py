@@ -0,0 +1,343 @@
+import asyncio
+import logging
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class BasePresenceStore:
+    """Облік онлайн-користувачів за кількістю їхніх активних з'єднань.
+
+    Кожне з'єднання (вкладка, пристрій) реєструється окремо і живе TTL секунд
+    після останнього heartbeat, тому користувач стає офлайн лише тоді, коли
+    закрилося (або протухло) останнє його з'єднання. Поле CustomUser.is_online
+    синхронізується з БД пакетно задачею sync_presence_to_db.
+    """
+
+    def __init__(self, ttl=90, **options):
+        self.ttl = ttl
+
+    def connect(self, user_id, channel_name, label):
+        """Реєструє з'єднання. Повертає True, якщо користувач щойно став онлайн."""
+        raise NotImplementedError
+
+    def disconnect(self, user_id, channel_name):
+        """Знімає з'єднання. Повертає True, якщо користувач щойно став офлайн."""
+        raise NotImplementedError
+
+    def heartbeat(self, user_id, channel_name):
+        raise NotImplementedError
+
+    def online_users(self):
+        """Повертає {user_id: label} для всіх онлайн-користувачів."""
+        raise NotImplementedError
+
+    def expire(self):
+        """Прибирає протухлі з'єднання. Повертає {user_id: label} тих, хто став офлайн."""
+        raise NotImplementedError
+
+    def pop_dirty(self):
+        """Повертає та очищає {user_id: is_online} змін, ще не записаних у БД."""
+        raise NotImplementedError
+
+    def next_seq(self):
+        """Видає наступний номер дельти онлайн-списку (спільний для всіх процесів)."""
+        raise NotImplementedError
+
+    def current_seq(self):
+        raise NotImplementedError
+
+    async def aconnect(self, user_id, channel_name, label):
+        return await sync_to_async(self.connect, thread_sensitive=False)(user_id, channel_name, label)
+
+    async def adisconnect(self, user_id, channel_name):
+        return await sync_to_async(self.disconnect, thread_sensitive=False)(user_id, channel_name)
+
+    async def aheartbeat(self, user_id, channel_name):
+        return await sync_to_async(self.heartbeat, thread_sensitive=False)(user_id, channel_name)
+
+    async def aonline_users(self):
+        return await sync_to_async(self.online_users, thread_sensitive=False)()
+
+    async def anext_seq(self):
+        return await sync_to_async(self.next_seq, thread_sensitive=False)()
+
+    async def acurrent_seq(self):
+        return await sync_to_async(self.current_seq, thread_sensitive=False)()
+
+
+class InMemoryPresenceStore(BasePresenceStore):
+    """Сховище в пам'яті процесу — для тестів і розробки з одним процесом."""
+
+    def __init__(self, ttl=90, **options):
+        super().__init__(ttl, **options)
+        self._lock = threading.Lock()
+        self._connections = {}
+        self._labels = {}
+        self._dirty = {}
+        self._seq = 0
+
+    def connect(self, user_id, channel_name, label):
+        with self._lock:
+            connections = self._connections.setdefault(user_id, {})
+            self._drop_expired(user_id, time.monotonic())
+            # Онлайн-статус, а не живі з'єднання: поки expire() не зняв користувача, для
+            # адмінів і БД він онлайн, і нове з'єднання після протухлого — не новий вхід
+            became_online = user_id not in self._labels
+            connections[channel_name] = time.monotonic() + self.ttl
+            self._labels[user_id] = label
+            if became_online:
+                self._dirty[user_id] = True
+            return became_online
+
+    def disconnect(self, user_id, channel_name):
+        with self._lock:
+            connections = self._connections.get(user_id)
+            if not connections:
+                return False
+            connections.pop(channel_name, None)
+            self._drop_expired(user_id, time.monotonic())
+            return self._set_offline_if_idle(user_id)
+
+    def heartbeat(self, user_id, channel_name):
+        with self._lock:
+            connections = self._connections.get(user_id)
+            if connections is not None and channel_name in connections:
+                connections[channel_name] = time.monotonic() + self.ttl
+
+    def online_users(self):
+        with self._lock:
+            return dict(self._labels)
+
+    def expire(self):
+        now = time.monotonic()
+        expired = {}
+        with self._lock:
+            for user_id in list(self._connections):
+                if not self._connections[user_id]:
+                    continue
+                self._drop_expired(user_id, now)
+                label = self._labels.get(user_id)
+                if self._set_offline_if_idle(user_id):
+                    expired[user_id] = label
+        return expired
+
+    def pop_dirty(self):
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+            return dirty
+
+    def next_seq(self):
+        with self._lock:
+            self._seq += 1
+            return self._seq
+
+    def current_seq(self):
+        return self._seq
+
+    def _drop_expired(self, user_id, now):
+        connections = self._connections[user_id]
+        for channel_name, expires_at in list(connections.items()):
+            if expires_at <= now:
+                del connections[channel_name]
+
+    def _set_offline_if_idle(self, user_id):
+        if self._connections[user_id]:
+            return False
+        del self._connections[user_id]
+        self._labels.pop(user_id, None)
+        self._dirty[user_id] = False
+        return True
+
+
+class RedisPresenceStore(BasePresenceStore):
+    """Сховище в Redis, спільне для всіх процесів daphne і celery.
+
+    presence:user:<id> — sorted set з'єднань зі скором = час протухання,
+    presence:online — hash user_id -> label, presence:dirty — hash user_id -> 0/1.
+    Переходи онлайн/офлайн виконуються Lua-скриптами, тож вони атомарні.
+    Онлайн-статус — запис у presence:online: користувача, чиї з'єднання протухли,
+    знімає лише expire(), тож нове з'єднання до того не вважається новим входом.
+    """
+
+    CONNECT_SCRIPT = """
+    redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+    local was_online = redis.call('HEXISTS', KEYS[2], ARGV[4]) == 1
+    redis.call('ZADD', KEYS[1], ARGV[1] + ARGV[2], ARGV[3])
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+    redis.call('HSET', KEYS[2], ARGV[4], ARGV[5])
+    if was_online then return 0 end
+    redis.call('HSET', KEYS[3], ARGV[4], 1)
+    return 1
+    """
+
+    DISCONNECT_SCRIPT = """
+    redis.call('ZREM', KEYS[1], ARGV[2])
+    redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+    if redis.call('ZCARD', KEYS[1]) > 0 then return 0 end
+    if redis.call('HDEL', KEYS[2], ARGV[3]) == 0 then return 0 end
+    redis.call('HSET', KEYS[3], ARGV[3], 0)
+    return 1
+    """
+
+    # Один прохід по всіх онлайн-користувачах; ключі з'єднань будуються з префікса (ARGV[2])
+    EXPIRE_SCRIPT = """
+    local expired = {}
+    local online = redis.call('HGETALL', KEYS[1])
+    for i = 1, #online, 2 do
+        local user_key = ARGV[2] .. ':user:' .. online[i]
+        redis.call('ZREMRANGEBYSCORE', user_key, '-inf', ARGV[1])
+        if redis.call('ZCARD', user_key) == 0 then
+            redis.call('HDEL', KEYS[1], online[i])
+            redis.call('HSET', KEYS[2], online[i], 0)
+            table.insert(expired, online[i])
+            table.insert(expired, online[i + 1])
+        end
+    end
+    return expired
+    """
+
+    POP_DIRTY_SCRIPT = """
+    local dirty = redis.call('HGETALL', KEYS[1])
+    redis.call('DEL', KEYS[1])
+    return dirty
+    """
+
+    def __init__(self, ttl=90, url='redis://localhost:6379/0', prefix='presence', **options):
+        super().__init__(ttl, **options)
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self._connect = self.client.register_script(self.CONNECT_SCRIPT)
+        self._disconnect = self.client.register_script(self.DISCONNECT_SCRIPT)
+        self._expire = self.client.register_script(self.EXPIRE_SCRIPT)
+        self._pop_dirty = self.client.register_script(self.POP_DIRTY_SCRIPT)
+
+    def _user_key(self, user_id):
+        return f'{self.prefix}:user:{user_id}'
+
+    @property
+    def _online_key(self):
+        return f'{self.prefix}:online'
+
+    @property
+    def _dirty_key(self):
+        return f'{self.prefix}:dirty'
+
+    @property
+    def _seq_key(self):
+        return f'{self.prefix}:seq'
+
+    def connect(self, user_id, channel_name, label):
+        keys = [self._user_key(user_id), self._online_key, self._dirty_key]
+        return bool(self._connect(keys=keys, args=[time.time(), self.ttl, channel_name, user_id, label]))
+
+    def disconnect(self, user_id, channel_name):
+        keys = [self._user_key(user_id), self._online_key, self._dirty_key]
+        return bool(self._disconnect(keys=keys, args=[time.time(), channel_name, user_id]))
+
+    def heartbeat(self, user_id, channel_name):
+        key = self._user_key(user_id)
+        pipe = self.client.pipeline()
+        pipe.zadd(key, {channel_name: time.time() + self.ttl}, xx=True)
+        pipe.expire(key, self.ttl)
+        pipe.execute()
+
+    def online_users(self):
+        return {int(user_id): label.decode() for user_id, label in self.client.hgetall(self._online_key).items()}
+
+    def expire(self):
+        flat = self._expire(keys=[self._online_key, self._dirty_key], args=[time.time(), self.prefix])
+        return {int(flat[i]): flat[i + 1].decode() for i in range(0, len(flat), 2)}
+
+    def pop_dirty(self):
+        flat = self._pop_dirty(keys=[self._dirty_key])
+        return {int(flat[i]): flat[i + 1] == b'1' for i in range(0, len(flat), 2)}
+
+    def next_seq(self):
+        return self.client.incr(self._seq_key)
+
+    def current_seq(self):
+        return int(self.client.get(self._seq_key) or 0)
+
+
+class PresenceBroadcaster:
+    """Збирає зміни присутності за вікно і надсилає адмінам одну дельту.
+
+    Вхід і вихід одного користувача в межах вікна взаємно знищуються, тож
+    шторм перепідключень не породжує повідомлень. Кожна дельта має номер
+    зі сховища: адмін, що помітив пропуск, запитує новий знімок (resync).
+    """
+
+    def __init__(self, store, window=0.25, group='admin_online'):
+        self.store = store
+        self.window = window
+        self.group = group
+        self._pending = {}
+        self._flush_task = None
+
+    def joined(self, label):
+        self._record(label, True)
+
+    def left(self, label):
+        self._record(label, False)
+
+    def _record(self, label, online):
+        if self._pending.get(label) is (not online):
+            del self._pending[label]
+        else:
+            self._pending[label] = online
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.window)
+        await self.flush()
+
+    async def flush(self):
+        pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        seq = await self.store.anext_seq()
+        await get_channel_layer().group_send(self.group, make_presence_delta(pending, seq))
+        logger.info(f"Online users delta {seq} sent: {len(pending)} changes")
+
+
+def make_presence_delta(changes, seq):
+    """Формує подію online_users_delta з {label: is_online}."""
+    return {
+        'type': 'online_users_delta',
+        'action': 'online_users_delta',
+        'seq': seq,
+        'joined': sorted(label for label, online in changes.items() if online),
+        'left': sorted(label for label, online in changes.items() if not online),
+    }
+
+
+_store = None
+_broadcaster = None
+
+
+def get_presence_store():
+    """Повертає сховище присутності, налаштоване в settings.PRESENCE."""
+    global _store
+    if _store is None:
+        config = getattr(settings, 'PRESENCE', {})
+        backend = import_string(config.get('BACKEND', 'api.presence.InMemoryPresenceStore'))
+        _store = backend(ttl=config.get('TTL', 90), **config.get('OPTIONS', {}))
+    return _store
+
+
+def get_presence_broadcaster():
+    global _broadcaster
+    if _broadcaster is None:
+        config = getattr(settings, 'PRESENCE', {})
+        _broadcaster = PresenceBroadcaster(get_presence_store(), window=config.get('BROADCAST_WINDOW', 0.25))
+    return _broadcaster
@@ -0,0 +1,135 @@
+import json
+import threading
+from collections import deque
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class BaseReplayBuffer:
+    """Обмежений буфер останніх подій task_message кожного отримувача.
+
+    Кожна подія отримує наступний номер seq у межах користувача. Клієнт, що
+    перепідключився з last_seq, отримує лише пропущені події; якщо частина
+    з них уже витіснена з буфера, since() повертає None і клієнт робить
+    повну синхронізацію (REST або /api/tasks/changes/).
+    """
+
+    def __init__(self, size=500, **options):
+        self.size = size
+
+    def append(self, user_id, event):
+        """Зберігає подію і повертає присвоєний їй seq."""
+        raise NotImplementedError
+
+    def since(self, user_id, last_seq):
+        """Повертає події з seq > last_seq або None, якщо буфер їх уже не містить."""
+        raise NotImplementedError
+
+    def current_seq(self, user_id):
+        raise NotImplementedError
+
+    async def aappend(self, user_id, event):
+        return await sync_to_async(self.append, thread_sensitive=False)(user_id, event)
+
+    async def asince(self, user_id, last_seq):
+        return await sync_to_async(self.since, thread_sensitive=False)(user_id, last_seq)
+
+    async def acurrent_seq(self, user_id):
+        return await sync_to_async(self.current_seq, thread_sensitive=False)(user_id)
+
+
+class InMemoryReplayBuffer(BaseReplayBuffer):
+    """Кільцевий буфер у пам'яті процесу — для тестів і розробки з одним процесом."""
+
+    def __init__(self, size=500, **options):
+        super().__init__(size, **options)
+        self._lock = threading.Lock()
+        self._events = {}
+        self._seqs = {}
+
+    def append(self, user_id, event):
+        with self._lock:
+            seq = self._seqs.get(user_id, 0) + 1
+            self._seqs[user_id] = seq
+            self._events.setdefault(user_id, deque(maxlen=self.size)).append({**event, 'seq': seq})
+            return seq
+
+    def since(self, user_id, last_seq):
+        with self._lock:
+            current = self._seqs.get(user_id, 0)
+            if last_seq > current:
+                return None
+            events = [event for event in self._events.get(user_id, ()) if event['seq'] > last_seq]
+            if last_seq < current and (not events or events[0]['seq'] != last_seq + 1):
+                return None
+            return events
+
+    def current_seq(self, user_id):
+        return self._seqs.get(user_id, 0)
+
+
+class RedisReplayBuffer(BaseReplayBuffer):
+    """Буфер у Redis Streams, спільний для всіх процесів daphne і celery.
+
+    replay:seq:<id> — лічильник seq (без TTL, щоб номери не починались знову з 1),
+    replay:events:<id> — stream з id виду <seq>-0, обрізаний до ~size записів і
+    з TTL, тож буфери неактивних користувачів не займають пам'ять.
+    """
+
+    APPEND_SCRIPT = """
+    local seq = redis.call('INCR', KEYS[1])
+    redis.call('XADD', KEYS[2], 'MAXLEN', '~', ARGV[1], seq .. '-0', 'event', ARGV[2])
+    redis.call('EXPIRE', KEYS[2], ARGV[3])
+    return seq
+    """
+
+    def __init__(self, size=500, url='redis://localhost:6379/0', prefix='replay', ttl=24 * 60 * 60, **options):
+        super().__init__(size, **options)
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.ttl = ttl
+        self._append = self.client.register_script(self.APPEND_SCRIPT)
+
+    def _seq_key(self, user_id):
+        return f'{self.prefix}:seq:{user_id}'
+
+    def _events_key(self, user_id):
+        return f'{self.prefix}:events:{user_id}'
+
+    def append(self, user_id, event):
+        keys = [self._seq_key(user_id), self._events_key(user_id)]
+        return int(self._append(keys=keys, args=[self.size, json.dumps(event), self.ttl]))
+
+    def since(self, user_id, last_seq):
+        current = self.current_seq(user_id)
+        if last_seq > current:
+            return None
+        if last_seq == current:
+            return []
+        entries = self.client.xrange(self._events_key(user_id), min=f'{last_seq + 1}-0')
+        if not entries or int(entries[0][0].split(b'-')[0]) != last_seq + 1:
+            return None
+        return [
+            {**json.loads(fields[b'event']), 'seq': int(entry_id.split(b'-')[0])}
+            for entry_id, fields in entries
+        ]
+
+    def current_seq(self, user_id):
+        return int(self.client.get(self._seq_key(user_id)) or 0)
+
+
+_buffer = None
+
+
+def get_replay_buffer():
+    """Повертає буфер подій, налаштований у settings.TASK_REPLAY."""
+    global _buffer
+    if _buffer is None:
+        config = getattr(settings, 'TASK_REPLAY', {})
+        backend = import_string(config.get('BACKEND', 'api.replay.InMemoryReplayBuffer'))
+        _buffer = backend(size=config.get('SIZE', 500), **config.get('OPTIONS', {}))
+    return _buffer
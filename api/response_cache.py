@@ -0,0 +1,259 @@
+import functools
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.module_loading import import_string
+
+from .conditional import query_digest, task_version
+
+logger = logging.getLogger(__name__)
+
+
+class BaseResponseCache:
+    """Кеш серіалізованих JSON-відповідей read-ендпоінтів.
+
+    Ключ містить версію задач користувача (UserTaskStats.version), яку TaskEvents
+    збільшує власнику і всім отримувачам зміненої задачі. Тому запис з REST чи
+    TaskConsumer робить старі записи недосяжними без явного видалення, а самі
+    вони витісняються за LRU/TTL.
+    """
+
+    def __init__(self, ttl=300, max_entry_bytes=1024 * 1024, **options):
+        self.ttl = ttl
+        self.max_entry_bytes = max_entry_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Повертає збережене тіло відповіді (bytes) або None."""
+        body = self._get(key)
+        if body is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return body
+
+    def set(self, key, body):
+        # Завеликі відповіді не кешуємо, щоб одна сторінка не витіснила весь кеш
+        if len(body) <= self.max_entry_bytes:
+            self._set(key, body)
+
+    async def aget(self, key):
+        return await sync_to_async(self.get, thread_sensitive=False)(key)
+
+    async def aset(self, key, body):
+        return await sync_to_async(self.set, thread_sensitive=False)(key, body)
+
+    def clear(self):
+        raise NotImplementedError
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+        }
+
+    def _get(self, key):
+        raise NotImplementedError
+
+    def _set(self, key, body):
+        raise NotImplementedError
+
+
+class LocMemResponseCache(BaseResponseCache):
+    """LRU у пам'яті процесу, обмежений сумарним розміром тіл — для тестів і розробки."""
+
+    def __init__(self, ttl=300, max_entry_bytes=1024 * 1024, max_bytes=64 * 1024 * 1024, **options):
+        super().__init__(ttl, max_entry_bytes, **options)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._size = 0
+        self.evictions = 0
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    async def aget(self, key):
+        # Без I/O — переходити в потік немає сенсу
+        return self.get(key)
+
+    async def aset(self, key, body):
+        self.set(key, body)
+
+    def stats(self):
+        return {
+            **super().stats(),
+            'size': len(self._entries),
+            'bytes': self._size,
+            'max_bytes': self.max_bytes,
+            'evictions': self.evictions,
+        }
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            body, expires_at = entry
+            if expires_at <= time.monotonic():
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return body
+
+    def _set(self, key, body):
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (body, time.monotonic() + self.ttl)
+            self._size += len(body)
+            while self._size > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _drop(self, key):
+        body, _ = self._entries.pop(key)
+        self._size -= len(body)
+
+
+class RedisResponseCache(BaseResponseCache):
+    """Кеш у Redis, спільний для всіх процесів.
+
+    Обсяг обмежує maxmemory окремого інстансу Redis з політикою allkeys-lru;
+    кожен запис додатково живе не довше ttl. Витіснення беруться з INFO stats.
+    Недоступний Redis не ламає запити: читання стає промахом, запис пропускається.
+    """
+
+    def __init__(self, ttl=300, max_entry_bytes=1024 * 1024, url='redis://localhost:6379/0',
+                 prefix='response_cache', timeout=0.5, **options):
+        super().__init__(ttl, max_entry_bytes, **options)
+        import redis
+
+        # Короткі тайм-аути: кеш, що не відповідає, має бути промахом, а не завислим запитом
+        self.client = redis.Redis.from_url(url, socket_connect_timeout=timeout, socket_timeout=timeout)
+        self.prefix = prefix
+        self.errors = 0
+        self._redis_errors = (redis.RedisError, OSError)
+
+    def clear(self):
+        keys = list(self.client.scan_iter(f'{self.prefix}:*'))
+        if keys:
+            self.client.delete(*keys)
+
+    def stats(self):
+        stats = {**super().stats(), 'errors': self.errors}
+        try:
+            memory = self.client.info('memory')
+            stats.update({
+                'bytes': memory.get('used_memory'),
+                'max_bytes': memory.get('maxmemory'),
+                'evictions': self.client.info('stats').get('evicted_keys'),
+            })
+        except self._redis_errors as e:
+            logger.warning(f"Response cache stats are unavailable: {e}")
+        return stats
+
+    def _get(self, key):
+        try:
+            return self.client.get(f'{self.prefix}:{key}')
+        except self._redis_errors as e:
+            self.errors += 1
+            logger.warning(f"Response cache read failed, serving uncached response: {e}")
+            return None
+
+    def _set(self, key, body):
+        try:
+            self.client.set(f'{self.prefix}:{key}', body, ex=self.ttl)
+        except self._redis_errors as e:
+            self.errors += 1
+            logger.warning(f"Response cache write skipped: {e}")
+
+
+def user_tasks_key(name):
+    """Ключ для даних задач користувача: ім'я в'ю, користувач, версія задач, параметри."""
+    def key_func(request, *args, **kwargs):
+        version, _ = task_version(request)
+        return f'{name}:{request.user.id}:{version}:{query_digest(request)}'
+    return key_func
+
+
+def cache_response(key_func):
+    """Декоратор методу APIView: віддає збережене JSON-тіло або кешує нове.
+
+    Кешуються лише відповіді 200, відрендерені JSONRenderer (не браузерний API
+    і не потокові сторінки).
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(view, request, *args, **kwargs):
+            if getattr(request, 'accepted_renderer', None) is None or request.accepted_renderer.format != 'json':
+                return method(view, request, *args, **kwargs)
+            cache = get_response_cache()
+            key = key_func(request, *args, **kwargs)
+            body = cache.get(key)
+            if body is None:
+                response = method(view, request, *args, **kwargs)
+                if response.status_code != 200 or getattr(response, 'streaming', False):
+                    return response
+                body = request.accepted_renderer.render(
+                    response.data, request.accepted_media_type, {'request': request, 'view': view}
+                )
+                cache.set(key, body)
+            return HttpResponse(body, content_type=request.accepted_media_type)
+        return wrapper
+    return decorator
+
+
+def acache_response(key_func, prefetch=None):
+    """cache_response() для async-методів AsyncAPIView.
+
+    prefetch(request) — корутина, що заздалегідь читає з БД дані для key_func.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        async def wrapper(view, request, *args, **kwargs):
+            if getattr(request, 'accepted_renderer', None) is None or request.accepted_renderer.format != 'json':
+                return await method(view, request, *args, **kwargs)
+            if prefetch is not None:
+                await prefetch(request)
+            cache = get_response_cache()
+            key = key_func(request, *args, **kwargs)
+            body = await cache.aget(key)
+            if body is None:
+                response = await method(view, request, *args, **kwargs)
+                if response.status_code != 200 or getattr(response, 'streaming', False):
+                    return response
+                body = request.accepted_renderer.render(
+                    response.data, request.accepted_media_type, {'request': request, 'view': view}
+                )
+                await cache.aset(key, body)
+            return HttpResponse(body, content_type=request.accepted_media_type)
+        return wrapper
+    return decorator
+
+
+_response_cache = None
+
+
+def get_response_cache():
+    """Повертає кеш відповідей, налаштований у settings.RESPONSE_CACHE."""
+    global _response_cache
+    if _response_cache is None:
+        config = getattr(settings, 'RESPONSE_CACHE', {})
+        backend = import_string(config.get('BACKEND', 'api.response_cache.LocMemResponseCache'))
+        _response_cache = backend(
+            ttl=config.get('TTL', 300),
+            max_entry_bytes=config.get('MAX_ENTRY_BYTES', 1024 * 1024),
+            **config.get('OPTIONS', {}),
+        )
+    return _response_cache
@@ -0,0 +1,7 @@
+from drf_spectacular.contrib.rest_framework_simplejwt import SimpleJWTScheme
+
+
+class CachedJWTScheme(SimpleJWTScheme):
+    """Опис bearer-автентифікації в OpenAPI для CachedJWTAuthentication (та сама схема jwtAuth, що й у simplejwt)."""
+
+    target_class = 'api.authentication.CachedJWTAuthentication'
@@ -0,0 +1,171 @@
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Task
+
+# SQLite: зовнішня FTS5-таблиця над api_task, синхронізується тригерами на будь-який
+# запис (включно з update() і bulk-операціями, що оминають сигнали Django)
+SQLITE_INSTALL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS api_task_fts USING fts5(
+        title, description,
+        content='api_task', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS api_task_fts_insert AFTER INSERT ON api_task BEGIN
+        INSERT INTO api_task_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS api_task_fts_delete AFTER DELETE ON api_task BEGIN
+        INSERT INTO api_task_fts(api_task_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS api_task_fts_update AFTER UPDATE OF title, description ON api_task BEGIN
+        INSERT INTO api_task_fts(api_task_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO api_task_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END
+    """,
+]
+
+SQLITE_DROP = [
+    'DROP TRIGGER IF EXISTS api_task_fts_update',
+    'DROP TRIGGER IF EXISTS api_task_fts_delete',
+    'DROP TRIGGER IF EXISTS api_task_fts_insert',
+    'DROP TABLE IF EXISTS api_task_fts',
+]
+
+# PostgreSQL: згенерована колонка tsvector завжди актуальна, над нею GIN-індекс.
+# Конфігурація 'simple', бо задачі пишуть і українською, і англійською
+POSTGRES_INSTALL = [
+    """
+    ALTER TABLE api_task ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(description, '')), 'B')
+    ) STORED
+    """,
+    'CREATE INDEX IF NOT EXISTS task_search_vector_idx ON api_task USING gin (search_vector)',
+]
+
+POSTGRES_DROP = [
+    'DROP INDEX IF EXISTS task_search_vector_idx',
+    'ALTER TABLE api_task DROP COLUMN IF EXISTS search_vector',
+]
+
+SQLITE_TRIGGERS = {'api_task_fts_insert', 'api_task_fts_delete', 'api_task_fts_update'}
+
+# Та сама схема, що в міграції 0010_task_search (там SQL зафіксовано окремо)
+INSTALL = {'sqlite': SQLITE_INSTALL, 'postgresql': POSTGRES_INSTALL}
+DROP = {'sqlite': SQLITE_DROP, 'postgresql': POSTGRES_DROP}
+
+# Скільки слів запиту враховується: довші запити лише сповільнюють пошук
+MAX_TERMS = 8
+
+SQLITE_SEARCH = """
+    SELECT t.id FROM api_task_fts f JOIN api_task t ON t.id = f.rowid
+    WHERE api_task_fts MATCH %s
+      AND (t.user_id = %s OR EXISTS (
+          SELECT 1 FROM api_task_shared_with s WHERE s.task_id = t.id AND s.customuser_id = %s))
+    ORDER BY bm25(api_task_fts, 10.0, 1.0), t.id
+    LIMIT %s
+"""
+
+POSTGRES_SEARCH = """
+    SELECT t.id FROM api_task t
+    WHERE t.search_vector @@ to_tsquery('simple', %s)
+      AND (t.user_id = %s OR EXISTS (
+          SELECT 1 FROM api_task_shared_with s WHERE s.task_id = t.id AND s.customuser_id = %s))
+    ORDER BY ts_rank(t.search_vector, to_tsquery('simple', %s)) DESC, t.id
+    LIMIT %s
+"""
+
+
+def install_search_index(conn=connection):
+    """Створює індекс повнотекстового пошуку для поточного бекенду БД."""
+    with conn.cursor() as cursor:
+        for statement in INSTALL.get(conn.vendor, []):
+            cursor.execute(statement)
+
+
+def drop_search_index(conn=connection):
+    with conn.cursor() as cursor:
+        for statement in DROP.get(conn.vendor, []):
+            cursor.execute(statement)
+
+
+def rebuild_search_index(conn=connection):
+    """Перебудовує індекс з таблиці задач.
+
+    На SQLite заново створює і тригери: міграції, що перебудовують api_task
+    (ALTER через копію таблиці), їх видаляють.
+    """
+    if conn.vendor == 'sqlite':
+        drop_search_index(conn)
+        install_search_index(conn)
+        with conn.cursor() as cursor:
+            cursor.execute("INSERT INTO api_task_fts(api_task_fts) VALUES ('rebuild')")
+    elif conn.vendor == 'postgresql':
+        install_search_index(conn)
+        with conn.cursor() as cursor:
+            cursor.execute('REINDEX INDEX task_search_vector_idx')
+
+
+def restore_search_index(conn=connection):
+    """Відновлює тригери FTS на SQLite, якщо їх видалила перебудова api_task.
+
+    Поки тригерів не було, записи в api_task не потрапляли в індекс, тож він
+    перебудовується цілком. Повертає True, якщо щось відновлено.
+    """
+    if conn.vendor != 'sqlite':
+        return False
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT type, name FROM sqlite_master WHERE name LIKE 'api_task_fts%'")
+        objects = cursor.fetchall()
+    if ('table', 'api_task_fts') not in objects:
+        # Міграцію 0010 ще не застосовано (або її відкочено)
+        return False
+    if SQLITE_TRIGGERS <= {name for kind, name in objects if kind == 'trigger'}:
+        return False
+    rebuild_search_index(conn)
+    return True
+
+
+def search_terms(query):
+    return re.findall(r'\w+', query.lower())[:MAX_TERMS]
+
+
+def search_tasks(user_id, query, limit):
+    """Повертає задачі користувача і поширені з ним, що містять усі слова запиту.
+
+    Останнє слово шукається за префіксом (пошук під час набору). Результати
+    впорядковані за релевантністю: збіг у заголовку важить більше, ніж в описі.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return []
+    if connection.vendor == 'sqlite':
+        match = ' '.join(f'"{term}"' for term in terms) + '*'
+        params = [match, user_id, user_id, limit]
+        sql = SQLITE_SEARCH
+    elif connection.vendor == 'postgresql':
+        tsquery = ' & '.join(terms) + ':*'
+        params = [tsquery, user_id, user_id, tsquery, limit]
+        sql = POSTGRES_SEARCH
+    else:
+        # Інші бекенди без індексу: звичайний LIKE, новіші задачі першими
+        tasks = Task.objects.filter(Q(user_id=user_id) | Q(shared_with=user_id))
+        for term in terms:
+            tasks = tasks.filter(Q(title__icontains=term) | Q(description__icontains=term))
+        return list(tasks.distinct().order_by('-created_at', '-id')[:limit])
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        ids = [row[0] for row in cursor.fetchall()]
+    tasks = Task.objects.in_bulk(ids)
+    return [tasks[task_id] for task_id in ids if task_id in tasks]
@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from .avatars import avatar_variant_urls, check_avatar_upload
 from .models import CustomUser, Task
 
 
@@ -20,6 +21,9 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         )
         return user
 
+    def validate_avatar(self, value):
+        return check_avatar_upload(value) if value else value
+
 
 class UserLoginSerializer(serializers.Serializer):
     email = serializers.EmailField()
@@ -27,12 +31,37 @@ class UserLoginSerializer(serializers.Serializer):
 
 
 class UserProfileSerializer(serializers.ModelSerializer):
+    # Квадратні WebP/JPEG-варіанти аватара з хешем вмісту в імені; порожньо, поки їх не згенеровано
+    avatar_variants = serializers.SerializerMethodField()
+
     class Meta:
         model = CustomUser
-        fields = ['username', 'email', 'gender', 'birth_date', 'avatar']
+        fields = ['username', 'email', 'gender', 'birth_date', 'avatar', 'avatar_variants']
+
+    def get_avatar_variants(self, user):
+        return avatar_variant_urls(user, self.context.get('request'))
+
+    def validate_avatar(self, value):
+        return check_avatar_upload(value) if value else value
+
+    def update(self, instance, validated_data):
+        # Лише передані поля: last_login, is_online і avatar_variants оновлюються окремими
+        # UPDATE (вхід, синхронізація присутності, process_avatar) і не мають перезаписуватися
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        instance.save(update_fields=[*validated_data, 'updated_at'])
+        return instance
 
 
 class TaskSerializer(serializers.ModelSerializer):
+    def __init__(self, *args, **kwargs):
+        # Опціональний параметр fields обмежує набір полів у відповіді
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for field_name in set(self.fields) - set(fields):
+                self.fields.pop(field_name)
+
     class Meta:
         model = Task
         fields = ['id', 'title', 'description', 'completed', 'created_at']
\ No newline at end of file
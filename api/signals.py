@@ -0,0 +1,24 @@
+import logging
+
+from django.db import connections
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+
+from .models import CustomUser
+from .search import restore_search_index
+from .user_cache import get_user_cache
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def invalidate_cached_user(sender, instance, **kwargs):
+    get_user_cache().invalidate(instance.pk)
+
+
+@receiver(post_migrate)
+def restore_search_triggers(sender, using, **kwargs):
+    # На SQLite міграції, що перебудовують api_task через копію таблиці, видаляють і тригери FTS
+    if sender.name == 'api' and restore_search_index(connections[using]):
+        logger.warning("Task search triggers were missing after migrate; search index rebuilt")
@@ -0,0 +1,251 @@
+from collections import Counter, defaultdict
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.db.models import Count, Exists, F, Max, OuterRef, Q
+from django.utils import timezone
+
+from .models import CustomUser, Task, TaskChange, UserTaskStats
+
+COUNTER_FIELDS = ('total', 'completed', 'shared_with_me')
+
+
+class TaskEvents:
+    """Накопичує зміни задач з одного шляху запису і застосовує їх до похідних даних.
+
+    Кожен шлях запису (REST-в'ю, дії TaskConsumer, пакетні операції) описує, що
+    сталося, а commit() інкрементально оновлює UserTaskStats: лічильники і версію
+    (для ETag) власника та всіх, з ким задачі поширені, — і записує зміни в журнал
+    TaskChange під новою версією кожного отримувача. Викликати commit() слід
+    у тій самій транзакції, що й сам запис.
+    """
+
+    def __init__(self):
+        self.counters = defaultdict(Counter)
+        self.changes = defaultdict(dict)
+
+    @property
+    def touched(self):
+        return set(self.changes)
+
+    def created(self, owner_id, task_id, completed):
+        self.counters[owner_id]['total'] += 1
+        if completed:
+            self.counters[owner_id]['completed'] += 1
+        self._record(task_id, {owner_id}, TaskChange.OP_UPSERT)
+
+    def updated(self, owner_id, task_id, recipients, completed_before=None, completed_after=None):
+        if completed_before is not None and completed_after is not None and completed_before != completed_after:
+            self.counters[owner_id]['completed'] += 1 if completed_after else -1
+        self._record(task_id, {owner_id, *recipients}, TaskChange.OP_UPSERT)
+
+    def deleted(self, owner_id, task_id, recipients, completed):
+        self.counters[owner_id]['total'] -= 1
+        if completed:
+            self.counters[owner_id]['completed'] -= 1
+        for user_id in recipients:
+            if user_id != owner_id:
+                self.counters[user_id]['shared_with_me'] -= 1
+        self._record(task_id, {owner_id, *recipients}, TaskChange.OP_DELETE)
+
+    def shared(self, owner_id, task_id, recipients, target_user_id):
+        self.counters[target_user_id]['shared_with_me'] += 1
+        self._record(task_id, {owner_id, target_user_id, *recipients}, TaskChange.OP_UPSERT)
+
+    def _record(self, task_id, user_ids, op):
+        # Для кожного отримувача важить лише остання операція над задачею
+        for user_id in user_ids:
+            self.changes[user_id][task_id] = op
+
+    def commit(self):
+        user_ids = self.touched | set(self.counters)
+        if not user_ids:
+            return
+        now = timezone.now()
+        missing = set()
+        counted = set()
+        for user_id, counter in self.counters.items():
+            updates = {field: F(field) + delta for field, delta in counter.items() if delta}
+            if not updates:
+                continue
+            counted.add(user_id)
+            updated = UserTaskStats.objects.filter(user_id=user_id).update(
+                last_modified=now, version=F('version') + 1, **updates
+            )
+            if not updated:
+                missing.add(user_id)
+        # Решті користувачів (без змін лічильників) оновлюємо last_modified і версію одним запитом
+        touched = user_ids - counted
+        updated = UserTaskStats.objects.filter(user_id__in=touched).update(
+            last_modified=now, version=F('version') + 1
+        ) if touched else 0
+        if updated < len(touched):
+            missing |= touched - set(
+                UserTaskStats.objects.filter(user_id__in=touched).values_list('user_id', flat=True)
+            )
+        if missing:
+            # Лічильників ще немає: рахуємо їх з нуля, вже з урахуванням цього запису
+            rebuild_task_stats(missing, last_modified=now, pending=self.counters)
+            UserTaskStats.objects.filter(user_id__in=missing).update(version=F('version') + 1)
+        if self.changes:
+            versions = dict(UserTaskStats.objects.filter(user_id__in=self.changes).values_list('user_id', 'version'))
+            TaskChange.objects.bulk_create([
+                TaskChange(user_id=user_id, version=versions[user_id], task_id=task_id, op=op)
+                for user_id, ops in self.changes.items()
+                for task_id, op in ops.items()
+            ])
+        self.counters.clear()
+        self.changes.clear()
+
+
+def compute_task_stats(user_ids):
+    """Повертає {user_id: {total, completed, shared_with_me, last_modified}} агрегатами по Task."""
+    stats = {user_id: {'total': 0, 'completed': 0, 'shared_with_me': 0, 'last_modified': None} for user_id in user_ids}
+    owned = (
+        Task.objects.filter(user_id__in=user_ids).values('user_id')
+        .annotate(total=Count('id'), completed=Count('id', filter=Q(completed=True)), last_modified=Max('updated_at'))
+        .order_by()
+    )
+    for row in owned:
+        stats[row['user_id']].update(total=row['total'], completed=row['completed'], last_modified=row['last_modified'])
+    shared = (
+        Task.shared_with.through.objects.filter(customuser_id__in=user_ids).values('customuser_id')
+        .annotate(count=Count('id')).order_by()
+    )
+    for row in shared:
+        stats[row['customuser_id']]['shared_with_me'] = row['count']
+    return stats
+
+
+def rebuild_task_stats(user_ids, last_modified=None, pending=None):
+    """Перераховує і записує лічильники для заданих користувачів (upsert).
+
+    Новий рядок починає історію змін з версії 1: попередні зміни задач у журналі
+    відсутні, тож синхронізація з меншої версії вимагає повного списку. Якщо ж
+    до запису, що створює рядок (pending — лічильники незакоміченого TaskEvents),
+    у користувача не було жодної задачі, журнал повний від початку: changes_floor=0
+    і синхронізація з since=0 можлива.
+    """
+    stats = compute_task_stats(list(user_ids))
+    pending = pending or {}
+
+    def changes_floor(user_id, values):
+        before = [values[field] - pending.get(user_id, {}).get(field, 0) for field in COUNTER_FIELDS]
+        return 1 if any(before) else 0
+
+    UserTaskStats.objects.bulk_create(
+        [
+            UserTaskStats(
+                user_id=user_id, version=1, changes_floor=changes_floor(user_id, values),
+                **{**values, 'last_modified': last_modified or values['last_modified']},
+            )
+            for user_id, values in stats.items()
+        ],
+        update_conflicts=True,
+        unique_fields=['user'],
+        update_fields=[*COUNTER_FIELDS, 'last_modified'],
+    )
+
+
+def get_task_stats(user_id):
+    """Лічильники користувача одним читанням рядка; за відсутності — будуються."""
+    stats = UserTaskStats.objects.filter(user_id=user_id).first()
+    if stats is None:
+        rebuild_task_stats([user_id])
+        stats = UserTaskStats.objects.get(user_id=user_id)
+    return stats
+
+
+def rebuild_all_task_stats(chunk_size=1000):
+    """Повне перерахування лічильників пачками користувачів (для команди reconcile)."""
+    processed, last_id = 0, 0
+    while True:
+        batch = list(
+            CustomUser.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:chunk_size]
+        )
+        if not batch:
+            return processed
+        rebuild_task_stats(batch)
+        processed += len(batch)
+        last_id = batch[-1]
+
+
+def get_task_version(user_id):
+    """Версія і час останньої зміни задач користувача одним читанням рядка."""
+    row = UserTaskStats.objects.filter(user_id=user_id).values_list('version', 'last_modified').first()
+    if row is None:
+        stats = get_task_stats(user_id)
+        row = (stats.version, stats.last_modified)
+    return row
+
+
+def get_task_changes(user_id, since, limit):
+    """Зміни задач користувача після версії since, згорнуті до останньої операції над задачею.
+
+    Повертає (version, has_more, changed_tasks, deleted_ids) або None, якщо since
+    старіша за історію в журналі (компактовану або неповну до появи журналу) і
+    потрібна повна синхронізація. Версії не
+    розриваються між сторінками, тож наступний запит іде з since=version.
+    """
+    stats = get_task_stats(user_id)
+    if since < stats.changes_floor:
+        return None
+    entries = TaskChange.objects.filter(user_id=user_id, version__gt=since).order_by('version', 'task_id')
+    page = list(entries.values_list('version', 'task_id', 'op')[:limit + 1])
+    has_more = len(page) > limit
+    if has_more:
+        last_version = page[limit - 1][0]
+        if page[limit][0] != last_version:
+            page = page[:limit]
+        elif page[0][0] != last_version:
+            page = [entry for entry in page if entry[0] < last_version]
+        else:
+            # Одна версія більша за сторінку (пакетна операція) — віддаємо її цілком
+            page = list(entries.filter(version=last_version).values_list('version', 'task_id', 'op'))
+    ops = {task_id: op for _, task_id, op in page}
+    upserted = [task_id for task_id, op in ops.items() if op == TaskChange.OP_UPSERT]
+    tasks = list(
+        Task.objects.filter(Q(user_id=user_id) | Q(shared_with=user_id), id__in=upserted).distinct().order_by('id')
+    )
+    # Задача, яка вже зникла або перестала бути доступною, теж є надгробком
+    visible = {task.id for task in tasks}
+    deleted = sorted(task_id for task_id in ops if task_id not in visible)
+    version = page[-1][0] if has_more else max(stats.version, page[-1][0] if page else since)
+    return version, has_more, tasks, deleted
+
+
+def compact_task_changes(before, chunk_size=1000):
+    """Компакція журналу TaskChange пачками користувачів.
+
+    Видаляє записи, перекриті новішими про ту саму задачу (це не змінює відповіді
+    для жодного since), і всі записи, старші за before, піднімаючи changes_floor
+    до найбільшої видаленої версії. Повертає кількість видалених записів.
+    """
+    removed, last_id = 0, 0
+    while True:
+        batch = list(
+            CustomUser.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:chunk_size]
+        )
+        if not batch:
+            return removed
+        with transaction.atomic():
+            newer = TaskChange.objects.filter(
+                user_id=OuterRef('user_id'), task_id=OuterRef('task_id'), version__gt=OuterRef('version')
+            )
+            removed += TaskChange.objects.filter(Exists(newer), user_id__in=batch).delete()[0]
+            expired = TaskChange.objects.filter(user_id__in=batch, created_at__lt=before)
+            floors = expired.values('user_id').annotate(floor=Max('version')).order_by()
+            for row in floors:
+                UserTaskStats.objects.filter(user_id=row['user_id'], changes_floor__lt=row['floor']).update(
+                    changes_floor=row['floor']
+                )
+            removed += expired.delete()[0]
+        last_id = batch[-1]
+
+
+async def aget_task_version(user_id):
+    """Асинхронний get_task_version(): читання рядка без переходу в потік."""
+    row = await UserTaskStats.objects.filter(user_id=user_id).values_list('version', 'last_modified').afirst()
+    if row is None:
+        row = await sync_to_async(get_task_version)(user_id)
+    return row
@@ -1,51 +1,159 @@
 from celery import shared_task
-from django.core.mail import send_mail
-from django.contrib.auth import get_user_model
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
 from django.utils import timezone
-from .models import CustomUser, Task
+from django.db.models import Count, Q
+from .models import CustomUser, Task, TaskReport
 import time
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
-from datetime import datetime
+from datetime import datetime, timedelta
+from itertools import islice
+from smtplib import SMTPException
+from .presence import get_presence_store, make_presence_delta
+from .task_events import compact_task_changes
+from .avatars import build_avatar_variants
+from .user_cache import get_user_cache
 
 
 @shared_task(queue='email')
 def send_email_to_online_users(subject, message):
-    online_users = CustomUser.objects.filter(is_online=True)
-    recipient_emails = [user.email for user in online_users if user.email]
-    if recipient_emails:
-        send_mail(
-            subject,
-            message,
-            'your_email@gmail.com',
-            recipient_emails,
-            fail_silently=False,
-        )
-    return f"Email sent to {len(recipient_emails)} users"
+    """Розбиває онлайн-адресатів на пачки і ставить кожну окремою підзадачею."""
+    chunk_size = getattr(settings, 'EMAIL_CHUNK_SIZE', 50)
+    emails = (
+        CustomUser.objects.filter(is_online=True).exclude(email='')
+        .values_list('email', flat=True).iterator(chunk_size=chunk_size * 10)
+    )
+    recipients = chunks = 0
+    while chunk := list(islice(emails, chunk_size)):
+        send_email_chunk.delay(subject, message, chunk)
+        recipients += len(chunk)
+        chunks += 1
+    return f"Email queued for {recipients} users in {chunks} chunks"
 
-@shared_task
-def generate_user_task_report(user_id):
-    User = get_user_model()
+@shared_task(
+    bind=True,
+    queue='email',
+    rate_limit=getattr(settings, 'EMAIL_CHUNK_RATE_LIMIT', '30/m'),
+    max_retries=5,
+)
+def send_email_chunk(self, subject, message, recipients):
+    """Надсилає пачку листів через одне SMTP-з'єднання, кожному адресату окремо.
+
+    Адресати не бачать одне одного; при помилці повторюється лише решта пачки.
+    """
+    sent = 0
     try:
-        user = User.objects.get(id=user_id)
-    except User.DoesNotExist:
-        return f"User {user_id} does not exist"
+        # Відкриття з'єднання (connect, STARTTLS, AUTH) — теж у try, тож і його збої повторюються
+        with get_connection() as connection:
+            for email in recipients:
+                connection.send_messages([EmailMessage(subject, message, 'your_email@gmail.com', [email])])
+                sent += 1
+    except (SMTPException, OSError) as exc:
+        if sent == len(recipients):
+            # Усі листи вже прийняті сервером, збій лише при закритті з'єднання
+            return f"Email sent to {sent} users"
+        raise self.retry(args=(subject, message, recipients[sent:]), exc=exc,
+                         countdown=2 ** self.request.retries * 30)
+    return f"Email sent to {len(recipients)} users"
+
+def task_counts(users):
+    """Один GROUP BY по користувачах з умовними агрегатами замість двох COUNT на кожного."""
+    rows = users.annotate(
+        total=Count('task'),
+        completed=Count('task', filter=Q(task__completed=True)),
+    ).values('id', 'email', 'total', 'completed').order_by('id')
+    return [
+        {
+            'user_id': row['id'],
+            'email': row['email'],
+            'total': row['total'],
+            'completed': row['completed'],
+            'incomplete': row['total'] - row['completed'],
+        }
+        for row in rows.iterator(chunk_size=2000)
+    ]
 
-    total_tasks = user.user_tasks.count()
-    completed_tasks = user.user_tasks.filter(completed=True).count()
-    incomplete_tasks = total_tasks - completed_tasks
-    result = f"User {user_id} Task Report: Total: {total_tasks}, Completed: {completed_tasks}, Incomplete: {incomplete_tasks}"
 
+def notify_report_ready(report, result):
     channel_layer = get_channel_layer()
-    print("Sending WebSocket message...")
     async_to_sync(channel_layer.group_send)(
         "admin_notifications",
         {
             "type": "task_update",
             "operation": "Generate Report",
-            "data": {"user_id": user_id},
+            "data": {"report_id": report.id, **report.params},
             "result": result,
             "timestamp": timezone.now().isoformat()
         }
     )
-    return result
\ No newline at end of file
+
+
+@shared_task(queue='long_running')
+def generate_user_task_report(user_id):
+    rows = task_counts(CustomUser.objects.filter(id=user_id))
+    if not rows:
+        return f"User {user_id} does not exist"
+
+    row = rows[0]
+    report = TaskReport.objects.create(scope='user', params={'user_id': user_id}, rows=rows)
+    result = f"User {user_id} Task Report: Total: {row['total']}, Completed: {row['completed']}, Incomplete: {row['incomplete']}"
+    notify_report_ready(report, result)
+    return result
+
+@shared_task(queue='long_running')
+def generate_task_report_batch(start_id=None, end_id=None):
+    """Звіт по всіх користувачах (або діапазону id) одним проходом з GROUP BY."""
+    users = CustomUser.objects.all()
+    params = {}
+    if start_id is not None:
+        users = users.filter(id__gte=start_id)
+        params['start_id'] = start_id
+    if end_id is not None:
+        users = users.filter(id__lte=end_id)
+        params['end_id'] = end_id
+
+    rows = task_counts(users)
+    report = TaskReport.objects.create(scope='range' if params else 'all', params=params, rows=rows)
+    result = f"Task report #{report.id}: {len(rows)} users, {sum(row['total'] for row in rows)} tasks"
+    notify_report_ready(report, result)
+    return result
+
+@shared_task
+def sync_presence_to_db():
+    """Пакетно переносить зміни присутності у CustomUser.is_online (двома UPDATE)."""
+    store = get_presence_store()
+    expired = store.expire()
+    dirty = store.pop_dirty()
+    online_ids = [user_id for user_id, is_online in dirty.items() if is_online]
+    offline_ids = [user_id for user_id, is_online in dirty.items() if not is_online]
+    if online_ids:
+        CustomUser.objects.filter(id__in=online_ids, is_online=False).update(is_online=True)
+    if offline_ids:
+        CustomUser.objects.filter(id__in=offline_ids, is_online=True).update(is_online=False)
+    # update() оминає post_save, тож кешовані в усіх процесах користувачі інвалідуються явно
+    user_cache = get_user_cache()
+    for user_id in dirty:
+        user_cache.invalidate(user_id)
+
+    if expired:
+        # Користувачі, чиї з'єднання протухли без disconnect, мають зникнути і з адмін-панелі
+        channel_layer = get_channel_layer()
+        async_to_sync(channel_layer.group_send)(
+            'admin_online',
+            make_presence_delta({label: False for label in expired.values()}, store.next_seq())
+        )
+    return f"Presence synced: {len(online_ids)} online, {len(offline_ids)} offline, {len(expired)} expired"
+
+@shared_task(queue='long_running')
+def compact_task_change_log():
+    """Компакція журналу змін задач: старші за TASK_CHANGES_RETENTION_DAYS записи видаляються."""
+    before = timezone.now() - timedelta(days=getattr(settings, 'TASK_CHANGES_RETENTION_DAYS', 30))
+    removed = compact_task_changes(before)
+    return f"Task change log compacted: {removed} entries removed"
+
+@shared_task(queue='long_running')
+def process_avatar(user_id, avatar_name):
+    """Перевіряє, очищає від метаданих і нарізає аватар користувача на варіанти."""
+    result = build_avatar_variants(user_id, avatar_name)
+    return f"Avatar of user {user_id}: {result}"
@@ -0,0 +1,24 @@
+from . import backpressure, connections, login_throttle, presence, replay, response_cache, user_cache
+
+# Бекенди в пам'яті процесу замість Redis, щоб тести і бенчмарки не потребували зовнішніх сервісів
+IN_MEMORY_BACKENDS = {
+    'CHANNEL_LAYERS': {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+    'PRESENCE': {'BACKEND': 'api.presence.InMemoryPresenceStore', 'TTL': 90},
+    'TASK_REPLAY': {'BACKEND': 'api.replay.InMemoryReplayBuffer', 'SIZE': 500},
+    'RESPONSE_CACHE': {'BACKEND': 'api.response_cache.LocMemResponseCache'},
+    'USER_CACHE': {'MAX_SIZE': 10000, 'TTL': 60, 'SHARED_CACHE': None},
+    'LOGIN_THROTTLE': {'BACKEND': 'api.login_throttle.InMemoryLoginAttemptStore'},
+    'WEBSOCKET_HEARTBEAT': {'PING_INTERVAL': 3600, 'IDLE_TIMEOUT': 7200},
+}
+
+
+def reset_backends():
+    """Скидає синглтони get_*(), щоб кожен тест чи сценарій бенчмарку отримав свіжі бекенди з налаштувань."""
+    backpressure._user_buckets = None
+    connections._registry = None
+    login_throttle._throttle = None
+    presence._store = None
+    presence._broadcaster = None
+    replay._buffer = None
+    response_cache._response_cache = None
+    user_cache._user_cache = None
@@ -1,3 +1,1315 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import shutil
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+from smtplib import SMTPAuthenticationError, SMTPServerDisconnected
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from celery.exceptions import Retry
+
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.sql import emit_post_migrate_signal
+from django.db import connection, models, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from drf_spectacular.generators import SchemaGenerator
+import redis
+from PIL import Image
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+# Redis у пам'яті (з Lua через lupa) — лише для тестів RedisPresenceStore, якщо встановлено
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+from . import response_cache, user_cache
+from .avatars import build_avatar_variants
+from .broadcast import task_recipients, task_with_recipients
+from .backpressure import OutboundQueue, TokenBucket, UserBuckets, flow_stats
+from .management.commands import benchmark
+from .connections import IDLE_CLOSE_CODE, get_connection_registry
+from .consumers import OnlineUsersConsumer, TaskConsumer
+from .media import check_media_backend
+from .models import CustomUser, Task, TaskReport, UserTaskStats
+from .pagination import TaskCursorPaginator
+from .presence import InMemoryPresenceStore, RedisPresenceStore, get_presence_store
+from .replay import get_replay_buffer
+from .response_cache import RedisResponseCache
+from .search import search_tasks
+from .task_events import COUNTER_FIELDS, TaskEvents, compact_task_changes, compute_task_stats, rebuild_task_stats
+from .tasks import generate_task_report_batch, generate_user_task_report, send_email_chunk, sync_presence_to_db
+from .testing import IN_MEMORY_BACKENDS, reset_backends
+from .user_cache import BaseInvalidationChannel, UserCache, get_user_cache
+
+
+class BackendsMixin:
+    password = 'pw12345!'
+
+    def setUp(self):
+        reset_backends()
+        self.addCleanup(reset_backends)
+        self.user = self.create_user('u1')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_user(self, username, **fields):
+        return CustomUser.objects.create_user(
+            username=username, email=f'{username}@example.com', password=self.password, gender='M', **fields,
+        )
+
+
+@override_settings(**IN_MEMORY_BACKENDS)
+class APITestCase(BackendsMixin, TestCase):
+    pass
+
+
+# Consumer ходить у БД з окремих потоків, а schema_editor SQLite не працює в транзакції тесту
+@override_settings(**IN_MEMORY_BACKENDS)
+class APITransactionTestCase(BackendsMixin, TransactionTestCase):
+    async def connect(self, path='/ws/tasks/', user=None, consumer=TaskConsumer):
+        communicator = WebsocketCommunicator(consumer.as_asgi(), path)
+        communicator.scope['user'] = user or self.user
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def connect_and_sync(self, path='/ws/tasks/', user=None):
+        communicator = await self.connect(path, user)
+        self.assertEqual((await communicator.receive_json_from())['action'], 'sync')
+        return communicator
+
+
+class RecordingInvalidationChannel(BaseInvalidationChannel):
+    def __init__(self, **options):
+        super().__init__(**options)
+        self.published = []
+        self.callback = None
+        self.connected = True
+
+    @property
+    def listening(self):
+        return self.connected
+
+    def publish(self, user_id):
+        self.published.append(user_id)
+
+    def listen(self, callback):
+        self.callback = callback
+
+
+class InvalidationBus:
+    """Спільна шина для кількох UserCache, що імітують окремі процеси."""
+
+    def __init__(self):
+        self.callbacks = []
+
+    def channel(self):
+        bus = self
+
+        class BusChannel(BaseInvalidationChannel):
+            def publish(self, user_id):
+                for callback in bus.callbacks:
+                    callback(user_id)
+
+            def listen(self, callback):
+                bus.callbacks.append(callback)
+
+        return BusChannel()
+
+
+class UserCacheTests(APITestCase):
+    def test_invalidation_is_published_and_applied_from_other_processes(self):
+        channel = RecordingInvalidationChannel()
+        cache = UserCache(invalidation=channel)
+        cache.get(self.user.pk)
+        cache.invalidate(self.user.pk)
+        self.assertEqual(channel.published, [self.user.pk])
+
+        cache.get(self.user.pk)
+        CustomUser.objects.filter(pk=self.user.pk).update(username='renamed')
+        # Повідомлення від іншого процесу
+        channel.callback(self.user.pk)
+        self.assertEqual(cache.get(self.user.pk).username, 'renamed')
+
+    def test_local_entries_are_not_trusted_while_channel_is_down(self):
+        channel = RecordingInvalidationChannel()
+        cache = UserCache(invalidation=channel)
+        cache.get(self.user.pk)
+        channel.connected = False
+        CustomUser.objects.filter(pk=self.user.pk).update(username='renamed')
+        self.assertEqual(cache.get(self.user.pk).username, 'renamed')
+        # Після перепідписки канал скидає все, що могло пропустити
+        channel.callback(None)
+        self.assertEqual(cache.stats()['size'], 0)
+
+    def test_login_invalidates_cached_user(self):
+        get_user_cache().get(self.user.pk)
+        response = APIClient().post('/api/login/', {'email': self.user.email, 'password': self.password})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(get_user_cache().get(self.user.pk).is_online)
+
+
+class ProfileUpdateTests(APITestCase):
+    def test_update_keeps_columns_written_by_other_paths(self):
+        # request.user — знімок з кешу, зроблений до входу і до обробки аватара
+        last_login = timezone.now()
+        variants = {'80': {'webp': 'avatars/1/0123456789abcdef-80.webp'}}
+        CustomUser.objects.filter(pk=self.user.pk).update(
+            last_login=last_login, is_online=True, avatar='avatars/1/0123456789abcdef.jpg', avatar_variants=variants,
+        )
+        response = self.client.put('/api/profile/', {'username': 'renamed'})
+        self.assertEqual(response.status_code, 200)
+
+        user = CustomUser.objects.get(pk=self.user.pk)
+        self.assertEqual(user.username, 'renamed')
+        self.assertEqual(user.last_login, last_login)
+        self.assertTrue(user.is_online)
+        self.assertEqual(user.avatar.name, 'avatars/1/0123456789abcdef.jpg')
+        self.assertEqual(user.avatar_variants, variants)
+        self.assertGreater(user.updated_at, self.user.updated_at)
+
+
+class UnreachableRedis:
+    """Клієнт Redis, чий сервер недоступний: кожна команда падає з ConnectionError."""
+
+    def __getattr__(self, name):
+        def command(*args, **kwargs):
+            raise redis.ConnectionError('Error 111 connecting to redis-cache:6379. Connection refused.')
+        return command
+
+
+class ResponseCacheTests(APITestCase):
+    def test_unreachable_redis_serves_uncached_responses(self):
+        cache = RedisResponseCache(url='redis://redis-cache:6379/0')
+        cache.client = UnreachableRedis()
+        response_cache._response_cache = cache
+        Task.objects.create(user=self.user, title='Task')
+
+        with self.assertLogs('api.response_cache', 'WARNING'):
+            for url in ('/api/tasks/', '/api/shared-tasks/', '/api/about/'):
+                with self.subTest(url=url):
+                    self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(self.client.get('/api/tasks/').json()[0]['title'], 'Task')
+        stats = cache.stats()
+        self.assertEqual(stats['hits'], 0)
+        # Кожен промах читання і кожен пропущений запис
+        self.assertEqual(stats['errors'], 8)
+
+
+@override_settings(LOGIN_THROTTLE={
+    'BACKEND': 'api.login_throttle.InMemoryLoginAttemptStore',
+    'IP': {'LIMIT': 3, 'WINDOW': 300},
+    'ACCOUNT': {'LIMIT': 2, 'WINDOW': 900},
+})
+class LoginThrottleTests(APITestCase):
+    def login(self, email, password, url='/api/login/', ip='10.0.0.1', **extra):
+        return APIClient().post(url, {'email': email, 'password': password}, REMOTE_ADDR=ip, **extra)
+
+    def test_account_limit_rejects_with_retry_after_before_hashing(self):
+        for _ in range(2):
+            self.assertEqual(self.login(self.user.email, 'wrong').status_code, 401)
+        with mock.patch('api.views.authenticate') as authenticate:
+            response = self.login(self.user.email, self.password)
+        self.assertEqual(response.status_code, 429)
+        authenticate.assert_not_called()
+        self.assertTrue(0 < int(response['Retry-After']) <= 900)
+
+    def test_successful_login_resets_account_counter(self):
+        self.assertEqual(self.login(self.user.email, 'wrong').status_code, 401)
+        self.assertEqual(self.login(self.user.email, self.password).status_code, 200)
+        # Без скидання друга невдача вичерпала б ліміт облікового запису (2)
+        self.assertEqual(self.login(self.user.email, 'wrong', ip='10.0.0.2').status_code, 401)
+        self.assertEqual(self.login(self.user.email, self.password, ip='10.0.0.2').status_code, 200)
+
+    def test_ip_and_account_limits_are_independent(self):
+        other = self.create_user('u2')
+        for _ in range(2):
+            self.login(self.user.email, 'wrong', ip='10.0.0.1')
+        # Обліковий запис заблоковано з будь-якої адреси, але інший користувач з тієї ж IP входить
+        self.assertEqual(self.login(self.user.email, self.password, ip='10.0.0.2').status_code, 429)
+        self.assertEqual(self.login(other.email, self.password, ip='10.0.0.1').status_code, 200)
+
+        # Третя невдача з IP вичерпує ліміт адреси (3) для всіх облікових записів
+        self.login('nobody@example.com', 'wrong', ip='10.0.0.1')
+        response = self.login(other.email, self.password, ip='10.0.0.1')
+        self.assertEqual(response.status_code, 429)
+        self.assertTrue(0 < int(response['Retry-After']) <= 300)
+        self.assertEqual(self.login(other.email, self.password, ip='10.0.0.3').status_code, 200)
+
+    def test_token_endpoint_is_throttled(self):
+        for _ in range(2):
+            self.assertEqual(self.login(self.user.email, 'wrong', url='/api/token/').status_code, 401)
+        with mock.patch('api.views.TokenObtainPairView.post') as post:
+            response = self.login(self.user.email, self.password, url='/api/token/')
+        self.assertEqual(response.status_code, 429)
+        post.assert_not_called()
+        # Невдачі спільні з LoginView
+        self.assertEqual(self.login(self.user.email, self.password).status_code, 429)
+
+    def test_forwarded_for_is_ignored_without_trusted_proxies(self):
+        for index in range(3):
+            self.login(f'nobody{index}@example.com', 'wrong', HTTP_X_FORWARDED_FOR=f'203.0.113.{index}')
+        response = self.login('nobody9@example.com', 'wrong', HTTP_X_FORWARDED_FOR='203.0.113.9')
+        self.assertEqual(response.status_code, 429)
+
+    def test_forwarded_for_is_used_behind_trusted_proxy(self):
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'NUM_PROXIES': 1}):
+            for index in range(3):
+                self.login(f'nobody{index}@example.com', 'wrong', HTTP_X_FORWARDED_FOR='203.0.113.1')
+            response = self.login('nobody9@example.com', 'wrong', HTTP_X_FORWARDED_FOR='203.0.113.2')
+        self.assertEqual(response.status_code, 401)
+
+
+@override_settings(PRESENCE={**IN_MEMORY_BACKENDS['PRESENCE'], 'BROADCAST_WINDOW': 0.2})
+class PresenceBroadcastTests(APITransactionTestCase):
+    async def connect_admin(self):
+        admin = await sync_to_async(self.create_user)('admin', is_staff=True)
+        communicator = await self.connect('/ws/online-users/', admin, OnlineUsersConsumer)
+        self.assertEqual(await communicator.receive_json_from(), {'action': 'online_users', 'users': [], 'seq': 0})
+        return communicator
+
+    async def test_join_and_leave_in_one_window_cancel_out(self):
+        admin = await self.connect_admin()
+        other = await sync_to_async(self.create_user)('u2')
+        tab = await self.connect_and_sync()
+        await tab.disconnect()
+        second = await self.connect_and_sync(user=other)
+        # Вхід і вихід u1 в одному вікні не дають жодного повідомлення, у дельті лише u2
+        delta = await admin.receive_json_from(timeout=1)
+        self.assertEqual(delta, {'action': 'online_users_delta', 'seq': 1, 'joined': ['u2@example.com'], 'left': []})
+        self.assertTrue(await admin.receive_nothing(timeout=0.5))
+        await second.disconnect()
+        await admin.disconnect()
+
+    async def test_delta_seq_is_monotonic(self):
+        admin = await self.connect_admin()
+        other = await sync_to_async(self.create_user)('u2')
+        first = await self.connect_and_sync()
+        deltas = [await admin.receive_json_from(timeout=1)]
+        second = await self.connect_and_sync(user=other)
+        deltas.append(await admin.receive_json_from(timeout=1))
+        await first.disconnect()
+        deltas.append(await admin.receive_json_from(timeout=1))
+        self.assertEqual([delta['seq'] for delta in deltas], [1, 2, 3])
+        self.assertEqual([(delta['joined'], delta['left']) for delta in deltas],
+                         [(['u1@example.com'], []), (['u2@example.com'], []), ([], ['u1@example.com'])])
+        await second.disconnect()
+        await admin.disconnect()
+
+    async def test_resync_after_gap_returns_snapshot(self):
+        admin = await self.connect_admin()
+        other = await sync_to_async(self.create_user)('u2')
+        first = await self.connect_and_sync()
+        self.assertEqual((await admin.receive_json_from(timeout=1))['seq'], 1)
+        # Дельту з seq 2 адмін не отримав (наприклад, її надіслав інший процес під час перепідключення)
+        await get_presence_store().anext_seq()
+        second = await self.connect_and_sync(user=other)
+        delta = await admin.receive_json_from(timeout=1)
+        self.assertEqual(delta['seq'], 3)
+
+        await admin.send_json_to({'action': 'resync'})
+        self.assertEqual(await admin.receive_json_from(), {
+            'action': 'online_users', 'users': ['u1@example.com', 'u2@example.com'], 'seq': 3,
+        })
+        await first.disconnect()
+        await second.disconnect()
+        await admin.disconnect()
+
+
+@override_settings(
+    WEBSOCKET_HEARTBEAT={'PING_INTERVAL': 0.1, 'IDLE_TIMEOUT': 0.4},
+    PRESENCE={**IN_MEMORY_BACKENDS['PRESENCE'], 'TTL': 0.5},
+)
+class HeartbeatTests(APITransactionTestCase):
+    async def test_socket_without_pong_is_closed_and_leaves_presence(self):
+        other = await sync_to_async(self.create_user)('u2')
+        silent = await self.connect_and_sync()
+        live = await self.connect_and_sync(user=other)
+
+        async def answer_pings(communicator, duration):
+            deadline = asyncio.get_running_loop().time() + duration
+            while asyncio.get_running_loop().time() < deadline:
+                if (await communicator.receive_json_from(timeout=1))['action'] == 'ping':
+                    await communicator.send_json_to({'action': 'pong'})
+
+        async def wait_for_close(communicator):
+            while True:
+                output = await communicator.receive_output(timeout=2)
+                if output['type'] == 'websocket.close':
+                    return output
+
+        closed, _ = await asyncio.gather(wait_for_close(silent), answer_pings(live, 1.2))
+        self.assertEqual(closed['code'], IDLE_CLOSE_CODE)
+        # Живий сокет пережив кілька TTL завдяки heartbeat, мовчазний зник із присутності одразу
+        store = get_presence_store()
+        self.assertEqual(await sync_to_async(store.expire)(), {})
+        self.assertEqual(await store.aonline_users(), {other.id: 'u2@example.com'})
+        self.assertEqual(get_connection_registry().stats()['reaped'], 1)
+        await live.disconnect()
+
+
+class ReplayTests(APITransactionTestCase):
+    def fill_buffer(self, count):
+        buffer = get_replay_buffer()
+        for index in range(count):
+            buffer.append(self.user.id, {'type': 'task_message', 'action': 'delete_task', 'task_id': index})
+
+    async def test_gap_larger_than_outbound_queue_is_replayed_in_order(self):
+        # 140 пропущених подій більше за OUTBOUND_QUEUE_SIZE (100)
+        self.fill_buffer(140)
+        communicator = await self.connect('/ws/tasks/?last_seq=0')
+        received = [await communicator.receive_json_from() for _ in range(141)]
+        self.assertEqual([message.get('seq') for message in received[:140]], list(range(1, 141)))
+        self.assertEqual(received[-1], {'action': 'sync', 'seq': 140})
+        self.assertTrue(await communicator.receive_nothing())
+        await communicator.disconnect()
+
+    @override_settings(TASK_REPLAY={'BACKEND': 'api.replay.InMemoryReplayBuffer', 'SIZE': 100})
+    async def test_nothing_is_sent_after_resync_required(self):
+        self.fill_buffer(140)
+        communicator = await self.connect('/ws/tasks/?last_seq=10')
+        self.assertEqual(await communicator.receive_json_from(), {'action': 'resync_required', 'seq': 140})
+        self.assertTrue(await communicator.receive_nothing())
+        await communicator.disconnect()
+
+
+class TaskActionTests(APITransactionTestCase):
+    async def test_malformed_task_id_is_rejected_before_dispatch(self):
+        communicator = await self.connect_and_sync()
+        for message in (
+            {'action': 'delete_task', 'task_id': '1 OR 1=1'},
+            {'action': 'delete_task', 'task_id': 0},
+            {'action': 'update_task', 'task': {'id': 2 ** 70, 'title': 'x'}},
+            {'action': 'share_task', 'task_id': '9' * 30, 'email': 'u2@example.com'},
+        ):
+            with self.subTest(message=message):
+                await communicator.send_json_to(message)
+                error = (await communicator.receive_json_from())['error']
+                self.assertIn(error, ('Task ID is required', 'Task ID and email are required'))
+        await communicator.disconnect()
+
+    async def test_string_task_id_is_coerced(self):
+        task = await Task.objects.acreate(user=self.user, title='old')
+        communicator = await self.connect_and_sync()
+        await communicator.send_json_to({'action': 'update_task', 'task': {'id': str(task.id), 'title': 'new'}})
+        message = await communicator.receive_json_from()
+        self.assertEqual((message['action'], message['task']['id'], message['task']['title']),
+                         ('update_task', task.id, 'new'))
+        await communicator.disconnect()
+
+    async def test_task_events_reach_only_owner_and_recipients(self):
+        other = await sync_to_async(self.create_user)('u2')
+        owner = await self.connect_and_sync()
+        stranger = await self.connect_and_sync(user=other)
+
+        await owner.send_json_to({'action': 'create_task', 'title': 'private'})
+        task_id = (await owner.receive_json_from())['task']['id']
+        await owner.send_json_to({'action': 'update_task', 'task': {'id': task_id, 'completed': True}})
+        self.assertEqual((await owner.receive_json_from())['action'], 'update_task')
+        self.assertTrue(await stranger.receive_nothing())
+
+        # Після поширення задачі події отримує і другий користувач
+        await owner.send_json_to({'action': 'share_task', 'task_id': task_id, 'email': 'u2@example.com'})
+        self.assertEqual((await owner.receive_json_from())['action'], 'share_task')
+        self.assertEqual((await stranger.receive_json_from())['action'], 'share_task')
+        await owner.send_json_to({'action': 'delete_task', 'task_id': task_id})
+        self.assertEqual((await owner.receive_json_from())['action'], 'delete_task')
+        self.assertEqual((await stranger.receive_json_from())['task_id'], task_id)
+        await owner.disconnect()
+        await stranger.disconnect()
+
+    async def test_unexpected_error_is_not_sent_to_client(self):
+        communicator = await self.connect_and_sync()
+        with mock.patch.object(TaskConsumer, 'share_owned_task', side_effect=RuntimeError('relation "x" does not exist')), \
+                self.assertLogs('api.consumers', 'ERROR'):
+            await communicator.send_json_to({'action': 'share_task', 'task_id': 1, 'email': 'u2@example.com'})
+            self.assertEqual(await communicator.receive_json_from(), {'error': 'Error processing request'})
+        await communicator.disconnect()
+
+
+@override_settings(WEBSOCKET_RATE_LIMIT={'CONNECTION': {'RATE': 0.01, 'BURST': 3}, 'USER': {'RATE': 0.01, 'BURST': 5}})
+class BackpressureTests(APITransactionTestCase):
+    # Відхиляється схемою до звернення в БД, але токен уже витрачено
+    action = {'action': 'delete_task', 'task_id': 0}
+
+    async def test_over_limit_action_gets_rejection_frame(self):
+        communicator = await self.connect_and_sync()
+        for _ in range(3):
+            await communicator.send_json_to(self.action)
+            self.assertEqual(await communicator.receive_json_from(), {'error': 'Task ID is required'})
+        await communicator.send_json_to(self.action)
+        rejection = await communicator.receive_json_from()
+        self.assertEqual(rejection['error'], 'Rate limit exceeded')
+        self.assertGreater(rejection['retry_after'], 0)
+        await communicator.disconnect()
+
+    async def test_flood_from_several_connections_is_capped_by_user_limit(self):
+        communicators = [await self.connect_and_sync() for _ in range(4)]
+
+        async def flood(communicator):
+            for _ in range(5):
+                await communicator.send_json_to(self.action)
+            return [(await communicator.receive_json_from())['error'] for _ in range(5)]
+
+        errors = [error for replies in await asyncio.gather(*map(flood, communicators)) for error in replies]
+        # Кожне з'єднання має 3 токени, але всі разом — лише 5 токенів користувача
+        self.assertEqual(errors.count('Task ID is required'), 5)
+        self.assertEqual(errors.count('Rate limit exceeded'), 15)
+        for communicator in communicators:
+            await communicator.disconnect()
+
+    @override_settings(WEBSOCKET_RATE_LIMIT={'CONNECTION': {'RATE': 0.01, 'BURST': 1}, 'MODE': 'close'})
+    async def test_close_mode_closes_socket(self):
+        communicator = await self.connect_and_sync()
+        await communicator.send_json_to(self.action)
+        await communicator.receive_json_from()
+        await communicator.send_json_to(self.action)
+        self.assertEqual(await communicator.receive_output(), {'type': 'websocket.close', 'code': 4429})
+        await communicator.disconnect()
+
+    async def test_pong_is_never_throttled(self):
+        communicator = await self.connect_and_sync()
+        for _ in range(3):
+            await communicator.send_json_to(self.action)
+            await communicator.receive_json_from()
+        throttled = flow_stats['throttled']
+        for _ in range(50):
+            await communicator.send_json_to({'action': 'pong'})
+        self.assertTrue(await communicator.receive_nothing())
+        self.assertEqual(flow_stats['throttled'], throttled)
+        await communicator.disconnect()
+
+
+class OutboundQueueTests(SimpleTestCase):
+    async def test_slow_client_drops_backlog_instead_of_growing(self):
+        sent, release = [], asyncio.Event()
+
+        async def send(message):
+            # Клієнт не читає, тож запис у сокет стоїть
+            await release.wait()
+            sent.append(message)
+
+        queue = OutboundQueue(send, max_size=10)
+        queue.start()
+        dropped = flow_stats['dropped']
+        for index in range(95):
+            queue.put({'n': index}, overflow_message={'action': 'resync_required'})
+            self.assertLessEqual(len(queue), 10)
+            await asyncio.sleep(0)
+        self.assertGreaterEqual(flow_stats['dropped'] - dropped, 80)
+
+        release.set()
+        while len(queue):
+            await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        queue.stop()
+        self.assertLessEqual(len(sent), 11)
+        self.assertIn({'action': 'resync_required'}, sent)
+        self.assertEqual(sent[-1], {'n': 94})
+
+    async def test_updates_of_same_key_are_coalesced(self):
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        queue = OutboundQueue(send)
+        for title in ('a', 'b', 'c'):
+            queue.put({'title': title}, key=('task', 1))
+        queue.put({'title': 'x'}, key=('task', 2))
+        queue.discard(('task', 2))
+        self.assertEqual(len(queue), 1)
+        queue.start()
+        await asyncio.sleep(0)
+        queue.stop()
+        self.assertEqual(sent, [{'title': 'c'}])
+
+
+class TokenBucketTests(SimpleTestCase):
+    def test_bucket_refills_at_rate_up_to_burst(self):
+        with mock.patch('api.backpressure.time.monotonic', return_value=100.0) as clock:
+            bucket = TokenBucket(rate=2, burst=3)
+            self.assertEqual([bucket.consume() for _ in range(4)], [True, True, True, False])
+            self.assertEqual(bucket.retry_after(), 0.5)
+            clock.return_value = 100.5
+            self.assertTrue(bucket.consume())
+            self.assertFalse(bucket.consume())
+            clock.return_value = 200.0
+            self.assertEqual(sum(bucket.consume() for _ in range(10)), 3)
+
+    def test_user_buckets_are_shared_and_bounded(self):
+        buckets = UserBuckets(rate=1, burst=1, max_size=2)
+        self.assertIs(buckets.get(1), buckets.get(1))
+        first = buckets.get(1)
+        buckets.get(2)
+        buckets.get(1)
+        buckets.get(3)
+        # Витісняється давно не використаний користувач 2, а не 1
+        self.assertIs(buckets.get(1), first)
+        self.assertEqual(list(buckets._buckets), [3, 1])
+
+
+class FakeClockMixin:
+    """Підміняє годинник api.presence, щоб TTL з'єднань спливав без очікування."""
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch('api.presence.time')
+        self.clock = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.clock.time.return_value = self.clock.monotonic.return_value = 1000.0
+
+    def tick(self, seconds):
+        self.clock.time.return_value = self.clock.monotonic.return_value = self.clock.time.return_value + seconds
+
+
+class PresenceStoreTests(FakeClockMixin, SimpleTestCase):
+    def make_store(self):
+        return InMemoryPresenceStore(ttl=90)
+
+    def setUp(self):
+        super().setUp()
+        self.store = self.make_store()
+
+    def test_user_stays_online_until_last_tab_closes(self):
+        self.assertTrue(self.store.connect(1, 'tab-1', 'u1'))
+        self.assertFalse(self.store.connect(1, 'tab-2', 'u1'))
+        self.assertFalse(self.store.disconnect(1, 'tab-1'))
+        self.assertEqual(self.store.online_users(), {1: 'u1'})
+        self.assertTrue(self.store.disconnect(1, 'tab-2'))
+        self.assertEqual(self.store.online_users(), {})
+        self.assertEqual(self.store.pop_dirty(), {1: False})
+
+    def test_connection_without_heartbeat_expires(self):
+        self.store.connect(1, 'tab-1', 'u1')
+        self.store.connect(2, 'tab-2', 'u2')
+        self.store.pop_dirty()
+        self.tick(60)
+        self.store.heartbeat(2, 'tab-2')
+        self.tick(60)
+        self.assertEqual(self.store.expire(), {1: 'u1'})
+        self.assertEqual(self.store.online_users(), {2: 'u2'})
+        self.assertEqual(self.store.pop_dirty(), {1: False})
+        self.assertEqual(self.store.expire(), {})
+
+    def test_reconnect_after_ttl_lapse_is_not_reported_as_online(self):
+        self.store.connect(1, 'tab-1', 'u1')
+        self.store.pop_dirty()
+        # Старе з'єднання протухло, але expire() ще не запускався: для адмінів і БД користувач онлайн
+        self.tick(120)
+        self.assertFalse(self.store.connect(1, 'tab-2', 'u1'))
+        self.assertEqual(self.store.expire(), {})
+        self.assertEqual(self.store.online_users(), {1: 'u1'})
+        self.assertEqual(self.store.pop_dirty(), {})
+
+    def test_expire_reaps_many_users_in_one_pass(self):
+        for user_id in range(1, 51):
+            self.store.connect(user_id, f'tab-{user_id}', f'u{user_id}')
+        self.tick(60)
+        for user_id in range(1, 51, 2):
+            self.store.heartbeat(user_id, f'tab-{user_id}')
+        self.tick(60)
+        self.assertEqual(self.store.expire(), {user_id: f'u{user_id}' for user_id in range(2, 51, 2)})
+        self.assertEqual(sorted(self.store.online_users()), list(range(1, 51, 2)))
+
+
+@skipUnless(fakeredis, 'fakeredis is not installed')
+class RedisPresenceStoreTests(PresenceStoreTests):
+    def make_store(self):
+        with mock.patch('redis.Redis.from_url', return_value=fakeredis.FakeRedis()):
+            return RedisPresenceStore(ttl=90)
+
+    def test_expire_is_single_script_call(self):
+        for user_id in range(1, 21):
+            self.store.connect(user_id, f'tab-{user_id}', f'u{user_id}')
+        # Перший виклик завантажує скрипт у Redis (NOSCRIPT і повтор)
+        self.store.expire()
+        self.tick(120)
+        with mock.patch.object(self.store.client, 'evalsha', wraps=self.store.client.evalsha) as evalsha:
+            self.assertEqual(len(self.store.expire()), 20)
+        self.assertEqual(evalsha.call_count, 1)
+
+
+class PresenceSyncTests(FakeClockMixin, APITestCase):
+    def sync(self):
+        return sync_presence_to_db()
+
+    def test_dirty_users_are_written_to_db_once(self):
+        other = self.create_user('u2')
+        store = get_presence_store()
+        store.connect(self.user.id, 'tab-1', 'u1')
+        store.connect(other.id, 'tab-2', 'u2')
+        store.disconnect(other.id, 'tab-2')
+        self.sync()
+        self.assertEqual(dict(CustomUser.objects.values_list('username', 'is_online')), {'u1': True, 'u2': False})
+        # Без нових змін синхронізація не ходить у БД
+        with self.assertNumQueries(0):
+            self.sync()
+
+    def test_expired_users_go_offline_and_admins_get_delta(self):
+        store = get_presence_store()
+        store.connect(self.user.id, 'tab-1', 'u1')
+        self.sync()
+        layer = get_channel_layer()
+        channel = async_to_sync(layer.new_channel)()
+        async_to_sync(layer.group_add)('admin_online', channel)
+
+        self.tick(120)
+        self.assertEqual(self.sync(), 'Presence synced: 0 online, 1 offline, 1 expired')
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_online)
+        delta = async_to_sync(layer.receive)(channel)
+        self.assertEqual((delta['joined'], delta['left']), ([], ['u1']))
+
+
+class MediaServingTests(SimpleTestCase):
+    content = bytes(range(256)) * 1024
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        (Path(media_root) / 'avatars' / '5').mkdir(parents=True)
+        (Path(media_root) / 'avatars' / '5' / '0123456789abcdef.png').write_bytes(self.content)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    async def test_asgi_streams_file_in_blocks(self):
+        response = await self.async_client.get('/media/avatars/5/0123456789abcdef.png')
+        self.assertEqual(response.status_code, 200)
+        # Асинхронний ітератор: ASGIHandler не вичитує файл у пам'ять перед відправкою
+        self.assertTrue(response.is_async)
+        blocks = [block async for block in response.streaming_content]
+        self.assertEqual(b''.join(blocks), self.content)
+        self.assertEqual(max(map(len, blocks)), 64 * 1024)
+        self.assertEqual(response['Content-Length'], str(len(self.content)))
+
+    async def test_asgi_range(self):
+        response = await self.async_client.get('/media/avatars/5/0123456789abcdef.png', headers={'Range': 'bytes=10-19'})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join([block async for block in response.streaming_content]), self.content[10:20])
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(self.content)}')
+        self.assertEqual(response['Content-Length'], '10')
+
+    def test_wsgi_uses_file_response(self):
+        response = self.client.get('/media/avatars/5/0123456789abcdef.png', headers={'Range': 'bytes=-4'})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), self.content[-4:])
+
+    def test_deploy_check_flags_django_backend(self):
+        self.assertEqual([warning.id for warning in check_media_backend(None)], ['api.W001'])
+        with override_settings(MEDIA_SERVING={'BACKEND': 'x-accel-redirect'}):
+            self.assertEqual(check_media_backend(None), [])
+
+
+class SchemaTests(SimpleTestCase):
+    def test_cached_jwt_authentication_is_documented_as_bearer(self):
+        schema = SchemaGenerator().get_schema(request=None, public=True)
+        self.assertEqual(schema['components']['securitySchemes']['jwtAuth'], {
+            'type': 'http', 'scheme': 'bearer', 'bearerFormat': 'JWT',
+        })
+        self.assertIn({'jwtAuth': []}, schema['paths']['/api/tasks/']['get']['security'])
+
+class MiddlewareTests(SimpleTestCase):
+    def test_middleware_chain_is_async_capable(self):
+        # Один синхронний middleware змушує кожен ASGI-запит пройти через єдиний потік thread_sensitive
+        for path in settings.MIDDLEWARE:
+            with self.subTest(middleware=path):
+                self.assertTrue(getattr(import_string(path), 'async_capable', False))
+
+    async def test_static_files_are_served_under_asgi(self):
+        response = await self.async_client.get('/static/img/logo.png')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/png')
+
+
+class AvatarProcessingTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(
+            MEDIA_ROOT=media_root, AVATAR_PIPELINE={'SIZES': (40,), 'FORMATS': ('webp',)},
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def upload(self):
+        buffer = io.BytesIO()
+        Image.new('RGB', (64, 64), 'red').save(buffer, 'PNG')
+        return default_storage.save(f'avatars/raw-{self.user.pk}.png', ContentFile(buffer.getvalue()))
+
+    def test_celery_invalidation_reaches_web_worker_cache(self):
+        bus = InvalidationBus()
+        web_cache = UserCache(invalidation=bus.channel())
+        user_cache._user_cache = UserCache(invalidation=bus.channel())
+
+        raw_name = self.upload()
+        CustomUser.objects.filter(pk=self.user.pk).update(avatar=raw_name)
+        self.assertEqual(web_cache.get(self.user.pk).avatar.name, raw_name)
+
+        self.assertEqual(build_avatar_variants(self.user.pk, raw_name), 'processed')
+        cached = web_cache.get(self.user.pk)
+        self.assertNotEqual(cached.avatar.name, raw_name)
+        self.assertEqual(list(cached.avatar_variants), ['40'])
+        self.assertFalse(default_storage.exists(raw_name))
+
+
+class TaskIndexTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        other = self.create_user('u2')
+        Task.objects.bulk_create(
+            Task(user=user, title=f'task {index}', completed=index % 3 == 0)
+            for user in (self.user, other) for index in range(200)
+        )
+        if connection.vendor == 'postgresql':
+            # Без статистики планувальник вважає таблицю порожньою і бере індекс FK з сортуванням
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE api_task')
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                # На кількох сотнях рядків seq scan дешевший, а перевіряємо саме придатність індексу
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                cursor.execute(f'EXPLAIN {sql}')
+            else:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return '\n'.join(str(row[-1]) for row in cursor.fetchall())
+
+    def share_tasks(self):
+        """Поширює 50 задач u2 з u1 і ще трьома читачами; повертає їхні id."""
+        readers = [self.user, *(self.create_user(f'reader{index}') for index in range(3))]
+        task_ids = list(Task.objects.exclude(user=self.user).values_list('id', flat=True)[:50])
+        Task.shared_with.through.objects.bulk_create(
+            Task.shared_with.through(task_id=task_id, customuser_id=user.id) for task_id in task_ids for user in readers
+        )
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE api_task_shared_with')
+        return task_ids
+
+    def last_query_plan(self, func, marker):
+        with CaptureQueriesContext(connection) as queries:
+            func()
+        [sql] = [q['sql'] for q in queries.captured_queries if marker in q['sql']]
+        return self.explain(sql)
+
+    def task_list_plan(self, query):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/api/tasks/?{query}')
+        self.assertEqual(response.status_code, 200)
+        [sql] = [q['sql'] for q in queries.captured_queries if 'FROM "api_task"' in q['sql'] and 'ORDER BY' in q['sql']]
+        return self.explain(sql)
+
+    def test_task_list_uses_user_created_index(self):
+        self.assertIn('task_user_created_idx', self.task_list_plan('limit=20'))
+
+    def test_completed_filter_uses_user_completed_index(self):
+        self.assertIn('task_user_completed_idx', self.task_list_plan('limit=20&completed=false'))
+        self.assertIn('task_user_completed_idx', self.task_list_plan('limit=20&completed=true'))
+
+    def test_next_page_keeps_index(self):
+        cursor = self.client.get('/api/tasks/?limit=20&completed=false').json()['next_cursor']
+        plan = self.task_list_plan(f'limit=20&completed=false&cursor={cursor}')
+        # Задачі створено майже одночасно, тож PG може дочитати сторінку за task_user_created_idx
+        # з фільтром completed; важливо, що порядок дає індекс, а не сортування
+        self.assertRegex(plan, 'task_user_(completed|created)_idx')
+        self.assertNotIn('Sort', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_next_page_seeks_to_cursor(self):
+        # created_at має бути в умові індексу, інакше сторінка перебирає всі попередні задачі.
+        # explain() з параметрами: з підставленими в SQL літералами SQLite будує інший план
+        cursor = self.client.get('/api/tasks/?limit=20').json()['next_cursor']
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as db_cursor:
+                db_cursor.execute('SET LOCAL enable_seqscan = off')
+        plan = TaskCursorPaginator(Task.objects.filter(user=self.user), 20).page_queryset(cursor).explain()
+        index_lines = [line for line in plan.splitlines() if 'task_user_created_idx' in line or 'Index Cond' in line]
+        self.assertTrue(any('created_at' in line for line in index_lines), plan)
+
+    def test_shared_tasks_use_recipient_index(self):
+        self.share_tasks()
+        plan = self.last_query_plan(lambda: self.client.get('/api/shared-tasks/'), 'INNER JOIN "api_task_shared_with"')
+        self.assertIn('api_task_shared_with_customuser_id', plan)
+
+    def test_recipient_lookups_use_task_index(self):
+        # Розсилка подій шукає отримувачів за task_id: унікальний (task_id, customuser_id) або індекс FK
+        task_ids = self.share_tasks()
+        for name, lookup in (
+            ('task_recipients', lambda: task_recipients({task_id: 0 for task_id in task_ids[:5]})),
+            ('task_with_recipients', lambda: task_with_recipients(task_ids[0])),
+        ):
+            with self.subTest(lookup=name):
+                self.assertIn('api_task_shared_with_task_id', self.last_query_plan(lookup, '"api_task_shared_with"'))
+
+
+class TaskListTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        Task.objects.bulk_create(
+            Task(user=self.user, title=f'task {index}', description='x' * 100, completed=index % 2 == 0)
+            for index in range(12)
+        )
+
+    def test_fields_limit_response_and_select(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/tasks/?fields=id,title')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 12)
+        self.assertTrue(all(set(task) == {'id', 'title'} for task in response.json()))
+        [sql] = [q['sql'] for q in queries.captured_queries if '"api_task"."title"' in q['sql']]
+        self.assertNotIn('"description"', sql)
+
+    def test_fields_with_cursor_pagination(self):
+        first = self.client.get('/api/tasks/?fields=title&limit=5').json()
+        # id і created_at вибираються для курсора, але у відповідь не потрапляють
+        self.assertEqual([set(task) for task in first['results']], [{'title'}] * 5)
+        second = self.client.get(f"/api/tasks/?fields=title&limit=5&cursor={first['next_cursor']}").json()
+        titles = [task['title'] for task in first['results'] + second['results']]
+        self.assertEqual(len(set(titles)), 10)
+
+    def test_unknown_fields_are_rejected(self):
+        for fields in ('title,password', ',', 'user'):
+            with self.subTest(fields=fields):
+                self.assertEqual(self.client.get(f'/api/tasks/?fields={fields}').status_code, 400)
+        self.assertEqual(self.client.get('/api/tasks/?fields=title,password').json(), {'error': 'Unknown fields: password'})
+
+
+# Потокова відповідь читає БД з ASGI-обробника, поза транзакцією TestCase
+class TaskListStreamingTests(APITransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        Task.objects.bulk_create(Task(user=self.user, title=f'task {index}') for index in range(12))
+
+    @override_settings(TASK_LIST_STREAM_THRESHOLD=5)
+    async def test_large_page_is_streamed(self):
+        token = AccessToken.for_user(self.user)
+        headers = {'Authorization': f'Bearer {token}'}
+        pages = []
+        url = '/api/tasks/?limit=5&fields=id,completed'
+        while url:
+            response = await self.async_client.get(url, headers=headers)
+            self.assertEqual(response.status_code, 200)
+            # Сторінка від порогу віддається async-ітератором частинами, а не одним тілом
+            self.assertTrue(response.streaming and response.is_async)
+            chunks = [chunk async for chunk in response.streaming_content]
+            self.assertGreater(len(chunks), 1)
+            page = json.loads(b''.join(chunks))
+            pages.append(page['results'])
+            url = page['next_cursor'] and f"/api/tasks/?limit=5&fields=id,completed&cursor={page['next_cursor']}"
+        self.assertEqual([len(page) for page in pages], [5, 5, 2])
+        self.assertEqual(sorted(task['id'] for page in pages for task in page),
+                         [task_id async for task_id in Task.objects.order_by('id').values_list('id', flat=True)])
+        self.assertEqual(set(pages[0][0]), {'id', 'completed'})
+
+
+class QueryCountTests(APITestCase):
+    """Кількість запитів ендпоінтів задач не залежить від кількості задач і операцій."""
+
+    def setUp(self):
+        super().setUp()
+        self.friend = self.create_user('u2')
+
+    def create_tasks(self, count, user=None):
+        user = user or self.user
+        tasks = Task.objects.bulk_create(Task(user=user, title=f'task {index}') for index in range(count))
+        for task in tasks[::2]:
+            task.shared_with.add(self.friend)
+        rebuild_task_stats([user.pk, self.friend.pk])
+        return [task.pk for task in tasks]
+
+    def test_task_list(self):
+        for count in (3, 60):
+            with self.subTest(count=count):
+                user = self.create_user(f'owner{count}')
+                self.client.force_authenticate(user)
+                self.create_tasks(count, user)
+                # Версія задач для ETag і ключа кешу + сам список
+                with self.assertNumQueries(2):
+                    response = self.client.get('/api/tasks/?completed=false')
+                self.assertEqual(len(response.json()), count)
+                with self.assertNumQueries(2):
+                    response = self.client.get('/api/tasks/?limit=50')
+                self.assertEqual(len(response.json()['results']), min(count, 50))
+
+    def test_task_detail(self):
+        [task_id] = self.create_tasks(1)
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get(f'/api/tasks/{task_id}/').status_code, 200)
+
+    def test_task_batch(self):
+        for size in (2, 20):
+            with self.subTest(size=size):
+                ids = self.create_tasks(2 * size)
+                operations = (
+                    [{'op': 'create', 'data': {'title': f'new {index}'}} for index in range(size)]
+                    + [{'op': 'update', 'id': task_id, 'data': {'completed': True}} for task_id in ids[:size]]
+                    + [{'op': 'delete', 'id': task_id} for task_id in ids[size:]]
+                )
+                # Savepoint, вибірка задач і отримувачів, INSERT, UPDATE, вибірка і видалення задач та
+                # зв'язків, лічильники й версії власника і отримувача, журнал змін — для будь-якої кількості
+                with self.assertNumQueries(13):
+                    response = self.client.post('/api/tasks/batch/', {'operations': operations}, format='json')
+                self.assertEqual(response.status_code, 200)
+
+
+class ConditionalGetTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        response = self.client.post('/api/tasks/', {'title': 'first'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.task_id = response.json()['id']
+
+    def assert_not_modified(self, path, etag):
+        # 304 лише за версією задач, без вибірки самих задач
+        with self.assertNumQueries(1):
+            response = self.client.get(path, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def check_etag_changes_after_write(self, path, write):
+        etag = self.client.get(path)['ETag']
+        self.assertTrue(etag)
+        self.assert_not_modified(path, etag)
+
+        write()
+        response = self.client.get(path, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assert_not_modified(path, response['ETag'])
+
+    def test_task_list_after_create(self):
+        self.check_etag_changes_after_write(
+            '/api/tasks/', lambda: self.client.post('/api/tasks/', {'title': 'second'}, format='json'),
+        )
+
+    def test_task_list_after_update(self):
+        self.check_etag_changes_after_write(
+            '/api/tasks/?completed=false',
+            lambda: self.client.put(f'/api/tasks/{self.task_id}/', {'completed': True}, format='json'),
+        )
+
+    def test_task_detail_after_update(self):
+        self.check_etag_changes_after_write(
+            f'/api/tasks/{self.task_id}/',
+            lambda: self.client.put(f'/api/tasks/{self.task_id}/', {'title': 'renamed'}, format='json'),
+        )
+
+    def test_task_detail_after_batch(self):
+        self.check_etag_changes_after_write(
+            f'/api/tasks/{self.task_id}/',
+            lambda: self.client.post('/api/tasks/batch/', {'operations': [
+                {'op': 'update', 'id': self.task_id, 'data': {'description': 'via batch'}},
+            ]}, format='json'),
+        )
+
+    def test_write_to_shared_task_changes_recipient_etag(self):
+        friend = self.create_user('u2')
+        Task.objects.get(pk=self.task_id).shared_with.add(friend)
+        friend_client = APIClient()
+        friend_client.force_authenticate(friend)
+        etag = friend_client.get('/api/shared-tasks/')['ETag']
+        self.client.put(f'/api/tasks/{self.task_id}/', {'title': 'renamed'}, format='json')
+        response = friend_client.get('/api/shared-tasks/', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]['title'], 'renamed')
+
+
+class TaskBatchTests(APITestCase):
+    def test_body_must_be_an_object(self):
+        for body in ([], [{'op': 'create', 'data': {'title': 'x'}}], 'operations', 42):
+            with self.subTest(body=body):
+                response = self.client.post('/api/tasks/batch/', body, format='json')
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), {'error': 'operations must be a non-empty list'})
+
+    def test_boolean_id_is_not_a_task_id(self):
+        task = Task.objects.create(pk=1, user=self.user, title='first')
+        response = self.client.post('/api/tasks/batch/', {'operations': [{'op': 'delete', 'id': True}]}, format='json')
+        self.assertEqual(response.json()['results'][0]['status'], 404)
+        self.assertTrue(Task.objects.filter(pk=task.pk).exists())
+
+
+class FlakyConnection:
+    """SMTP-з'єднання, що падає на відкритті або на n-му листі."""
+
+    def __init__(self, fail_on_open=False, fail_on=None):
+        self.fail_on_open = fail_on_open
+        self.fail_on = fail_on
+        self.sent = []
+
+    def __enter__(self):
+        if self.fail_on_open:
+            raise SMTPAuthenticationError(535, b'Authentication failed')
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def send_messages(self, messages):
+        if len(self.sent) == self.fail_on:
+            raise SMTPServerDisconnected('Connection unexpectedly closed')
+        self.sent.extend(message.to[0] for message in messages)
+        return len(messages)
+
+
+class SendEmailChunkTests(SimpleTestCase):
+    recipients = ['a@example.com', 'b@example.com', 'c@example.com']
+
+    def run_chunk(self, connection):
+        with mock.patch('api.tasks.get_connection', return_value=connection), \
+                mock.patch.object(send_email_chunk, 'retry', side_effect=Retry) as retry:
+            try:
+                send_email_chunk('Subject', 'Body', self.recipients)
+            except Retry:
+                pass
+        return retry
+
+    def test_connection_failure_is_retried(self):
+        retry = self.run_chunk(FlakyConnection(fail_on_open=True))
+        retry.assert_called_once()
+        self.assertEqual(retry.call_args.kwargs['args'], ('Subject', 'Body', self.recipients))
+
+    def test_only_unsent_recipients_are_retried(self):
+        connection = FlakyConnection(fail_on=1)
+        retry = self.run_chunk(connection)
+        self.assertEqual(connection.sent, ['a@example.com'])
+        self.assertEqual(retry.call_args.kwargs['args'], ('Subject', 'Body', self.recipients[1:]))
+
+
+class TaskReportTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.users = [self.user, self.create_user('u2'), self.create_user('u3')]
+        for user, total, completed in ((self.users[0], 7, 3), (self.users[1], 4, 4)):
+            Task.objects.bulk_create(
+                Task(user=user, title=f'task {index}', completed=index < completed) for index in range(total)
+            )
+        # Поширена задача рахується лише власнику
+        Task.objects.filter(user=self.users[1]).first().shared_with.add(self.users[2])
+
+    def expected_rows(self, users):
+        # Еталон — наївні COUNT на кожного користувача
+        rows = []
+        for user in users:
+            total = Task.objects.filter(user=user).count()
+            completed = Task.objects.filter(user=user, completed=True).count()
+            rows.append({'user_id': user.id, 'email': user.email, 'total': total, 'completed': completed,
+                         'incomplete': total - completed})
+        return rows
+
+    def test_batch_report_matches_per_user_counts(self):
+        generate_task_report_batch()
+        report = TaskReport.objects.latest('id')
+        self.assertEqual((report.scope, report.params), ('all', {}))
+        self.assertEqual(report.rows, self.expected_rows(self.users))
+        self.assertEqual([row['total'] for row in report.rows], [7, 4, 0])
+
+    def test_range_report(self):
+        result = generate_task_report_batch(self.users[1].id, self.users[2].id)
+        report = TaskReport.objects.latest('id')
+        self.assertEqual((report.scope, report.params), ('range', {'start_id': self.users[1].id, 'end_id': self.users[2].id}))
+        self.assertEqual(report.rows, self.expected_rows(self.users[1:]))
+        self.assertEqual(result, f'Task report #{report.id}: 2 users, 4 tasks')
+
+    def test_user_report(self):
+        result = generate_user_task_report(self.user.id)
+        self.assertEqual(TaskReport.objects.latest('id').rows, self.expected_rows([self.user]))
+        self.assertEqual(result, f'User {self.user.id} Task Report: Total: 7, Completed: 3, Incomplete: 4')
+        self.assertEqual(generate_user_task_report(0), 'User 0 does not exist')
+
+
+# Виконується на бекенді з DATABASE_URL: FTS5 на SQLite і tsvector на PostgreSQL
+class SearchTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.other = self.create_user('u2')
+        self.tasks = {
+            key: Task.objects.create(user=user, title=title, description=description)
+            for key, user, title, description in (
+                ('title', self.user, 'Quarterly report', 'send to finance'),
+                ('description', self.user, 'Call finance', 'ask about the report deadline'),
+                ('both', self.user, 'Report review', 'review the draft report'),
+                ('unrelated', self.user, 'Buy milk', 'and bread'),
+                ('shared', self.other, 'Shared report', ''),
+                ('foreign', self.other, 'Private report', ''),
+            )
+        }
+        self.tasks['shared'].shared_with.add(self.user)
+
+    def search(self, query):
+        return [task.id for task in search_tasks(self.user.id, query, 10)]
+
+    def ids(self, *keys):
+        return [self.tasks[key].id for key in keys]
+
+    def test_title_matches_rank_above_description_matches(self):
+        results = self.search('report')
+        self.assertEqual(sorted(results), sorted(self.ids('title', 'description', 'both', 'shared')))
+        self.assertEqual(results[-1], self.tasks['description'].id)
+        self.assertEqual(self.search('finance'), self.ids('description', 'title'))
+
+    def test_all_terms_are_required(self):
+        self.assertEqual(self.search('report deadline'), self.ids('description'))
+        self.assertEqual(self.search('report milk'), [])
+
+    def test_last_term_matches_by_prefix(self):
+        self.assertEqual(sorted(self.search('quart')), self.ids('title'))
+        self.assertEqual(self.search('review dra'), self.ids('both'))
+        # Префіксом шукається лише останнє слово запиту
+        self.assertEqual(self.search('dra review'), [])
+        self.assertEqual(self.search('REPORT Revie'), self.ids('both'))
+
+    def test_search_endpoint(self):
+        response = self.client.get('/api/tasks/search/?q=fin')
+        self.assertEqual([task['id'] for task in response.json()['results']], self.ids('description', 'title'))
+        self.assertEqual(self.client.get('/api/tasks/search/?q=+').status_code, 400)
+        self.assertEqual(self.client.get('/api/tasks/search/?q=report&limit=0').status_code, 400)
+
+
+class SearchTriggerTests(APITransactionTestCase):
+    def rebuild_task_table(self, max_length):
+        # На SQLite AlterField копіює api_task у нову таблицю, як і міграції, що її змінюють
+        old_field = Task._meta.get_field('title')
+        new_field = models.CharField(max_length=max_length)
+        new_field.set_attributes_from_name('title')
+        new_field.model = Task
+        with connection.schema_editor() as editor:
+            editor.alter_field(Task, old_field, new_field)
+        return new_field, old_field
+
+    def test_triggers_are_restored_after_table_rebuild(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('FTS5 triggers exist only on SQLite')
+        user = self.user
+        new_field, old_field = self.rebuild_task_table(300)
+        try:
+            task = Task.objects.create(user=user, title='written while triggers were gone')
+            self.assertEqual(search_tasks(user.id, 'triggers', 10), [])
+
+            emit_post_migrate_signal(verbosity=0, interactive=False, db='default')
+            self.assertEqual(search_tasks(user.id, 'triggers', 10), [task])
+            Task.objects.filter(pk=task.pk).update(title='renamed after restore')
+            self.assertEqual(search_tasks(user.id, 'renamed', 10), [task])
+        finally:
+            with connection.schema_editor() as editor:
+                editor.alter_field(Task, new_field, old_field)
+            emit_post_migrate_signal(verbosity=0, interactive=False, db='default')
+
+
+class TaskStatsTests(APITestCase):
+    def stats(self):
+        response = self.client.get('/api/tasks/stats/')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def assertCountersMatchTasks(self, *users):
+        # Інкрементальні лічильники мають збігатися з перерахунком з нуля
+        expected = compute_task_stats([user.id for user in users])
+        for user in users:
+            stats = UserTaskStats.objects.get(user=user)
+            self.assertEqual({field: getattr(stats, field) for field in COUNTER_FIELDS},
+                             {field: expected[user.id][field] for field in COUNTER_FIELDS})
+
+    def share(self, task_id, user):
+        # Як TaskConsumer.share_owned_task: поширення існує лише як дія WebSocket
+        with transaction.atomic():
+            Task.objects.get(pk=task_id).shared_with.add(user)
+            events = TaskEvents()
+            events.shared(self.user.id, task_id, set(), user.id)
+            events.commit()
+
+    def test_counters_follow_create_complete_and_delete(self):
+        other = self.create_user('u2')
+        ids = [self.client.post('/api/tasks/', {'title': title, 'completed': title == 'done'}, format='json').json()['id']
+               for title in ('done', 'todo', 'shared')]
+        stats = self.stats()
+        self.assertEqual((stats['total'], stats['completed'], stats['pending']), (3, 1, 2))
+
+        self.client.put(f'/api/tasks/{ids[1]}/', {'completed': True}, format='json')
+        # Повторне виконання не рахується двічі
+        self.client.put(f'/api/tasks/{ids[1]}/', {'completed': True}, format='json')
+        self.assertEqual(self.stats()['completed'], 2)
+        self.share(ids[2], other)
+        self.assertCountersMatchTasks(self.user, other)
+
+        self.client.delete(f'/api/tasks/{ids[0]}/')
+        self.client.post('/api/tasks/batch/', {'operations': [
+            {'op': 'create', 'data': {'title': 'batch'}},
+            {'op': 'update', 'id': ids[1], 'data': {'completed': False}},
+            {'op': 'delete', 'id': ids[2]},
+        ]}, format='json')
+        stats = self.stats()
+        self.assertEqual((stats['total'], stats['completed'], stats['pending']), (2, 0, 2))
+        self.assertEqual(UserTaskStats.objects.get(user=other).shared_with_me, 0)
+        self.assertCountersMatchTasks(self.user, other)
+
+    def test_stats_are_built_for_user_without_counters(self):
+        Task.objects.create(user=self.user, title='created outside TaskEvents', completed=True)
+        self.assertFalse(UserTaskStats.objects.filter(user=self.user).exists())
+        stats = self.stats()
+        self.assertIsNotNone(stats.pop('last_modified'))
+        self.assertEqual(stats, {'total': 1, 'completed': 1, 'pending': 0, 'shared_with_me': 0})
+        self.assertCountersMatchTasks(self.user)
+
+    def test_stats_require_authentication(self):
+        self.assertEqual(APIClient().get('/api/tasks/stats/').status_code, 401)
+
+
+class TaskChangesTests(APITestCase):
+    def changes(self, since, client=None):
+        return (client or self.client).get(f'/api/tasks/changes/?since={since}')
+
+    def test_new_user_can_sync_from_zero(self):
+        response = self.changes(0)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['changed'], [])
+
+        task_id = self.client.post('/api/tasks/', {'title': 'first'}, format='json').json()['id']
+        response = self.changes(0)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([task['id'] for task in response.json()['changed']], [task_id])
+
+    def test_first_write_creates_complete_history(self):
+        # Рядок лічильників з'являється вже в commit() першого запису
+        task_id = self.client.post('/api/tasks/', {'title': 'first'}, format='json').json()['id']
+        self.assertEqual([task['id'] for task in self.changes(0).json()['changed']], [task_id])
+
+    def test_tasks_outside_the_log_require_full_sync(self):
+        Task.objects.create(user=self.user, title='created before the change log')
+        self.client.post('/api/tasks/', {'title': 'second'}, format='json')
+        self.assertEqual(self.changes(0).status_code, 410)
+
+    def test_compacted_history_requires_full_sync(self):
+        self.client.post('/api/tasks/', {'title': 'first'}, format='json')
+        version = self.changes(0).json()['version']
+        self.client.post('/api/tasks/', {'title': 'second'}, format='json')
+        compact_task_changes(before=timezone.now() + timedelta(seconds=1))
+        self.assertEqual(self.changes(0).status_code, 410)
+        self.assertEqual(self.changes(version).status_code, 410)
+
+
+class BenchmarkTests(APITransactionTestCase):
+    def test_scenarios_run(self):
+        # Малий масштаб: лише перевірка, що сценарії не відстали від коду
+        for name in benchmark.SCENARIOS:
+            with self.subTest(scenario=name):
+                bench = benchmark.run_scenario(name, scale=0.01, repeat=1)
+                if bench.skipped:
+                    self.skipTest(bench.skipped)
+                self.assertTrue(bench.results)
@@ -3,7 +3,7 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from .views import (
-    RegisterView, LoginView, ProfileView, AboutView, TaskListView, TaskDetailView, admin_online_users_view, test_ws_view, SharedTasksView, send_notification, generate_task_report
+    RegisterView, LoginView, ProfileView, AboutView, TaskListView, TaskDetailView, TaskBatchView, TaskChangesView, TaskSearchView, TaskStatsView, admin_online_users_view, test_ws_view, SharedTasksView, send_notification, generate_task_report, task_report_detail, metrics
 )
 
 urlpatterns = [
@@ -12,12 +12,18 @@ urlpatterns = [
     path('profile/', ProfileView.as_view(), name='profile'),
     path('about/', AboutView.as_view(), name='about'),
     path('tasks/', TaskListView.as_view(), name='task-list'),
+    path('tasks/batch/', TaskBatchView.as_view(), name='task-batch'),
+    path('tasks/changes/', TaskChangesView.as_view(), name='task-changes'),
+    path('tasks/search/', TaskSearchView.as_view(), name='task-search'),
+    path('tasks/stats/', TaskStatsView.as_view(), name='task-stats'),
     path('tasks/<int:pk>/', TaskDetailView.as_view(), name='task-detail'),
     path('shared-tasks/', SharedTasksView.as_view(), name='shared-tasks'),
     path('admin/online-users/', admin_online_users_view, name='admin_online_users'),
     path('test-ws/', test_ws_view, name='test_ws'),
     path('send-notification/', send_notification, name='send_notification'),
     path('generate-task-report/', generate_task_report, name='generate_task_report'),
+    path('task-reports/<int:pk>/', task_report_detail, name='task_report_detail'),
+    path('metrics/', metrics, name='metrics'),
 ]
 
 if settings.DEBUG:
@@ -0,0 +1,235 @@
+import copy
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class BaseInvalidationChannel:
+    """Розсилка інвалідацій кешу користувачів між процесами.
+
+    publish() повідомляє всі процеси (воркери gunicorn, celery) про зміну
+    користувача; listen() реєструє обробник, який отримує id користувача або
+    None — «скинути все», коли повідомлення могли загубитися. Поки listening
+    хибне, процес не може довіряти своїм локальним записам.
+    """
+
+    def __init__(self, **options):
+        pass
+
+    @property
+    def listening(self):
+        return True
+
+    def publish(self, user_id):
+        raise NotImplementedError
+
+    def listen(self, callback):
+        raise NotImplementedError
+
+
+class LocalInvalidationChannel(BaseInvalidationChannel):
+    """Інвалідація лише в межах процесу — для тестів і розробки з одним процесом."""
+
+    def publish(self, user_id):
+        pass
+
+    def listen(self, callback):
+        pass
+
+
+class RedisInvalidationChannel(BaseInvalidationChannel):
+    """Інвалідації через Redis Pub/Sub; кожен процес слухає канал у фоновому потоці.
+
+    Після (пере)підписки обробник отримує None: повідомлення, надіслані, поки
+    з'єднання не було, загублено, тож локальні записи скидаються.
+    """
+
+    def __init__(self, url='redis://localhost:6379/0', channel='user_cache:invalidate', retry_delay=1.0, **options):
+        super().__init__(**options)
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.channel = channel
+        self.retry_delay = retry_delay
+        self._listening = threading.Event()
+        self._thread = None
+
+    @property
+    def listening(self):
+        return self._listening.is_set()
+
+    def publish(self, user_id):
+        import redis
+
+        try:
+            self.client.publish(self.channel, str(user_id))
+        except redis.RedisError as e:
+            # Інші процеси в цей час теж без підписки і не користуються локальними записами
+            logger.warning(f"User cache invalidation for user {user_id} was not published: {e}")
+
+    def listen(self, callback):
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, args=(callback,), name='user-cache-invalidation', daemon=True,
+            )
+            self._thread.start()
+
+    def _run(self, callback):
+        import redis
+
+        while True:
+            pubsub = self.client.pubsub()
+            try:
+                pubsub.subscribe(self.channel)
+                for message in pubsub.listen():
+                    if message['type'] == 'subscribe':
+                        callback(None)
+                        self._listening.set()
+                    elif message['type'] == 'message':
+                        callback(int(message['data']))
+            except redis.RedisError as e:
+                logger.warning(f"User cache invalidation channel disconnected: {e}")
+            finally:
+                self._listening.clear()
+                pubsub.close()
+            time.sleep(self.retry_delay)
+
+
+class UserCache:
+    """Кеш користувачів за id для JWT-автентифікації (REST і WebSocket).
+
+    Локальний LRU обмежений розміром і TTL; опційно за ним стоїть спільний
+    кеш Django (наприклад, Redis), щоб промах одного процесу не йшов у БД.
+    Записи інвалідуються сигналами post_save/post_delete моделі CustomUser і
+    явно після update(); invalidation розсилає це всім процесам, а поки канал
+    не слухається, локальні записи не використовуються.
+    """
+
+    def __init__(self, max_size=10000, ttl=60, shared_cache=None, invalidation=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.shared_cache = caches[shared_cache] if shared_cache else None
+        self.invalidation = invalidation or LocalInvalidationChannel()
+        self.invalidation.listen(self._on_invalidation)
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def get(self, user_id):
+        """Повертає копію користувача або None, якщо його не існує."""
+        user = self._get_local(user_id)
+        if user is None:
+            user = self._load(user_id)
+        return copy.copy(user) if user is not None else None
+
+    async def aget(self, user_id):
+        # Влучання в локальний кеш обходиться без переходу в потік БД
+        user = self._get_local(user_id)
+        if user is None:
+            user = await database_sync_to_async(self._load)(user_id)
+        return copy.copy(user) if user is not None else None
+
+    def invalidate(self, user_id):
+        """Прибирає користувача з кешу в усіх процесах."""
+        self._evict(user_id)
+        if self.shared_cache is not None:
+            self.shared_cache.delete(self._shared_key(user_id))
+        self.invalidation.publish(user_id)
+
+    def _evict(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def _on_invalidation(self, user_id):
+        if user_id is None:
+            self.clear()
+        else:
+            self._evict(user_id)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.shared_hits + self.misses
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'shared_hits': self.shared_hits,
+            'misses': self.misses,
+            'hit_ratio': (self.hits + self.shared_hits) / lookups if lookups else 0.0,
+        }
+
+    def _get_local(self, user_id):
+        if not self.invalidation.listening:
+            return None
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            user, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return user
+
+    def _load(self, user_id):
+        user = None
+        if self.shared_cache is not None:
+            user = self.shared_cache.get(self._shared_key(user_id))
+            if user is not None:
+                self.shared_hits += 1
+        if user is None:
+            self.misses += 1
+            User = get_user_model()
+            try:
+                user = User.objects.get(id=user_id)
+            except User.DoesNotExist:
+                return None
+            if self.shared_cache is not None:
+                self.shared_cache.set(self._shared_key(user_id), user, self.ttl)
+        self._set_local(user_id, user)
+        return user
+
+    def _set_local(self, user_id, user):
+        with self._lock:
+            self._entries[user_id] = (user, time.monotonic() + self.ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    @staticmethod
+    def _shared_key(user_id):
+        return f'user_cache:{user_id}'
+
+
+_user_cache = None
+
+
+def get_user_cache():
+    """Повертає кеш користувачів, налаштований у settings.USER_CACHE."""
+    global _user_cache
+    if _user_cache is None:
+        config = getattr(settings, 'USER_CACHE', {})
+        invalidation = config.get('INVALIDATION', {})
+        backend = import_string(invalidation.get('BACKEND', 'api.user_cache.LocalInvalidationChannel'))
+        _user_cache = UserCache(
+            max_size=config.get('MAX_SIZE', 10000),
+            ttl=config.get('TTL', 60),
+            shared_cache=config.get('SHARED_CACHE'),
+            invalidation=backend(**invalidation.get('OPTIONS', {})),
+        )
+    return _user_cache
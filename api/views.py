@@ -1,18 +1,47 @@
+from asgiref.sync import sync_to_async
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed, Throttled
 from rest_framework.permissions import IsAuthenticated
 from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.views import TokenObtainPairView
 from django.contrib.auth import authenticate
 from django.contrib.auth.decorators import user_passes_test
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Value
+from django.http import StreamingHttpResponse
 from django.shortcuts import render
-from .models import Task
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+from .models import CustomUser, Task, TaskReport
+from .broadcast import broadcast_task_changes, task_recipients
+from .task_events import TaskEvents, get_task_changes, get_task_stats
+from .pagination import TaskCursorPaginator, InvalidCursor
+from .search import search_tasks
 from .serializers import (
     UserRegistrationSerializer, UserLoginSerializer, UserProfileSerializer, TaskSerializer
 )
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAdminUser
-from .tasks import send_email_to_online_users, generate_user_task_report
+from .tasks import send_email_to_online_users, generate_user_task_report, generate_task_report_batch, process_avatar
+from .user_cache import get_user_cache
+from .login_throttle import get_client_ip, get_login_throttle
+from .connections import get_connection_registry
+from .backpressure import flow_stats
+from .response_cache import acache_response, cache_response, get_response_cache, user_tasks_key
+from .async_views import AsyncAPIView
+from .conditional import (
+    acondition, atask_version, task_list_etag, task_detail_etag, shared_tasks_etag, task_search_etag, task_last_modified,
+    profile_etag, profile_last_modified,
+)
+
+def schedule_avatar_processing(user):
+    """Ставить обробку щойно збереженого аватара в чергу після коміту транзакції."""
+    avatar_name = user.avatar.name if user.avatar else None
+    transaction.on_commit(lambda: process_avatar.delay(user.pk, avatar_name))
 
 class RegisterView(APIView):
     permission_classes = []
@@ -21,7 +50,9 @@ class RegisterView(APIView):
         """Реєстрація нового користувача. Приймає дані користувача (username, email, password, gender, birth_date, avatar) і створює нового користувача в системі."""
         serializer = UserRegistrationSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save()
+            user = serializer.save()
+            if user.avatar:
+                schedule_avatar_processing(user)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -30,38 +61,80 @@ class LoginView(APIView):
         """Аутентифікація користувача та видача JWT-токенів. Приймає email і пароль, повертає access та refresh токени для авторизованого користувача."""
         serializer = UserLoginSerializer(data=request.data)
         if serializer.is_valid():
+            email = serializer.validated_data['email']
+            throttle = get_login_throttle()
+            ip = get_client_ip(request)
+            # Відхиляємо до authenticate(), щоб перебір не витрачав CPU на хешування паролів
+            wait = throttle.check(ip, email)
+            if wait is not None:
+                raise Throttled(wait=wait)
             user = authenticate(
-                email=serializer.validated_data['email'],
+                email=email,
                 password=serializer.validated_data['password']
             )
             if user:
-                user.is_online = True  # Встановлюємо is_online=True
-                user.save()
+                throttle.success(email)
+                # last_login і is_online одним UPDATE лише цих колонок, без save() усієї моделі
+                CustomUser.objects.filter(pk=user.pk).update(last_login=timezone.now(), is_online=True)
+                get_user_cache().invalidate(user.pk)
                 refresh = RefreshToken.for_user(user)
                 return Response({
                     'refresh': str(refresh),
                     'access': str(refresh.access_token),
                 }, status=status.HTTP_200_OK)
+            throttle.failure(ip, email)
             return Response({'error': 'Invalid credentials'}, status=status.HTTP_401_UNAUTHORIZED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-class ProfileView(APIView):
+class TokenObtainView(TokenObtainPairView):
+    def post(self, request, *args, **kwargs):
+        """Видача JWT-токенів simplejwt з тими самими лімітами невдалих входів, що й у LoginView."""
+        email = str(request.data.get(CustomUser.USERNAME_FIELD, ''))
+        throttle = get_login_throttle()
+        ip = get_client_ip(request)
+        wait = throttle.check(ip, email)
+        if wait is not None:
+            raise Throttled(wait=wait)
+        try:
+            response = super().post(request, *args, **kwargs)
+        except AuthenticationFailed:
+            # Невірний пароль або неактивний користувач; помилки валідації полів не рахуються
+            throttle.failure(ip, email)
+            raise
+        throttle.success(email)
+        return response
+
+class ProfileView(AsyncAPIView):
     permission_classes = [IsAuthenticated]
 
-    def get(self, request):
+    @acondition(etag_func=profile_etag, last_modified_func=profile_last_modified)
+    async def get(self, request):
         """Отримання профілю авторизованого користувача.Повертає дані профілю (username, email, gender, birth_date, avatar)."""
         serializer = UserProfileSerializer(request.user)
         return Response(serializer.data)
 
-    def put(self, request):
+    async def put(self, request):
         """Оновлення профілю авторизованого користувача.Дозволяє частково оновити дані профілю, включаючи аватар."""
-        serializer = UserProfileSerializer(request.user, data=request.data, partial=True)
+        return await self.update_profile(request)
+
+    @sync_to_async
+    def update_profile(self, request):
+        # Валідатори унікальності і збереження файлу аватара — синхронні. request.user —
+        # копія з кешу автентифікації, тож зберігаємо поверх актуального рядка з БД
+        user = CustomUser.objects.get(pk=request.user.pk)
+        serializer = UserProfileSerializer(user, data=request.data, partial=True)
         if serializer.is_valid():
-            serializer.save()
+            if 'avatar' in serializer.validated_data:
+                # Варіанти попереднього аватара більше не актуальні; нові з'являться після обробки
+                user = serializer.save(avatar_variants={})
+                schedule_avatar_processing(user)
+            else:
+                serializer.save()
             return Response(serializer.data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 class AboutView(APIView):
+    @cache_response(lambda request, *args, **kwargs: f'about:{request.get_host()}')
     def get(self, request):
         """Інформація про додаток. Повертає логотип і короткий опис додатку To-Do List."""
         return Response({
@@ -76,28 +149,96 @@ class AboutView(APIView):
             ]
         })
 
-class TaskListView(APIView):
+class TaskListView(AsyncAPIView):
     permission_classes = [IsAuthenticated]
 
-    def get(self, request):
-        """Отримання списку задач авторизованого користувача.Повертає всі задачі користувача з опціональним фільтром за параметром `completed` (true/false)."""
+    @acondition(etag_func=task_list_etag, last_modified_func=task_last_modified, prefetch=atask_version)
+    @acache_response(user_tasks_key('tasks'), prefetch=atask_version)
+    async def get(self, request):
+        """Отримання списку задач авторизованого користувача.Повертає всі задачі користувача з опціональним фільтром за параметром `completed` (true/false).
+
+        Параметр `fields` (через кому) обмежує набір полів у відповіді та у SELECT.
+        Параметри `limit` і `cursor` вмикають курсорну пагінацію за (created_at, id):
+        відповідь має вигляд {"results": [...], "next_cursor": "..."}. Великі сторінки
+        (від TASK_LIST_STREAM_THRESHOLD задач) віддаються потоково.
+
+        Відповідь має ETag/Last-Modified за версією задач користувача: на умовний
+        запит з незмінною версією повертається 304 без запиту задач і серіалізації.
+        """
         completed_param = request.query_params.get('completed', None)
         tasks = Task.objects.filter(user=request.user)
         if completed_param is not None:
             completed = completed_param.lower() == 'true'
-            tasks = tasks.filter(completed=completed)
-        serializer = TaskSerializer(tasks, many=True)
-        return Response(serializer.data)
+            # completed=False Django записує як NOT completed, а з таким предикатом SQLite не
+            # використовує task_user_completed_idx; порівняння з параметром індексне всюди
+            tasks = tasks.filter(completed=Value(completed))
 
-    def post(self, request):
+        fields = None
+        fields_param = request.query_params.get('fields')
+        if fields_param:
+            fields = [name.strip() for name in fields_param.split(',') if name.strip()]
+            unknown = set(fields) - set(TaskSerializer.Meta.fields)
+            if not fields or unknown:
+                return Response({'error': f"Unknown fields: {', '.join(sorted(unknown))}"},
+                                status=status.HTTP_400_BAD_REQUEST)
+
+        limit_param = request.query_params.get('limit')
+        cursor = request.query_params.get('cursor')
+        if limit_param is None and cursor is None:
+            if fields is not None:
+                tasks = tasks.values(*fields)
+            serializer = TaskSerializer([task async for task in tasks], many=True, fields=fields)
+            return Response(serializer.data)
+
+        max_page_size = getattr(settings, 'TASK_LIST_MAX_PAGE_SIZE', 1000)
+        try:
+            page_size = int(limit_param) if limit_param is not None else getattr(settings, 'TASK_LIST_PAGE_SIZE', 100)
+        except ValueError:
+            return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        if not 1 <= page_size <= max_page_size:
+            return Response({'error': f'limit must be between 1 and {max_page_size}'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        if fields is not None:
+            # id і created_at потрібні для курсора, навіть якщо їх не повертаємо
+            tasks = tasks.values(*set(fields) | {'id', 'created_at'})
+        paginator = TaskCursorPaginator(tasks, page_size)
+        try:
+            rows = paginator.page_queryset(cursor)
+        except InvalidCursor:
+            return Response({'error': 'Invalid cursor'}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = TaskSerializer(fields=fields)
+
+        if page_size >= getattr(settings, 'TASK_LIST_STREAM_THRESHOLD', 500):
+            return StreamingHttpResponse(
+                paginator.astream(rows.aiterator(chunk_size=page_size), serializer),
+                content_type='application/json',
+            )
+
+        page, next_cursor = paginator.paginate([row async for row in rows])
+        return Response({
+            'results': [serializer.to_representation(row) for row in page],
+            'next_cursor': next_cursor,
+        })
+
+    async def post(self, request):
         """Створення нової задачі для авторизованого користувача. Приймає дані задачі (title, description, completed) і пов’язує її з поточним користувачем."""
         serializer = TaskSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save(user=request.user)
+            await self.create_task(serializer, request.user)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-class TaskDetailView(APIView):
+    @sync_to_async
+    def create_task(self, serializer, user):
+        # transaction.atomic доступний лише в синхронному коді
+        with transaction.atomic():
+            task = serializer.save(user=user)
+            events = TaskEvents()
+            events.created(user.id, task.pk, task.completed)
+            events.commit()
+
+class TaskDetailView(AsyncAPIView):
     permission_classes = [IsAuthenticated]
 
     def get_object(self, pk, user):
@@ -106,33 +247,232 @@ class TaskDetailView(APIView):
         except Task.DoesNotExist:
             return None
 
-    def get(self, request, pk):
+    @acondition(etag_func=task_detail_etag, last_modified_func=task_last_modified, prefetch=atask_version)
+    async def get(self, request, pk):
         """Отримання деталей конкретної задачі. Повертає дані задачі за її ID, якщо вона належить авторизованому користувачу."""
-        task = self.get_object(pk, request.user)
+        task = await Task.objects.filter(pk=pk, user=request.user).afirst()
         if task is None:
             return Response(status=status.HTTP_404_NOT_FOUND)
         serializer = TaskSerializer(task)
         return Response(serializer.data)
 
-    def put(self, request, pk):
+    async def put(self, request, pk):
         """Оновлення конкретної задачі. Дозволяє частково оновити задачу за її ID, якщо вона належить авторизованому користувачу."""
+        return await self.update_task(request, pk)
+
+    async def delete(self, request, pk):
+        """Видалення конкретної задачі.Видаляє задачу за її ID, якщо вона належить авторизованому користувачу."""
+        return await self.delete_task(request, pk)
+
+    # Запис разом з TaskEvents іде в одній транзакції, а transaction.atomic — лише синхронний
+    @sync_to_async
+    def update_task(self, request, pk):
         task = self.get_object(pk, request.user)
         if task is None:
             return Response(status=status.HTTP_404_NOT_FOUND)
         serializer = TaskSerializer(task, data=request.data, partial=True)
         if serializer.is_valid():
-            serializer.save()
+            completed_before = task.completed
+            with transaction.atomic():
+                serializer.save()
+                events = TaskEvents()
+                events.updated(request.user.id, task.pk, task_recipients({task.pk: request.user.id})[task.pk],
+                               completed_before, task.completed)
+                events.commit()
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-    def delete(self, request, pk):
-        """Видалення конкретної задачі.Видаляє задачу за її ID, якщо вона належить авторизованому користувачу."""
+    @sync_to_async
+    def delete_task(self, request, pk):
         task = self.get_object(pk, request.user)
         if task is None:
             return Response(status=status.HTTP_404_NOT_FOUND)
-        task.delete()
+        with transaction.atomic():
+            recipients = task_recipients({task.pk: request.user.id})[task.pk]
+            task.delete()
+            events = TaskEvents()
+            events.deleted(request.user.id, pk, recipients, task.completed)
+            events.commit()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+class TaskBatchView(APIView):
+    permission_classes = [IsAuthenticated]
+    operations = ('create', 'update', 'delete')
+
+    def post(self, request):
+        """Пакетне створення, оновлення та видалення задач в одній транзакції.
+
+        Приймає {"operations": [{"op": "create", "data": {...}}, {"op": "update", "id": 1, "data": {...}},
+        {"op": "delete", "id": 2}]} і повертає результат для кожної операції. Невалідні операції
+        пропускаються, решта застосовується через bulk_create/bulk_update.
+        """
+        # Тіло може бути будь-яким JSON (наприклад, масивом), а не лише об'єктом
+        operations = request.data.get('operations') if isinstance(request.data, dict) else None
+        max_operations = getattr(settings, 'TASK_BATCH_MAX_OPERATIONS', 100)
+        if not isinstance(operations, list) or not operations:
+            return Response({'error': 'operations must be a non-empty list'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(operations) > max_operations:
+            return Response({'error': f'At most {max_operations} operations are allowed'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        # bool — підклас int, але true не має перетворюватися на id 1
+        ids = [op.get('id') for op in operations
+               if isinstance(op, dict) and op.get('op') in ('update', 'delete') and type(op.get('id')) is int]
+        results = [None] * len(operations)
+        to_create, to_update, to_delete = [], {}, {}
+        update_fields = set()
+
+        with transaction.atomic():
+            # Одна перевірка належності для всіх update/delete
+            owned = Task.objects.select_for_update().in_bulk(ids)
+            owned = {pk: task for pk, task in owned.items() if task.user_id == request.user.id}
+            completed_before = {pk: task.completed for pk, task in owned.items()}
+
+            for index, op in enumerate(operations):
+                kind = op.get('op') if isinstance(op, dict) else None
+                if kind not in self.operations:
+                    results[index] = {'op': kind, 'status': status.HTTP_400_BAD_REQUEST, 'error': 'Unknown operation'}
+                    continue
+                if kind == 'create':
+                    serializer = TaskSerializer(data=op.get('data') or {})
+                    if not serializer.is_valid():
+                        results[index] = {'op': kind, 'status': status.HTTP_400_BAD_REQUEST, 'errors': serializer.errors}
+                        continue
+                    to_create.append((index, Task(user=request.user, **serializer.validated_data)))
+                    continue
+
+                task = owned.get(op.get('id'))
+                if task is None or task.pk in to_delete:
+                    results[index] = {'op': kind, 'id': op.get('id'), 'status': status.HTTP_404_NOT_FOUND,
+                                      'error': 'Task not found'}
+                    continue
+                if kind == 'delete':
+                    to_delete[task.pk] = index
+                    to_update.pop(task.pk, None)
+                    continue
+                serializer = TaskSerializer(task, data=op.get('data') or {}, partial=True)
+                if not serializer.is_valid():
+                    results[index] = {'op': kind, 'id': task.pk, 'status': status.HTTP_400_BAD_REQUEST,
+                                      'errors': serializer.errors}
+                    continue
+                for field, value in serializer.validated_data.items():
+                    setattr(task, field, value)
+                update_fields.update(serializer.validated_data)
+                to_update.setdefault(task.pk, []).append(index)
+
+            # Отримувачів змінених/видалених задач визначаємо до видалення
+            recipients = task_recipients({pk: request.user.id for pk in [*to_update, *to_delete]})
+            created = Task.objects.bulk_create([task for _, task in to_create])
+            if to_update and update_fields:
+                # bulk_update оминає auto_now, тому updated_at виставляємо явно
+                now = timezone.now()
+                for pk in to_update:
+                    owned[pk].updated_at = now
+                Task.objects.bulk_update([owned[pk] for pk in to_update], sorted(update_fields | {'updated_at'}))
+            if to_delete:
+                Task.objects.filter(pk__in=to_delete, user=request.user).delete()
+
+            events = TaskEvents()
+            changes = []
+            for (index, _), task in zip(to_create, created):
+                events.created(request.user.id, task.pk, task.completed)
+                data = TaskSerializer(task).data
+                results[index] = {'op': 'create', 'status': status.HTTP_201_CREATED, 'task': data}
+                changes.append(({request.user.id}, {'action': 'create_task', 'task': {**data, 'user': request.user.email}}))
+            for pk, indexes in to_update.items():
+                events.updated(request.user.id, pk, recipients[pk], completed_before[pk], owned[pk].completed)
+                data = TaskSerializer(owned[pk]).data
+                for index in indexes:
+                    results[index] = {'op': 'update', 'id': pk, 'status': status.HTTP_200_OK, 'task': data}
+                changes.append((recipients[pk], {'action': 'update_task', 'task': data}))
+            for pk, index in to_delete.items():
+                events.deleted(request.user.id, pk, recipients[pk], completed_before[pk])
+                results[index] = {'op': 'delete', 'id': pk, 'status': status.HTTP_204_NO_CONTENT}
+                changes.append((recipients[pk], {'action': 'delete_task', 'task_id': pk}))
+            for index, op in enumerate(operations):
+                # Оновлення задачі, яку видалили пізніше в цьому ж пакеті
+                if results[index] is None:
+                    results[index] = {'op': 'update', 'id': op.get('id'), 'status': status.HTTP_404_NOT_FOUND,
+                                      'error': 'Task was deleted in this batch'}
+
+            events.commit()
+            if changes:
+                transaction.on_commit(lambda: broadcast_task_changes(changes))
+
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
+class TaskSearchView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @method_decorator(condition(etag_func=task_search_etag, last_modified_func=task_last_modified))
+    def get(self, request):
+        """Повнотекстовий пошук за заголовком і описом серед власних задач і поширених з користувачем.
+
+        Параметр `q` — слова запиту (останнє шукається за префіксом), `limit` — кількість
+        результатів. Задачі впорядковані за релевантністю.
+        """
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'q is required'}, status=status.HTTP_400_BAD_REQUEST)
+        max_limit = getattr(settings, 'TASK_SEARCH_MAX_LIMIT', 200)
+        try:
+            limit = int(request.query_params.get('limit', getattr(settings, 'TASK_SEARCH_LIMIT', 50)))
+        except ValueError:
+            return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        if not 1 <= limit <= max_limit:
+            return Response({'error': f'limit must be between 1 and {max_limit}'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        serializer = TaskSerializer(search_tasks(request.user.id, query, limit), many=True)
+        return Response({'results': serializer.data})
+
+class TaskChangesView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """Інкрементальна синхронізація: задачі, змінені після версії `since`, і id видалених.
+
+        Відповідь {"version", "has_more", "changed", "deleted"}; наступний запит — з
+        since=version. Якщо історію до since вже компактовано, повертається 410 з
+        поточною версією: клієнт завантажує повний список і продовжує з неї.
+        """
+        try:
+            since = int(request.query_params['since'])
+        except (KeyError, ValueError):
+            return Response({'error': 'since must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        max_page_size = getattr(settings, 'TASK_LIST_MAX_PAGE_SIZE', 1000)
+        try:
+            limit = int(request.query_params.get('limit', getattr(settings, 'TASK_CHANGES_PAGE_SIZE', 500)))
+        except ValueError:
+            return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        if since < 0 or not 1 <= limit <= max_page_size:
+            return Response({'error': f'since must be non-negative and limit between 1 and {max_page_size}'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        result = get_task_changes(request.user.id, since, limit)
+        if result is None:
+            return Response({'error': 'Change history compacted, full resync required',
+                             'version': get_task_stats(request.user.id).version}, status=status.HTTP_410_GONE)
+        version, has_more, tasks, deleted = result
+        return Response({
+            'version': version,
+            'has_more': has_more,
+            'changed': TaskSerializer(tasks, many=True).data,
+            'deleted': deleted,
+        })
+
+class TaskStatsView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """Лічильники задач авторизованого користувача: всього, виконано, невиконано, поширено з ним."""
+        stats = get_task_stats(request.user.id)
+        return Response({
+            'total': stats.total,
+            'completed': stats.completed,
+            'pending': stats.total - stats.completed,
+            'shared_with_me': stats.shared_with_me,
+            'last_modified': stats.last_modified,
+        })
+
 def is_admin(user):
     return user.is_authenticated and user.is_staff
 
@@ -144,13 +484,15 @@ def admin_online_users_view(request):
 def test_ws_view(request):
     return render(request, 'test_ws.html')
 
-class SharedTasksView(APIView):
+class SharedTasksView(AsyncAPIView):
     permission_classes = [IsAuthenticated]
 
-    def get(self, request):
+    @acondition(etag_func=shared_tasks_etag, last_modified_func=task_last_modified, prefetch=atask_version)
+    @acache_response(user_tasks_key('shared_tasks'), prefetch=atask_version)
+    async def get(self, request):
         """Отримання списку завдань, поширених з авторизованим користувачем."""
         shared_tasks = Task.objects.filter(shared_with=request.user)
-        serializer = TaskSerializer(shared_tasks, many=True)
+        serializer = TaskSerializer([task async for task in shared_tasks], many=True)
         return Response(serializer.data)
 
 @api_view(['POST'])
@@ -164,8 +506,42 @@ def send_notification(request):
 @api_view(['POST'])
 @permission_classes([IsAdminUser])
 def generate_task_report(request):
+    """Запуск генерації звіту: для одного користувача (user_id), для всіх (all_users)
+    або для діапазону id (start_id/end_id). Результат зберігається в TaskReport."""
     user_id = request.data.get('user_id')
+    start_id = request.data.get('start_id')
+    end_id = request.data.get('end_id')
+    if request.data.get('all_users') or start_id is not None or end_id is not None:
+        task_result = generate_task_report_batch.delay(start_id, end_id)
+        return Response({'task_id': task_result.id, 'status': 'Batch report generation task started'})
     if not user_id:
         return Response({'error': 'User ID is required'}, status=400)
     task_result = generate_user_task_report.delay(user_id)
-    return Response({'task_id': task_result.id, 'status': 'Report generation task started'})
\ No newline at end of file
+    return Response({'task_id': task_result.id, 'status': 'Report generation task started'})
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def task_report_detail(request, pk):
+    """Завантаження збереженого звіту по задачах."""
+    try:
+        report = TaskReport.objects.get(pk=pk)
+    except TaskReport.DoesNotExist:
+        return Response(status=status.HTTP_404_NOT_FOUND)
+    return Response({
+        'id': report.id,
+        'scope': report.scope,
+        'params': report.params,
+        'created_at': report.created_at,
+        'rows': report.rows,
+    })
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def metrics(request):
+    """Внутрішні лічильники кешів і підсистем для моніторингу."""
+    return Response({
+        'user_cache': get_user_cache().stats(),
+        'response_cache': get_response_cache().stats(),
+        # WebSocket-з'єднання рахуються в межах процесу, що обслуговує цей запит
+        'websockets': {**get_connection_registry().stats(), **flow_stats},
+    })
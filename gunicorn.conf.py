@@ -0,0 +1,42 @@
+# Налаштування gunicorn для todo_project.asgi:application.
+# gunicorn підхоплює цей файл автоматично, якщо запускається з кореня проєкту.
+# Кожне значення можна перевизначити змінною оточення, не перезбираючи образ.
+#
+# Плавне перезавантаження коду: kill -HUP <pid майстра> — нові воркери стартують
+# до зупинки старих. Зупинка (SIGTERM, docker stop): воркери перестають приймати
+# з'єднання, дочікуються поточних запитів, а WebSocket-клієнти отримують код 1012
+# і перепідключаються з last_seq до іншого воркера.
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+worker_class = 'todo_project.workers.UvicornWorker'
+
+# Воркер — окремий процес з власним циклом подій; WebSocket-групи і події задач
+# між процесами ходять через Redis (CHANNEL_LAYERS, TASK_REPLAY)
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+# Розмір пулу потоків кожного воркера для синхронного коду
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+# Скільки воркер може не відповідати майстру, перш ніж його буде перезапущено
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+# Скільки чекати на завершення запитів під час зупинки чи перезавантаження
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+
+# Періодичний перезапуск воркерів проти витоків пам'яті (0 — вимкнено).
+# Перезапуск розриває WebSocket-з'єднання воркера, тому за замовчуванням вимкнено
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 0))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 0))
+
+# Без preload кожен воркер імпортує застосунок сам, і HUP підхоплює новий код
+preload_app = False
+
+forwarded_allow_ips = os.environ.get('FORWARDED_ALLOW_IPS', '127.0.0.1')
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+
+def on_reload(arbiter):
+    arbiter.log.info("Reloading workers gracefully")
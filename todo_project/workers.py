@@ -0,0 +1,28 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from uvicorn_worker import UvicornWorker as BaseUvicornWorker
+
+
+class UvicornWorker(BaseUvicornWorker):
+    """Воркер gunicorn, що обслуговує todo_project.asgi:application (HTTP і WebSocket).
+
+    Відмінності від стандартного воркера:
+    - lifespan вимкнено — ні Django, ні Channels його не підтримують;
+    - під час зупинки uvicorn закриває WebSocket-з'єднання з кодом 1012 і чекає
+      на незавершені запити не довше graceful_timeout, тож gunicorn встигає
+      зупинити воркер до SIGKILL;
+    - пул потоків циклу подій (sync_to_async(thread_sensitive=False): кеш,
+      присутність, буфер повторів) обмежено налаштуванням threads.
+    """
+
+    CONFIG_KWARGS = {'loop': 'auto', 'http': 'auto', 'ws': 'websockets', 'lifespan': 'off'}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Запас у секунду, щоб воркер сам завершився раніше за SIGKILL від майстра
+        self.config.timeout_graceful_shutdown = max(self.cfg.graceful_timeout - 1, 1)
+
+    async def _serve(self):
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=self.cfg.threads))
+        await super()._serve()